@@ -1,12 +1,54 @@
+import sqlite3
+import threading
+import uuid
+
 import chromadb
+from chromadb.api.types import EmbeddingFunction
 from chromadb.utils import embedding_functions
 import config 
+import fingerprint
+from instrumentation import annotate, get_tracer, traced
+from version_catalog import VersionCatalog, make_doc_id
+from delta_store import DeltaStore, DELTA
+from passage_index import PassageIndex, WRITE_TOKEN, mean_vector, public
+from search_cache import LRUCache
+
+class LazyEmbeddingFunction(EmbeddingFunction):
+    # Stands in for DefaultEmbeddingFunction and only builds it (loading the
+    # ONNX runtime and model) the first time something is actually embedded,
+    # so opening the database to resume a session stays cheap.
+
+    def __init__(self, factory=None):
+        self._factory = factory or embedding_functions.DefaultEmbeddingFunction
+        self._function = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._function is None:
+                print("Loading embedding model...")
+                self._function = self._factory()
+        return self._function
+
+    def __call__(self, input):
+        return self._load()(input)
+
+    @staticmethod
+    def name() -> str:
+        return "default"
+
+    def get_config(self) -> dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "LazyEmbeddingFunction":
+        return LazyEmbeddingFunction()
 
 class ChromaDBManager:
     
     def __init__(self):
         print("Initializing ChromaDB Manager...")
-        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.embedding_function = LazyEmbeddingFunction()
         self.client = chromadb.PersistentClient(path=config.CHROMA_DB_PATH)
         self.collection = self.client.get_or_create_collection(
             name=config.CHROMA_COLLECTION_NAME,
@@ -14,56 +56,411 @@ class ChromaDBManager:
         )
         print(f"Connected to ChromaDB collection: '{config.CHROMA_COLLECTION_NAME}'")
 
+        self.catalog = VersionCatalog()
+        if self.catalog.is_empty() and self.collection.count() > 0:
+            print("Version catalog is empty. Rebuilding it from collection metadata...")
+            existing = self.collection.get(include=["metadatas"])
+            self.catalog.rebuild(existing['ids'], existing['metadatas'])
+
+        self.deltas = DeltaStore(self.catalog, self._fetch_document)
+
+        self.query_embeddings = LRUCache(config.SEARCH_CACHE_SIZE)
+        self.search_results = LRUCache(config.SEARCH_CACHE_SIZE)
+
+        # Work avoided by near-duplicate detection, reported as metrics.
+        self.dedup_versions_skipped = 0
+        self.dedup_bytes_skipped = 0
+        self.dedup_outputs_reused = 0
+        self._dedup_lock = threading.Lock()
+
+        self.passages = None
+        if config.PASSAGE_INDEX_ENABLED:
+            self.passages = PassageIndex(self.client, self.embedding_function)
+
+        get_tracer().add_collector(self._metrics)
+
+    def _metrics(self) -> dict:
+        metrics = {
+            "db_documents": self.collection.count(),
+            "search_result_cache_hit_rate": self.search_results.hit_rate(),
+            "query_embedding_cache_hit_rate": self.query_embeddings.hit_rate(),
+            "dedup_versions_skipped": self.dedup_versions_skipped,
+            "dedup_bytes_skipped": self.dedup_bytes_skipped,
+            "dedup_outputs_reused": self.dedup_outputs_reused,
+        }
+        if self.passages is not None:
+            cache = self.passages.cache
+            lookups = cache.hits + cache.misses
+            metrics.update({
+                "db_passages": self.passages.collection.count(),
+                "embedding_cache_hits": cache.hits,
+                "embedding_cache_misses": cache.misses,
+                "embedding_cache_hit_rate": cache.hits / lookups if lookups else 0.0,
+            })
+        return metrics
+
+    def _fetch_document(self, doc_id: str) -> str:
+        doc = self.collection.get(ids=[doc_id], include=["documents"])
+        return doc['documents'][0] if doc['ids'] else None
+
+    @traced("db.store_version")
     def store_version(self, text_content: str, metadata: dict) -> str:
-        doc_id = f"chapter-v{metadata['version']}"
+        metadata = dict(metadata)
+        book = metadata['book'] = metadata.get('book') or config.DEFAULT_BOOK_ID
+        chapter = metadata['chapter'] = metadata.get('chapter') or config.DEFAULT_CHAPTER_ID
+        doc_id = make_doc_id(book, chapter, metadata['version'])
+        if self.catalog.get(book, chapter, metadata['version']) is not None:
+            raise ValueError(f"Version {metadata['version']} of {book}/{chapter} is already stored "
+                             f"(the next free version is {self.catalog.next_version(book, chapter)}).")
+
+        document, body = text_content, None
+        if config.DELTA_STORAGE_ENABLED:
+            # Only the changed text goes to Chroma as the document.
+            body, document = self.deltas.prepare(
+                book, chapter, metadata['version'], metadata.get('source_version'), text_content
+            )
+            metadata['storage'] = body[0]
+        # Tags the rows this call writes. ChromaDB ignores an add whose ID is
+        # already present, so after losing a race for the version only the
+        # rows carrying this tag are ours to remove. The tag only goes into
+        # the stored copy of the metadata.
+        write_id = uuid.uuid4().hex
+        signature = None
+        if config.FINGERPRINT_ENABLED:
+            signature = fingerprint.to_bytes(fingerprint.signature(text_content))
         
         print(f"Storing document with ID: {doc_id} and metadata: {metadata}")
 
+        # Embedding happens before the catalog lock is taken. With the passage
+        # index on, the version's own embedding is pooled from its passage
+        # vectors, which come from the cache for unchanged text, so storing a
+        # lightly edited version only embeds the passages that changed. The
+        # catalog row and latest pointer are committed last in a short
+        # transaction; if anything before that fails, the document and its
+        # passages are removed again, so the version can be retried.
+        # A delta-stored document holds only the changed text, so its
+        # embedding is always taken from the full text instead.
+        prepared, embeddings = None, None
+        if self.passages is not None:
+            prepared = self.passages.prepare(text_content)
+            if prepared[1]:
+                embeddings = [mean_vector(prepared[1])]
+        if embeddings is None and body is not None and body[0] == DELTA:
+            embeddings = [[float(x) for x in self.embedding_function([text_content])[0]]]
         self.collection.add(
-            documents=[text_content],
-            metadatas=[metadata],
+            documents=[document],
+            embeddings=embeddings,
+            metadatas=[dict(metadata, **{WRITE_TOKEN: write_id})],
             ids=[doc_id]
         )
+        try:
+            if self.passages is not None:
+                count = self.passages.index(doc_id, text_content, metadata, prepared, write_id)
+                print(f"Indexed {count} passages ({self.passages.embedded} embedded so far, "
+                      f"{self.passages.cache.hits} reused from cache).")
+            self.catalog.record(book, chapter, metadata['version'], doc_id,
+                                status=metadata.get('status'),
+                                source_version=metadata.get('source_version'),
+                                body=body, fingerprint=signature)
+        except sqlite3.IntegrityError as e:
+            # Another writer stored this version first. Whatever part of our
+            # document and passages ChromaDB did keep is removed, leaving the
+            # other writer's rows alone.
+            self._discard(doc_id, write_id)
+            raise ValueError(f"Version {metadata['version']} of {book}/{chapter} is already stored.") from e
+        except BaseException:
+            self._discard(doc_id, write_id)
+            raise
+        annotate(documents_written=1, bytes_written=len(document.encode("utf-8")))
+        # Any cached search may now be missing this version.
+        self.search_results.clear()
+        if body is not None:
+            self.deltas.remember((book, chapter, metadata['version']), text_content)
         
         print(f"Successfully stored version {metadata['version']}.")
         return doc_id
 
-    def get_latest_version(self) -> tuple[dict, str, str]:
-        all_docs = self.collection.get(include=["metadatas", "documents"])
+    def _discard(self, doc_id: str, write_id: str):
+        # Removes the document and passages one store_version call wrote.
+        self.collection.delete(ids=[doc_id], where={WRITE_TOKEN: write_id})
+        if self.passages is not None:
+            self.passages.remove(doc_id, write_id)
+
+    @traced("db.get_latest_version")
+    def get_latest_version(self, book: str = None, chapter: str = None) -> tuple[dict, str, str]:
+        latest = self.catalog.latest(book, chapter)
         
-        if not all_docs or not all_docs['ids']:
+        if not latest:
             print("Collection is empty. No versions found.")
             return None, None, None
         
-        latest_doc_index = max(
-            range(len(all_docs['metadatas'])),
-            key=lambda i: all_docs['metadatas'][i].get('version', 0)
-        )
-        
-        latest_metadata = all_docs['metadatas'][latest_doc_index]
-        latest_document = all_docs['documents'][latest_doc_index]
-        latest_id = all_docs['ids'][latest_doc_index]
+        doc = self.collection.get(ids=[latest['doc_id']], include=["metadatas", "documents"])
+        if not doc['ids']:
+            print(f"Catalog points at '{latest['doc_id']}' but it is missing from the collection.")
+            return None, None, None
+
+        latest_metadata = public(doc['metadatas'][0])
+        latest_document = doc['documents'][0]
+        latest_id = doc['ids'][0]
+        annotate(documents_read=1, bytes_read=len(latest_document.encode("utf-8")))
+        if latest_metadata.get('storage') == DELTA:
+            latest_document = self.deltas.reconstruct(latest['book'], latest['chapter'], latest['version'])
 
         print(f"Retrieved latest version: {latest_metadata.get('version', 'N/A')}")
         return latest_metadata, latest_document, latest_id
 
-    def semantic_search(self, query: str, num_results: int = 3) -> list:
+    def get_version_text(self, version: int, book: str = None, chapter: str = None) -> str:
+        # Full text of any stored version, rebuilt from deltas when needed.
+        return self.deltas.reconstruct(book or config.DEFAULT_BOOK_ID, chapter or config.DEFAULT_CHAPTER_ID, version)
 
-        print(f"Performing semantic search for: '{query}'")
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=num_results,
-            include=["documents", "metadatas", "distances"]
-        )
+    @traced("db.find_duplicate")
+    def find_duplicate(self, text: str, book: str = None, chapter: str = None, statuses=None,
+                       versions=None) -> dict:
+        # Catalog row of the stored version of this chapter most similar to
+        # `text`, when their MinHash similarity reaches FINGERPRINT_THRESHOLD;
+        # otherwise None. `statuses` and `versions` narrow the candidates.
+        # Versions stored before fingerprinting get their signature on first use.
+        if not config.FINGERPRINT_ENABLED:
+            return None
+        book = book or config.DEFAULT_BOOK_ID
+        chapter = chapter or config.DEFAULT_CHAPTER_ID
+        if isinstance(statuses, str):
+            statuses = [statuses]
+        candidates = [
+            row for row in self.catalog.fingerprints(book, chapter)
+            if (statuses is None or row['status'] in statuses) and (versions is None or row['version'] in versions)
+        ]
+        if not candidates:
+            return None
 
-        formatted_results = []
-        for i, distance in enumerate(results['distances'][0]):
-            formatted_results.append({
-                "id": results['ids'][0][i],
-                "distance": f"{distance:.4f}", 
-                "metadata": results['metadatas'][0][i],
-                "content": results['documents'][0][i][:250] + "..." 
-            })
-            
-        print(f"Found {len(formatted_results)} results.")
-        return formatted_results
+        target = fingerprint.signature(text)
+        best, best_score = None, 0.0
+        for row in candidates:
+            stored = row.pop('signature')
+            if stored is None:
+                stored_text = self.get_version_text(row['version'], book, chapter)
+                if stored_text is None:
+                    continue
+                stored = fingerprint.to_bytes(fingerprint.signature(stored_text))
+                self.catalog.set_fingerprint(book, chapter, row['version'], stored)
+            score = fingerprint.similarity(target, fingerprint.from_bytes(stored))
+            # Ties go to the newer version.
+            if score >= config.FINGERPRINT_THRESHOLD and score >= best_score:
+                best, best_score = row, score
+        annotate(candidates=len(candidates), duplicate=int(best is not None))
+        if best is not None:
+            best['similarity'] = best_score
+        return best
+
+    def find_output(self, text: str, book: str, chapter: str, status: str) -> dict:
+        # A stored `status` version made from a version matching `text`, so
+        # the stage that would turn `text` into it can be skipped.
+        outputs = {}
+        for row in self.catalog.history(book, chapter):
+            if row['status'] == status and row['source_version'] is not None:
+                outputs[row['source_version']] = row
+        if not outputs:
+            return None
+        source = self.find_duplicate(text, book, chapter, versions=set(outputs))
+        return outputs[source['version']] if source else None
+
+    def note_skipped_version(self, text: str):
+        with self._dedup_lock:
+            self.dedup_versions_skipped += 1
+            self.dedup_bytes_skipped += len(text.encode("utf-8"))
+
+    def note_reused_output(self, count: int = 1):
+        with self._dedup_lock:
+            self.dedup_outputs_reused += count
+
+    def list_versions(self, book: str = None, chapter: str = None) -> list:
+        # Version history from the catalog; no document bodies are loaded.
+        return self.catalog.history(book, chapter)
+
+    def approve_version(self, book: str = None, chapter: str = None, version: int = None):
+        book = book or config.DEFAULT_BOOK_ID
+        chapter = chapter or config.DEFAULT_CHAPTER_ID
+        self.catalog.approve(book, chapter, version)
+        print(f"Marked version {version} of {book}/{chapter} as approved.")
+
+    def iter_approved(self, book: str = None, page_size: int = None):
+        # Yields a book's approved chapters (catalog rows) one page at a time,
+        # so callers never hold the whole book.
+        book = book or config.DEFAULT_BOOK_ID
+        page_size = page_size or config.EXPORT_PAGE_SIZE
+        offset = 0
+        while True:
+            page = self.catalog.approved(book, limit=page_size, offset=offset)
+            if not page:
+                return
+            yield page
+            offset += len(page)
+
+    @traced("db.get_texts")
+    def get_texts(self, rows: list) -> dict:
+        # Full texts for a page of catalog rows, keyed by doc_id, in one
+        # collection read; delta-stored versions are rebuilt from the catalog.
+        if not rows:
+            return {}
+        docs = self.collection.get(ids=[row['doc_id'] for row in rows], include=["documents", "metadatas"])
+        found = dict(zip(docs['ids'], zip(docs['documents'], docs['metadatas'])))
+        texts = {}
+        for row in rows:
+            document, metadata = found.get(row['doc_id'], (None, None))
+            if document is not None and (metadata or {}).get('storage') == DELTA:
+                document = self.deltas.reconstruct(row['book'], row['chapter'], row['version'])
+            texts[row['doc_id']] = document
+        annotate(documents_read=len(docs['ids']),
+                 bytes_read=sum(len(document.encode("utf-8")) for document in docs['documents']))
+        return texts
+
+    def _query_vectors(self, queries: list) -> list:
+        # Query embeddings from the LRU; the rest are embedded in one pass.
+        vectors = {query: self.query_embeddings.get(query) for query in queries}
+        missing = [query for query, vector in vectors.items() if vector is None]
+        if missing:
+            embed = self.passages.embed if self.passages is not None else self.embedding_function
+            for query, vector in zip(missing, embed(missing)):
+                vectors[query] = [float(x) for x in vector]
+                self.query_embeddings.put(query, vectors[query])
+        return [vectors[query] for query in queries]
+
+    def _collapse(self, metadatas: list, num_results: int, per_chapter: bool) -> list:
+        # Positions of the hits to keep, best first; with `per_chapter` only
+        # the closest hit of each chapter survives.
+        if not per_chapter:
+            return list(range(min(num_results, len(metadatas))))
+        kept, seen = [], set()
+        for i, metadata in enumerate(metadatas):
+            key = (metadata.get("book"), metadata.get("chapter"))
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(i)
+            if len(kept) == num_results:
+                break
+        return kept
+
+    def _search(self, queries: list, num_results: int, where: dict, latest_only: bool, per_chapter: bool,
+                with_content: bool) -> list:
+        use_passages = self.passages is not None and self.passages.collection.count() > 0
+        collection = self.passages.collection if use_passages else self.collection
+        total = collection.count()
+        if total == 0:
+            return [[] for _ in queries]
+
+        ids = None
+        if latest_only:
+            # Latest versions come from the catalog and are pushed down as a
+            # filter, so older versions never reach the ranking.
+            latest = [row["doc_id"] for row in self.catalog.chapters(where_book(where))]
+            if not latest:
+                return [[] for _ in queries]
+            if use_passages:
+                where = combine_filters(where, {"parent_id": {"$in": latest}})
+            else:
+                ids = latest
+
+        embeddings = self._query_vectors(queries)
+        include = ["metadatas", "distances"] + (["documents"] if with_content else [])
+        results = [None] * len(queries)
+        pending = list(range(len(queries)))
+        fetch = num_results * (config.SEARCH_OVERFETCH if per_chapter else 1)
+        while pending:
+            # Collapsing can leave a query short; those are asked again for
+            # more hits until filled or the store is exhausted.
+            n = min(fetch, total)
+            raw = collection.query(query_embeddings=[embeddings[i] for i in pending], n_results=n,
+                                   where=where, ids=ids, include=include)
+            short = []
+            for row, i in enumerate(pending):
+                metadatas = raw['metadatas'][row]
+                kept = self._collapse(metadatas, num_results, per_chapter)
+                hits = []
+                for j in kept:
+                    document = raw['documents'][row][j] if with_content else None
+                    if use_passages:
+                        hit = {"id": metadatas[j].get("parent_id"), "passage_id": raw['ids'][row][j],
+                               "content": document}
+                    else:
+                        # Only the hits that are returned get a preview;
+                        # delta-stored versions are rebuilt first.
+                        if document is not None and metadatas[j].get('storage') == DELTA:
+                            document = self.deltas.reconstruct(metadatas[j]['book'], metadatas[j]['chapter'],
+                                                               metadatas[j]['version'])
+                        hit = {"id": raw['ids'][row][j],
+                               "content": document[:250] + "..." if document is not None else None}
+                    hit.update({"distance": f"{raw['distances'][row][j]:.4f}", "metadata": public(metadatas[j])})
+                    hits.append(hit)
+                results[i] = hits
+                if len(hits) < num_results and len(metadatas) == n and n < total:
+                    short.append(i)
+            pending = short
+            fetch *= 2
+        return results
+
+    @traced("db.semantic_search")
+    def semantic_search_many(self, queries: list, num_results: int = 3, status=None, book: str = None,
+                             min_version: int = None, max_version: int = None, latest_only: bool = None,
+                             per_chapter: bool = None, with_content: bool = True) -> list:
+        # Returns one result list per query. `status` (a string or a list),
+        # `book` and the version range are pushed down to the store as
+        # metadata filters; `latest_only` drops hits from superseded versions
+        # and `per_chapter` keeps the best hit per chapter. Results are cached
+        # until the next store_version.
+        latest_only = config.SEARCH_LATEST_ONLY if latest_only is None else latest_only
+        per_chapter = config.SEARCH_ONE_PER_CHAPTER if per_chapter is None else per_chapter
+        where = search_filter(status, book, min_version, max_version)
+        options = (num_results, repr(where), latest_only, per_chapter, with_content)
+
+        results = {query: self.search_results.get((query,) + options) for query in queries}
+        missing = [query for query, hits in results.items() if hits is None]
+        print(f"Performing semantic search for {len(queries)} queries ({len(missing)} not cached)...")
+        if missing:
+            for query, hits in zip(missing, self._search(missing, num_results, where, latest_only,
+                                                         per_chapter, with_content)):
+                results[query] = hits
+                self.search_results.put((query,) + options, hits)
+
+        batches = [list(results[query]) for query in queries]
+        annotate(queries=len(queries), cache_hits=len(queries) - len(missing),
+                 documents_read=sum(len(hits) for hits in batches),
+                 bytes_read=sum(len((hit['content'] or "").encode("utf-8")) for hits in batches for hit in hits))
+        return batches
+
+    def semantic_search(self, query: str, num_results: int = 3, **filters) -> list:
+        results = self.semantic_search_many([query], num_results, **filters)[0]
+        print(f"Found {len(results)} results.")
+        return results
+
+
+def search_filter(status=None, book: str = None, min_version: int = None, max_version: int = None) -> dict:
+    # Chroma `where` clause for the search filters, or None when unfiltered.
+    clauses = []
+    if status:
+        clauses.append({"status": status} if isinstance(status, str) else {"status": {"$in": list(status)}})
+    if book:
+        clauses.append({"book": book})
+    if min_version is not None:
+        clauses.append({"version": {"$gte": int(min_version)}})
+    if max_version is not None:
+        clauses.append({"version": {"$lte": int(max_version)}})
+    return combine_filters(*clauses)
+
+
+def combine_filters(*clauses) -> dict:
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def where_book(where: dict) -> str:
+    # The book a filter is restricted to, so "latest only" reads only that
+    # book's chapters from the catalog.
+    if not where:
+        return None
+    for clause in where.get("$and", [where]):
+        if isinstance(clause.get("book"), str):
+            return clause["book"]
+    return None
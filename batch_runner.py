@@ -0,0 +1,225 @@
+import json
+import threading
+
+import config
+from instrumentation import span
+from job_queue import JobQueue, STAGES
+from workflow_context import WorkflowContext
+
+# Status stored by each stage, used to recognise output a killed run already
+# wrote to the database before it could checkpoint.
+STAGE_STATUS = {"scrape": "original", "spin": "spun", "review": "reviewed"}
+
+
+class StageError(Exception):
+    pass
+
+
+def load_manifest(path: str, book: str = None) -> list:
+    # A .json manifest is a list of URLs or of {"url", "book", "chapter"}
+    # objects; anything else is read as one URL per line ('#' starts a
+    # comment). Chapters without an id are numbered in manifest order, and
+    # every entry records its manifest position as the reading order.
+    book = book or config.DEFAULT_BOOK_ID
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            items = json.load(f)
+        else:
+            items = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    entries = []
+    for i, item in enumerate(items, start=1):
+        if isinstance(item, str):
+            item = {"url": item}
+        entries.append({
+            "url": item["url"],
+            "book": item.get("book") or book,
+            "chapter": item.get("chapter") or f"chapter-{i:03d}",
+            "position": i,
+        })
+    return entries
+
+
+class BatchRunner:
+    # Headless scrape -> spin -> review over the job queue. Each worker
+    # thread owns one chapter at a time and checkpoints after every stage;
+    # failures are retried by the queue with backoff, and reviewed chapters
+    # are queued for a later HITL pass instead of prompting.
+
+    def __init__(self, ctx: WorkflowContext = None, queue: JobQueue = None, max_workers: int = None):
+        self.ctx = ctx or WorkflowContext()
+        self.queue = queue or JobQueue()
+        self.max_workers = max_workers or config.BATCH_MAX_WORKERS
+        self.run_id = None
+        self._stop = threading.Event()
+        self._stages = {"scrape": self._scrape, "spin": self._spin, "review": self._review}
+
+    def _next_version(self, book: str, chapter: str) -> int:
+        return self.ctx.db_manager.catalog.next_version(book, chapter)
+
+    def _existing_output(self, job: dict, stage: str, input_version: int) -> int:
+        # Version a previous attempt stored for this stage but never
+        # checkpointed, so the stage is not run (and paid for) twice.
+        for row in reversed(self.ctx.db_manager.list_versions(job["book"], job["chapter"])):
+            if row["status"] != STAGE_STATUS[stage]:
+                continue
+            if stage == "scrape" and row["created_at"] >= job["created_at"]:
+                return row["version"]
+            if stage != "scrape" and row["source_version"] == input_version:
+                return row["version"]
+        return None
+
+    def _duplicate_output(self, job: dict, stage: str, input_version: int) -> int:
+        # Version this stage already produced from an earlier version whose
+        # text matches the input, so the model is not asked to redo it.
+        db_manager = self.ctx.db_manager
+        text = db_manager.get_version_text(input_version, job["book"], job["chapter"])
+        row = db_manager.find_output(text, job["book"], job["chapter"], STAGE_STATUS[stage]) if text else None
+        return row["version"] if row else None
+
+    def _store(self, job: dict, text: str, metadata: dict) -> int:
+        version = self._next_version(job["book"], job["chapter"])
+        metadata.update({"version": version, "book": job["book"], "chapter": job["chapter"]})
+        self.ctx.db_manager.store_version(text, metadata)
+        return version
+
+    def _scrape(self, job: dict, input_version: int) -> int:
+        content, screenshot, score = self.ctx.scraper.run(job["url"])
+        if not content:
+            raise StageError(f"no content scraped from {job['url']}")
+        duplicate = self.ctx.db_manager.find_duplicate(content, job["book"], job["chapter"], statuses="original")
+        if duplicate is not None:
+            # Unchanged chapter: the later stages then find their stored output.
+            self.ctx.db_manager.note_skipped_version(content)
+            job["unchanged"] = True
+            print(f"[{job['book']}/{job['chapter']}] Unchanged since version {duplicate['version']} "
+                  f"({duplicate['similarity']:.0%} similar); not stored again.")
+            return duplicate["version"]
+        metadata = {"status": "original", "score": f"{score:.2f}", "source_url": job["url"]}
+        if screenshot:
+            metadata["screenshot"] = screenshot
+        return self._store(job, content, metadata)
+
+    def _spin(self, job: dict, input_version: int) -> int:
+        text = self.ctx.db_manager.get_version_text(input_version, job["book"], job["chapter"])
+        if config.FUSED_SPIN_REVIEW and len(text) <= config.CHUNKING_THRESHOLD_CHARS:
+            return self._spin_and_review(job, input_version, text)
+        writer = self.ctx.writer
+        if len(text) > config.CHUNKING_THRESHOLD_CHARS:
+            spun_text = writer.run_chunked(text)
+        else:
+            spun_text = writer.run(text)
+        if not spun_text:
+            raise StageError("writer returned no text")
+        return self._store(job, spun_text, {"status": "spun", "source_version": input_version})
+
+    def _spin_and_review(self, job: dict, input_version: int, text: str) -> int:
+        # Fused mode stores the review along with the draft; the review stage
+        # then finds it through _existing_output instead of calling the model.
+        # Without a usable fused response the two-call path takes over: no
+        # text means the writer runs, a draft alone is reviewed by the review
+        # stage as usual.
+        spun_text, feedback, revised_text = self.ctx.fused.run(text)
+        if not spun_text:
+            print(f"[{job['book']}/{job['chapter']}] Fused call failed; using the writer and reviewer.")
+            spun_text = self.ctx.writer.run(text)
+            if not spun_text:
+                raise StageError("writer returned no text")
+        spun_version = self._store(job, spun_text, {"status": "spun", "source_version": input_version})
+        if revised_text:
+            self._store(job, revised_text, {
+                "status": "reviewed", "source_version": spun_version, "review_notes": feedback
+            })
+        return spun_version
+
+    def _review(self, job: dict, input_version: int) -> int:
+        text = self.ctx.db_manager.get_version_text(input_version, job["book"], job["chapter"])
+        reviewer = self.ctx.reviewer
+        if len(text) > config.CHUNKING_THRESHOLD_CHARS:
+            feedback, revised_text = reviewer.run_chunked(text)
+        else:
+            feedback, revised_text = reviewer.run(text)
+        if not (feedback and revised_text):
+            raise StageError("reviewer returned no revision")
+        return self._store(job, revised_text, {
+            "status": "reviewed", "source_version": input_version, "review_notes": feedback
+        })
+
+    def _run_job(self, job: dict):
+        version = job["input_version"]
+        remaining = STAGES[STAGES.index(job["stage"]):]
+        for i, stage in enumerate(remaining):
+            if self._stop.is_set():
+                return
+            with span(f"batch.{stage}", book=job["book"], chapter=job["chapter"]):
+                output = self._existing_output(job, stage, version)
+                if output is None and stage != "scrape" and config.FINGERPRINT_ENABLED:
+                    output = self._duplicate_output(job, stage, version)
+                    if output is not None:
+                        job["unchanged"] = True
+                if output is not None:
+                    if job.get("unchanged"):
+                        self.ctx.db_manager.note_reused_output()
+                    print(f"[{job['book']}/{job['chapter']}] Reusing {stage} output (version {output}).")
+                else:
+                    output = self._stages[stage](job, version)
+            version = output
+            if i + 1 < len(remaining):
+                self.queue.checkpoint(job["id"], remaining[i + 1], version)
+        self.queue.complete(job["id"], self.run_id, job["book"], job["chapter"], version)
+        print(f"[{job['book']}/{job['chapter']}] Done; version {version} queued for review.")
+
+    def _worker(self):
+        while not self._stop.is_set():
+            job = self.queue.claim(self.run_id)
+            if job is None:
+                if not self.queue.has_work():
+                    return
+                # Remaining jobs are running elsewhere or waiting out a retry delay.
+                self._stop.wait(config.JOB_POLL_INTERVAL)
+                continue
+            try:
+                self._run_job(job)
+            except Exception as e:
+                retry = self.queue.fail(job["id"], f"{job['stage']}: {e}")
+                print(f"[{job['book']}/{job['chapter']}] Failed: {e}. "
+                      f"{'Will retry.' if retry else 'Giving up.'}")
+
+    def _heartbeat(self, done: threading.Event):
+        while not done.wait(config.JOB_LEASE_SECONDS / 3):
+            self.queue.renew(self.run_id)
+
+    def run(self) -> dict:
+        # Processes the queue until no runnable job is left. Ctrl+C stops
+        # after the current stages finish; their jobs resume on the next run.
+        self.run_id = self.queue.start_run()
+        print(f"Batch run {self.run_id} starting with {self.max_workers} workers...")
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(done,), daemon=True)
+        heartbeat.start()
+        workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.max_workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(timeout=0.5)
+        except KeyboardInterrupt:
+            print("Stopping after the current stages finish (Ctrl+C again to abort)...")
+            self._stop.set()
+            for worker in workers:
+                worker.join()
+        finally:
+            done.set()
+            self.queue.release(self.run_id)
+            self.queue.finish_run(self.run_id)
+        return self.queue.report()
+
+
+def print_report(report: dict):
+    print(f"Jobs done: {report['done']}, failed: {report['failed']}, remaining: {report['remaining']}, "
+          f"awaiting HITL: {report['awaiting_hitl']}")
+    for (status, stage), count in sorted(report["jobs"].items()):
+        print(f"  {status:8} {stage:8} {count}")
+    print(f"Throughput: {report['chapters_per_hour']:.1f} chapters/hour over {report['runs']} runs "
+          f"({report['last_run_chapters_per_hour']:.1f} in the last run).")
@@ -0,0 +1,44 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fake_model import FakeGenerativeModel
+from response_cache import ResponseCache
+from reviewer_agent import ReviewerAgent
+from writer_agent import WriterAgent
+
+
+def run_pass(writer: WriterAgent, reviewer: ReviewerAgent, chapters: list) -> float:
+    start = time.perf_counter()
+    for text in chapters:
+        spun_text = writer.run(text)
+        reviewer.run(spun_text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs. warm pipeline runs through the response cache.")
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(path=os.path.join(tmp, "responses.sqlite3"))
+        writer = WriterAgent(model=FakeGenerativeModel(args.latency), cache=cache)
+        reviewer = ReviewerAgent(model=FakeGenerativeModel(args.latency, seed=1), cache=cache)
+        chapters = [f"Chapter {i} original text. " * 200 for i in range(args.chapters)]
+
+        cold = run_pass(writer, reviewer, chapters)
+        warm = run_pass(writer, reviewer, chapters)
+        stats = cache.stats()
+
+    print(f"\nChapters: {args.chapters}, model latency: {args.latency}s")
+    print(f"cold run: {cold:8.2f}s")
+    print(f"warm run: {warm:8.2f}s  ({cold / warm:.0f}x faster)")
+    print(f"cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['entries']} entries, {stats['bytes'] / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
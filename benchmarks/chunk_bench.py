@@ -0,0 +1,43 @@
+import argparse
+import time
+
+import config
+from benchmarks.corpus import make_chapter
+from benchmarks.fake_model import FakeGenerativeModel
+from chunking import split_into_windows
+from reviewer_agent import ReviewerAgent
+from writer_agent import WriterAgent
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whole-chapter vs. chunked rewriting on a fake model.")
+    parser.add_argument("--chars", type=int, default=60000)
+    parser.add_argument("--per-char-latency", type=float, default=0.00005)
+    parser.add_argument("--workers", type=int, default=config.CHUNK_MAX_WORKERS)
+    args = parser.parse_args()
+
+    text = make_chapter(args.chars)
+    windows = split_into_windows(text)
+    model_args = dict(latency=0.1, output_ratio=0.9, per_char_latency=args.per_char_latency)
+    writer = WriterAgent(model=FakeGenerativeModel(**model_args))
+    reviewer = ReviewerAgent(model=FakeGenerativeModel(seed=1, **model_args))
+
+    whole_write, _ = timed(writer.run, text)
+    chunked_write, _ = timed(writer.run_chunked, text, None, args.workers)
+    whole_review, _ = timed(reviewer.run, text)
+    chunked_review, _ = timed(reviewer.run_chunked, text, args.workers)
+
+    print(f"\nChapter: {len(text)} chars, {len(windows)} chunks "
+          f"(largest {max(len(w.body) for w in windows)} chars), {args.workers} workers")
+    print(f"writer   whole: {whole_write:7.2f}s   chunked: {chunked_write:7.2f}s")
+    print(f"reviewer whole: {whole_review:7.2f}s   chunked: {chunked_review:7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import random
+
+# Synthetic chapter text shared by the benchmarks.
+SENTENCES = [
+    "Dick stood on the reef as the gates of morning opened over the lagoon.",
+    "The canoes came in one by one through the break in the coral.",
+    "Katafa watched the smoke rise from the far beach.",
+    "A frigate bird hung motionless above the outer swell.",
+    "Somewhere behind the palms a drum began to beat.",
+    "The tide turned, and the water over the sand went from green to gold.",
+]
+
+
+def make_chapter(chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    paragraphs = []
+    while sum(len(p) + 2 for p in paragraphs) < chars:
+        paragraphs.append(" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(4, 10))))
+    return "\n\n".join(paragraphs)
+
+
+def mutate(text: str, rng: random.Random, edits: int) -> str:
+    # Small human-style edits: rewrite a few lines in place.
+    lines = text.splitlines(keepends=True)
+    for _ in range(edits):
+        i = rng.randrange(len(lines))
+        lines[i] = f"Edited line {rng.random():.6f}. " + lines[i][: len(lines[i]) // 2] + "\n"
+    return "".join(lines)
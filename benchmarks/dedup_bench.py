@@ -0,0 +1,160 @@
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+
+import config
+import fingerprint
+from batch_runner import BatchRunner
+from benchmarks.e2e_bench import use_hash_embedder, use_temp_paths
+from benchmarks.fake_model import FakeGenerativeModel
+from job_queue import JobQueue
+from reviewer_agent import ReviewerAgent
+from workflow_context import WorkflowContext
+from writer_agent import WriterAgent
+
+BOOK = "bench"
+SYLLABLES = ["ka", "lo", "mi", "ten", "ra", "vu", "sel", "ne", "dor", "qui", "ba", "fen", "ost", "ly", "mar"]
+
+# Page chrome that differs between two scrapes of the same chapter.
+NOISE = [
+    "Retrieved from \"https://en.wikisource.org/w/index.php?oldid={n}\"",
+    "This page was last edited on {n} March 2024, at 10:{n:02d}.",
+    "Jump to navigation",
+    "{n}",
+]
+
+
+def vocabulary(size: int = 4000) -> list:
+    rng = random.Random(0)
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+
+def paragraph(rng: random.Random, words: list) -> str:
+    return " ".join(rng.choice(words) for _ in range(rng.randint(40, 90))) + "."
+
+
+def make_book(chapters: int, chars: int, words: list) -> list:
+    book = []
+    for c in range(chapters):
+        rng = random.Random(c)
+        paragraphs = []
+        while sum(len(p) + 2 for p in paragraphs) < chars:
+            paragraphs.append(paragraph(rng, words))
+        book.append(paragraphs)
+    return book
+
+
+def second_edition(book: list, changed: float, words: list) -> tuple:
+    # Every chapter gets fresh page chrome; a `changed` share also has a
+    # third of its paragraphs rewritten.
+    rng = random.Random(1)
+    changed_chapters = set(rng.sample(range(len(book)), int(len(book) * changed)))
+    edition = []
+    for c, paragraphs in enumerate(book):
+        paragraphs = list(paragraphs)
+        if c in changed_chapters:
+            for i in rng.sample(range(len(paragraphs)), max(1, len(paragraphs) // 3)):
+                paragraphs[i] = paragraph(rng, words)
+        noise = [line.format(n=rng.randint(1, 59)) for line in NOISE]
+        edition.append(noise[2:] + paragraphs + noise[:2])
+    return edition, changed_chapters
+
+
+class EditionScraper:
+    # Serves chapter texts by URL in place of the web scraper.
+
+    def __init__(self, texts: dict):
+        self.texts = texts
+
+    def run(self, url: str) -> tuple:
+        return self.texts[url], None, 1.0
+
+
+def stored_bytes(db) -> int:
+    docs = db.collection.get(include=["documents"])
+    return sum(len(document.encode("utf-8")) for document in docs["documents"])
+
+
+def run_edition(ctx, queue, edition: list):
+    # Queues the edition on the shared queue as `--batch --rescrape` does:
+    # chapters finished by the previous edition go back to the scrape stage.
+    ctx._scraper = EditionScraper({f"bench://{c}": "\n\n".join(p) for c, p in enumerate(edition)})
+    entries = [{"url": f"bench://{c}", "book": BOOK, "chapter": f"chapter-{c:03d}"} for c in range(len(edition))]
+    queue.enqueue(entries)
+    queue.requeue(entries)
+    BatchRunner(ctx=ctx, queue=queue).run()
+
+
+def bench(args, first: list, second: list, dedup: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_paths(tmp)
+        config.FINGERPRINT_ENABLED = dedup
+        writer = WriterAgent(model=FakeGenerativeModel(args.latency, output_ratio=0.9))
+        reviewer = ReviewerAgent(model=FakeGenerativeModel(args.latency, output_ratio=0.9, seed=1))
+        ctx = WorkflowContext(writer=writer, reviewer=reviewer)
+        queue = JobQueue(os.path.join(tmp, "queue.sqlite3"))
+        run_edition(ctx, queue, first)
+
+        db = ctx.db_manager
+        calls = writer.model.calls + reviewer.model.calls
+        versions = sum(len(db.list_versions(BOOK, row["chapter"])) for row in db.catalog.chapters(BOOK))
+        size, embedded = stored_bytes(db), db.passages.embedded
+        start = time.perf_counter()
+        run_edition(ctx, queue, second)
+        elapsed = time.perf_counter() - start
+        queue.close()
+        return {
+            "label": "fingerprint dedup" if dedup else "no dedup",
+            "seconds": elapsed,
+            "calls": writer.model.calls + reviewer.model.calls - calls,
+            "versions": sum(len(db.list_versions(BOOK, row["chapter"])) for row in db.catalog.chapters(BOOK)) - versions,
+            "bytes": stored_bytes(db) - size,
+            "embedded": db.passages.embedded - embedded,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Work saved by near-duplicate detection when a book is re-run.")
+    parser.add_argument("--chapters", type=int, default=100)
+    parser.add_argument("--chars", type=int, default=12000, help="Characters per chapter.")
+    parser.add_argument("--changed", type=float, default=0.1, help="Share of chapters edited in the re-scrape.")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds per fake model call.")
+    args = parser.parse_args()
+
+    use_hash_embedder()
+    config.BATCH_MAX_WORKERS = 4
+    words = vocabulary()
+    book = make_book(args.chapters, args.chars, words)
+    first = [list(paragraphs) for paragraphs in book]
+    second, changed = second_edition(book, args.changed, words)
+
+    # Fingerprinting cost and accuracy on its own.
+    start = time.perf_counter()
+    old = [fingerprint.signature("\n\n".join(p)) for p in first]
+    new = [fingerprint.signature("\n\n".join(p)) for p in second]
+    fingerprint_seconds = time.perf_counter() - start
+    scores = [fingerprint.similarity(a, b) for a, b in zip(old, new)]
+    flagged = {c for c, score in enumerate(scores) if score >= config.FINGERPRINT_THRESHOLD}
+    unchanged = set(range(args.chapters)) - changed
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows = [bench(args, first, second, dedup=False), bench(args, first, second, dedup=True)]
+
+    print(f"\n{args.chapters} chapters of ~{args.chars // 1000}k chars; re-scrape with new page chrome, "
+          f"{len(changed)} chapters edited")
+    print(f"Fingerprinted {2 * args.chapters} texts in {fingerprint_seconds:.2f}s; "
+          f"{len(flagged & unchanged)}/{len(unchanged)} unchanged chapters matched, "
+          f"{len(flagged & changed)}/{len(changed)} edited chapters wrongly matched "
+          f"(threshold {config.FINGERPRINT_THRESHOLD}).")
+    print("\nRe-run of the whole book:")
+    print(f"{'mode':20}{'time':>8}{'model calls':>13}{'new versions':>14}{'stored KiB':>12}{'embedded':>10}")
+    for row in rows:
+        print(f"{row['label']:20}{row['seconds']:>7.2f}s{row['calls']:>13}{row['versions']:>14}"
+              f"{row['bytes'] / 1024:>12.0f}{row['embedded']:>10}")
+
+
+if __name__ == "__main__":
+    main()
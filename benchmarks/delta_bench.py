@@ -0,0 +1,88 @@
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+
+import config
+from benchmarks.corpus import make_chapter, mutate
+from benchmarks.e2e_bench import use_hash_embedder, use_temp_paths
+
+BOOK, CHAPTER = "bench", "ch1"
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def bench(args, delta: bool) -> dict:
+    # Times the whole ChromaDBManager.store_version path: delta encoding,
+    # the ChromaDB add (with embedding), passage indexing and the catalog.
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_paths(tmp)
+        config.DELTA_STORAGE_ENABLED = delta
+        config.DELTA_SNAPSHOT_INTERVAL = args.snapshot_interval
+        config.PASSAGE_INDEX_ENABLED = args.passages
+        from ChromaDB import ChromaDBManager
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = ChromaDBManager()
+            text = make_chapter(args.chars).replace("\n\n", "\n")
+            full_bytes = document_bytes = 0
+            write_times = []
+            for version in range(1, args.versions + 1):
+                if version > 1:
+                    text = mutate(text, rng, args.edits)
+                metadata = {"version": version, "status": "human_edited", "book": BOOK, "chapter": CHAPTER}
+                if version > 1:
+                    metadata["source_version"] = version - 1
+                start = time.perf_counter()
+                doc_id = db.store_version(text, metadata)
+                write_times.append(time.perf_counter() - start)
+                full_bytes += len(text.encode("utf-8"))
+                document_bytes += len(db.collection.get(ids=[doc_id], include=["documents"])['documents'][0]
+                                      .encode("utf-8"))
+            final_text = text
+
+            db.deltas._cache.clear()
+            start = time.perf_counter()
+            rebuilt = db.get_version_text(args.versions, BOOK, CHAPTER)
+            cold = time.perf_counter() - start
+            assert rebuilt == final_text
+
+    return {
+        "label": "delta" if delta else "full text",
+        "full_bytes": full_bytes,
+        "document_bytes": document_bytes,
+        "p50": percentile(write_times, 0.5),
+        "p95": percentile(write_times, 0.95),
+        "cold": cold,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage growth and store_version latency of delta vs. full-text versions.")
+    parser.add_argument("--versions", type=int, default=300)
+    parser.add_argument("--chars", type=int, default=20000)
+    parser.add_argument("--edits", type=int, default=3)
+    parser.add_argument("--snapshot-interval", type=int, default=10)
+    parser.add_argument("--passages", action="store_true", help="Also index passages, as the workflow does by default.")
+    args = parser.parse_args()
+
+    use_hash_embedder()
+    rows = [bench(args, delta=False), bench(args, delta=True)]
+
+    print(f"\nVersions: {args.versions}, chapter ~{args.chars} chars, {args.edits} edits/version, "
+          f"snapshot every {args.snapshot_interval}, passages {'on' if args.passages else 'off'}")
+    print(f"{'mode':12}{'sent to Chroma':>16}{'store p50':>11}{'store p95':>11}{'cold read':>11}")
+    for row in rows:
+        print(f"{row['label']:12}{row['document_bytes'] / 1e6:>13.2f} MB{row['p50'] * 1000:>8.1f} ms"
+              f"{row['p95'] * 1000:>8.1f} ms{row['cold'] * 1000:>8.2f} ms")
+    print(f"(full text of all versions: {rows[0]['full_bytes'] / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+from rich.console import Console
+
+import config
+import instrumentation
+import main_workflow
+from benchmarks.fake_model import FakeGenerativeModel
+from benchmarks.fixture_server import FixtureServer
+from instrumentation import Tracer, span
+from reviewer_agent import ReviewerAgent
+from workflow_context import WorkflowContext
+from writer_agent import WriterAgent
+
+# Spans reported per scale, in pipeline order.
+REPORTED_SPANS = (
+    "pipeline.chapter", "stage.scrape", "stage.write", "stage.review",
+    "scraper.http_fetch", "model.generate", "model.stream",
+    "db.store_version", "db.get_latest_version",
+)
+
+
+def use_temp_paths(directory: str):
+    # Everything the workflow writes goes under `directory`; response caching
+    # is off so every run measures real (fake) model calls.
+    config.CHROMA_DB_PATH = os.path.join(directory, "db")
+    config.VERSION_CATALOG_PATH = os.path.join(directory, "db", "version_catalog.sqlite3")
+    config.EMBEDDING_CACHE_PATH = os.path.join(directory, "embeddings.sqlite3")
+    config.HTTP_CACHE_DIR = os.path.join(directory, "http")
+    config.SCREENSHOT_DIR = os.path.join(directory, "screenshots")
+    config.RESPONSE_CACHE_ENABLED = False
+
+
+def use_hash_embedder():
+    # The default ONNX model needs a download; the hash embedder keeps the
+    # suite offline and deterministic.
+    from chromadb.utils import embedding_functions
+    from benchmarks.passage_bench import HashEmbeddingFunction
+
+    embedding_functions.DefaultEmbeddingFunction = HashEmbeddingFunction
+
+
+def run_scale(args, server: FixtureServer, chapters: int) -> dict:
+    tracer = Tracer()
+    previous = instrumentation.set_tracer(tracer)
+    failed = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            use_temp_paths(tmp)
+            writer = WriterAgent(model=FakeGenerativeModel(args.latency, args.jitter, args.output_chars))
+            reviewer = ReviewerAgent(model=FakeGenerativeModel(args.latency, args.jitter, args.output_chars, seed=1))
+            ctx = WorkflowContext(writer=writer, reviewer=reviewer)
+
+            start = time.perf_counter()
+            for i, url in enumerate(server.chapter_urls(chapters)):
+                # Each chapter goes through the unmodified main_workflow stages.
+                ctx.book, ctx.chapter, ctx.target_url = "bench", f"chapter-{i + 1}", url
+                try:
+                    with span("pipeline.chapter"):
+                        main_workflow.run_scraper_stage(ctx)
+                        main_workflow.run_writer_stage(ctx)
+                        main_workflow.run_reviewer_stage(ctx)
+                except SystemExit:
+                    failed += 1
+            elapsed = time.perf_counter() - start
+    finally:
+        instrumentation.set_tracer(previous)
+
+    spans = {row["span"]: row for row in tracer.summary() if row["span"] in REPORTED_SPANS}
+    return {
+        "chapters": chapters,
+        "failed": failed,
+        "seconds": elapsed,
+        "chapters_per_second": chapters / elapsed,
+        "spans": {name: spans[name] for name in REPORTED_SPANS if name in spans},
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list, baseline: dict = None):
+    previous = {}
+    for run in (baseline or {}).get("runs", []):
+        for name, row in run["spans"].items():
+            previous[(run["chapters"], name)] = row
+
+    for run in results:
+        print(f"\n{run['chapters']} chapters: {run['seconds']:.2f}s, "
+              f"{run['chapters_per_second']:.2f} chapters/s, {run['failed']} failed")
+        print(f"  {'span':24}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}" + (f"{'p95 vs base':>14}" if previous else ""))
+        for name, row in run["spans"].items():
+            line = f"  {name:24}{row['count']:>7}{row['p50'] * 1000:>10.1f}{row['p95'] * 1000:>10.1f}"
+            base = previous.get((run["chapters"], name))
+            if base and base["p95"]:
+                line += f"{(row['p95'] / base['p95'] - 1):>+14.0%}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the main_workflow stages.")
+    parser.add_argument("--chapters", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--output-chars", type=int, default=4000)
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per fixture chapter.")
+    parser.add_argument("--embedder", choices=["hash", "default"], default="hash")
+    parser.add_argument("--output", default=None, help="Where to save results (JSON).")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare p95 against.")
+    args = parser.parse_args()
+
+    if args.embedder == "hash":
+        use_hash_embedder()
+    config.STREAM_RESPONSES = True
+    main_workflow.console = Console(quiet=True)
+
+    results = []
+    with FixtureServer(paragraphs=args.paragraphs) as server:
+        # One unreported chapter first, so lazy imports and first connections
+        # do not land in the smallest scale's tail latency.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run_scale(args, server, 1)
+        for chapters in args.chapters:
+            print(f"Running {chapters} chapters...", flush=True)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results.append(run_scale(args, server, chapters))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    output = args.output or os.path.join("benchmarks", "results", f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "settings": vars(args),
+            "runs": results,
+        }, f, indent=2)
+    print(f"\nResults saved to '{output}'.")
+
+
+if __name__ == "__main__":
+    main()
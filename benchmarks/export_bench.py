@@ -0,0 +1,99 @@
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import config
+from benchmarks.corpus import make_chapter, mutate
+from benchmarks.e2e_bench import use_hash_embedder, use_temp_paths
+from book_export import FORMATS, BookExporter
+from version_catalog import make_doc_id
+
+BOOK = "bench-book"
+BULK_SIZE = 200
+
+
+def populate(db, chapters: int, chars: int):
+    # One approved version per chapter, loaded in bulk.
+    for start in range(0, chapters, BULK_SIZE):
+        ids, documents, metadatas = [], [], []
+        for c in range(start, min(chapters, start + BULK_SIZE)):
+            chapter = f"chapter-{c + 1:04d}"
+            ids.append(make_doc_id(BOOK, chapter, 1))
+            documents.append(make_chapter(chars, seed=c))
+            metadatas.append({"version": 1, "status": "reviewed", "book": BOOK, "chapter": chapter})
+        db.collection.add(ids=ids, documents=documents, metadatas=metadatas)
+        db.catalog.rebuild(ids, metadatas)
+        for metadata in metadatas:
+            db.catalog.approve(BOOK, metadata["chapter"], 1)
+
+
+def revise(db, count: int, chars: int):
+    # Approves a new version of `count` random chapters.
+    rng = random.Random(2)
+    for c in rng.sample(range(len(db.catalog.chapters(BOOK))), count):
+        chapter = f"chapter-{c + 1:04d}"
+        latest = db.catalog.latest(BOOK, chapter)
+        version = latest["version"] + 1
+        db.store_version(mutate(make_chapter(chars, seed=c), rng, 3),
+                         {"version": version, "status": "human_edited", "book": BOOK, "chapter": chapter,
+                          "source_version": latest["version"]})
+        db.approve_version(BOOK, chapter, version)
+
+
+def measure(fn) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def load_everything(db):
+    # The previous bulk access pattern: every document in one collection.get.
+    docs = db.collection.get(include=["documents", "metadatas"])
+    return len(docs["ids"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and peak memory of a streaming book export.")
+    parser.add_argument("--chapters", type=int, default=1000)
+    parser.add_argument("--chars", type=int, default=20000)
+    parser.add_argument("--revised", type=int, default=10, help="Chapters re-approved before the re-export.")
+    args = parser.parse_args()
+
+    use_hash_embedder()
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_paths(tmp)
+        config.PASSAGE_INDEX_ENABLED = False
+        config.EXPORT_DIR = os.path.join(tmp, "exports")
+        from ChromaDB import ChromaDBManager
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = ChromaDBManager()
+            populate(db, args.chapters, args.chars)
+            exporter = BookExporter(db)
+            rows = [("collection.get (everything)",) + measure(lambda: load_everything(db))[1:]]
+            for fmt in FORMATS:
+                result, elapsed, peak = measure(lambda: exporter.export(BOOK, fmt))
+                rows.append((f"{fmt}: full export, {result['bytes'] / 2 ** 20:.1f} MiB", elapsed, peak))
+                rows.append((f"{fmt}: unchanged re-export",) + measure(lambda: exporter.export(BOOK, fmt))[1:])
+            revise(db, args.revised, args.chars)
+            for fmt in FORMATS:
+                result, elapsed, peak = measure(lambda: exporter.export(BOOK, fmt))
+                rows.append((f"{fmt}: {result['rendered']} chapters changed", elapsed, peak))
+
+    book_mib = args.chapters * args.chars / 2 ** 20
+    print(f"\n{args.chapters} chapters, ~{book_mib:.0f} MiB of text")
+    print(f"{'run':40}{'time':>9}{'peak MiB':>10}")
+    for label, elapsed, peak in rows:
+        print(f"{label:40}{elapsed:>8.2f}s{peak / 2 ** 20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import hashlib
+import random
+import time
+
+
+class FakeResponse:
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ServiceUnavailable(Exception):
+    # Mirrors google.api_core.exceptions.ServiceUnavailable (HTTP 503).
+    code = 503
+
+
+class ResourceExhausted(Exception):
+    # Mirrors google.api_core.exceptions.ResourceExhausted (HTTP 429).
+    code = 429
+
+
+class FakeGenerativeModel:
+    # Deterministic stand-in for genai.GenerativeModel. Output depends only on
+    # the prompt, the seed and `output_chars`; `latency` seconds (plus up to
+    # `jitter` extra) are slept per call to mimic a remote model. With
+    # `output_ratio` set, the output is that fraction of the prompt length,
+    # and `per_char_latency` adds generation time proportional to output size.
+    # The `*_rate` arguments inject faults into that fraction of calls: 503
+    # and 429 errors, responses `slow_factor` times slower than usual, and
+    # hangs of `hang_seconds`.
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, output_chars: int = 4000, seed: int = 0,
+                 chunk_chars: int = 200, output_ratio: float = None, per_char_latency: float = 0.0,
+                 failure_rate: float = 0.0, rate_limit_rate: float = 0.0, slow_rate: float = 0.0,
+                 slow_factor: float = 10.0, hang_rate: float = 0.0, hang_seconds: float = 60.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.output_chars = output_chars
+        self.seed = seed
+        self.chunk_chars = chunk_chars
+        self.output_ratio = output_ratio
+        self.per_char_latency = per_char_latency
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.model_name = f"fake-{seed}"
+        self.calls = 0
+        self.prompt_chars = 0
+        self.response_chars = 0
+
+    def _body(self, prompt: str) -> str:
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest()
+        sentence = f"The gates of morning opened on chapter {digest[:8]} of the book. "
+        output_chars = int(len(prompt) * self.output_ratio) if self.output_ratio else self.output_chars
+        repeats = max(1, output_chars // len(sentence))
+        paragraphs = [sentence * 5 for _ in range(max(1, repeats // 5))]
+        return "\n\n".join(paragraphs)
+
+    def _text(self, prompt: str) -> str:
+        body = self._body(prompt)
+        if "**Draft Chapter:**" in prompt:
+            # Fused writer+reviewer prompt: draft, review and revision in one response.
+            return (
+                f"**Draft Chapter:**\n{self._body(prompt + ':draft')}\n\n"
+                "**Review & Suggestions:**\n"
+                "- Tighten the opening paragraph.\n"
+                "- Vary sentence length in the dialogue.\n"
+                "- Clarify the time of day.\n\n"
+                f"**Revised Chapter:**\n{body}"
+            )
+        if "**Revised Chapter:**" in prompt:
+            return (
+                "**Review & Suggestions:**\n"
+                "- Tighten the opening paragraph.\n"
+                "- Vary sentence length in the dialogue.\n"
+                "- Clarify the time of day.\n\n"
+                f"**Revised Chapter:**\n{body}"
+            )
+        return body
+
+    def _stream(self, text: str, delay: float):
+        # A fifth of the latency is spent before the first chunk; the rest is
+        # spread evenly over the remaining chunks.
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        time.sleep(delay * 0.2)
+        per_chunk = delay * 0.8 / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(per_chunk)
+            yield FakeResponse(chunk)
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        self.calls += 1
+        rng = random.Random(f"{self.seed}:{self.calls}:{len(prompt)}")
+        delay = self.latency + rng.random() * self.jitter
+
+        fault = rng.random()
+        for rate, error in ((self.failure_rate, ServiceUnavailable), (self.rate_limit_rate, ResourceExhausted)):
+            if fault < rate:
+                time.sleep(delay * 0.1)
+                raise error(f"injected {error.code} from {self.model_name}")
+            fault -= rate
+        if fault < self.hang_rate:
+            delay = self.hang_seconds
+        elif fault - self.hang_rate < self.slow_rate:
+            delay *= self.slow_factor
+
+        text = self._text(prompt)
+        self.prompt_chars += len(prompt)
+        self.response_chars += len(text)
+        delay += len(text) * self.per_char_latency
+        if stream:
+            return self._stream(text, delay)
+        time.sleep(delay)
+        return FakeResponse(text)
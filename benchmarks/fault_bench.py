@@ -0,0 +1,104 @@
+import argparse
+import contextlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import call_policy
+import config
+from benchmarks.fake_model import FakeGenerativeModel
+from model_client import ModelClient
+
+# Call policies compared: the previous single unguarded attempt, then
+# deadlines + retries + breaker, then the same with hedged requests.
+MODES = {
+    "single attempt": dict(MODEL_CALL_DEADLINE=None, MODEL_ATTEMPT_TIMEOUT=None, MODEL_MAX_RETRIES=0,
+                           MODEL_BREAKER_FAILURES=0, MODEL_HEDGING_ENABLED=False),
+    "retry + deadline": dict(MODEL_HEDGING_ENABLED=False),
+    "retry + deadline + hedge": dict(MODEL_HEDGING_ENABLED=True),
+}
+
+
+def configure(args):
+    # Shrinks the policy's time constants to the fake model's latency scale.
+    config.MODEL_CALL_DEADLINE = args.deadline
+    config.MODEL_ATTEMPT_TIMEOUT = args.attempt_timeout
+    config.MODEL_MAX_RETRIES = 3
+    config.MODEL_RETRY_BASE_DELAY = args.latency / 2
+    config.MODEL_RATE_LIMIT_DELAY = args.latency * 2
+    config.MODEL_RETRY_MAX_DELAY = args.latency * 10
+    config.MODEL_HEDGE_MIN_SAMPLES = 20
+    config.MODEL_HEDGE_MIN_DELAY = args.latency / 2
+    config.MODEL_BREAKER_FAILURES = 5
+    config.MODEL_BREAKER_RESET = args.latency * 5
+
+
+def bench(args, settings: dict) -> dict:
+    configure(args)
+    for name, value in settings.items():
+        setattr(config, name, value)
+    call_policy.reset()
+    model = FakeGenerativeModel(args.latency, args.jitter, output_chars=400, seed=7,
+                                failure_rate=args.failure_rate, rate_limit_rate=args.rate_limit_rate,
+                                slow_rate=args.slow_rate, slow_factor=args.slow_factor,
+                                hang_rate=args.hang_rate, hang_seconds=args.hang_seconds)
+    client = ModelClient(model)
+
+    def call(i):
+        start = time.perf_counter()
+        try:
+            client.generate(f"Rewrite passage {i}.")
+            ok = True
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(call, range(args.calls)))
+    completed = np.array([elapsed for ok, elapsed in results if ok])
+    everything = np.array([elapsed for _, elapsed in results])
+    return {
+        "completion": len(completed) / len(results),
+        "p50": float(np.percentile(completed, 50)) if len(completed) else float("nan"),
+        "p95": float(np.percentile(completed, 95)) if len(completed) else float("nan"),
+        "p99": float(np.percentile(completed, 99)) if len(completed) else float("nan"),
+        "worst": float(everything.max()),
+        "model_calls": model.calls,
+        "trips": client.breaker.trips,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Completion rate and tail latency of model calls under injected faults.")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1, help="Fixed seconds per model call.")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Share of calls failing with a 503.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.03, help="Share of calls rejected with a 429.")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of calls that are slow.")
+    parser.add_argument("--slow-factor", type=float, default=8.0)
+    parser.add_argument("--hang-rate", type=float, default=0.01, help="Share of calls that hang.")
+    parser.add_argument("--hang-seconds", type=float, default=10.0)
+    parser.add_argument("--attempt-timeout", type=float, default=1.0)
+    parser.add_argument("--deadline", type=float, default=3.0)
+    args = parser.parse_args()
+
+    rows = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for label, settings in MODES.items():
+            rows.append((label, bench(args, settings)))
+
+    print(f"\n{args.calls} calls, {args.concurrency} at a time; faults: {args.failure_rate:.0%} 503, "
+          f"{args.rate_limit_rate:.0%} 429, {args.slow_rate:.0%} slow x{args.slow_factor:g}, "
+          f"{args.hang_rate:.0%} hang {args.hang_seconds:g}s")
+    print(f"{'mode':26}{'completed':>10}{'p50':>8}{'p95':>8}{'p99':>8}{'worst':>8}{'calls':>7}{'trips':>7}")
+    for label, row in rows:
+        print(f"{label:26}{row['completion']:>10.1%}{row['p50']:>7.2f}s{row['p95']:>7.2f}s{row['p99']:>7.2f}s"
+              f"{row['worst']:>7.2f}s{row['model_calls']:>7}{row['trips']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Wikisource-like page. The content lives inside the same container that
+# config.CONTENT_SELECTOR targets, surrounded by navigation chrome.
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>The Gates of Morning/Book {book}/Chapter {chapter}</title></head>
+<body>
+<div id="mw-navigation"><a href="#">Main menu</a> <a href="#">Search</a></div>
+<div class="mw-parser-output ws-page-container">
+<h2>Book {book}, Chapter {chapter}</h2>
+{paragraphs}
+</div>
+</body>
+</html>
+"""
+
+PARAGRAPH = (
+    "The gates of morning opened on the lagoon as the chapter began, and the "
+    "book of the sea turned another page beneath the outrigger. Dick watched "
+    "the reef line and the long swell breaking white against the coral."
+)
+
+
+def render_chapter(book: int, chapter: int, paragraphs: int = 40) -> str:
+    body = "\n".join(
+        f"<p>{PARAGRAPH} ({book}.{chapter}.{i})</p>" for i in range(paragraphs)
+    )
+    return PAGE_TEMPLATE.format(book=book, chapter=chapter, paragraphs=body)
+
+
+class _ChapterHandler(BaseHTTPRequestHandler):
+    # Serves /book/<b>/chapter/<c>; anything else is a 404. Pages carry an
+    # ETag and honour If-None-Match with a 304.
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] != "book" or parts[2] != "chapter":
+            self.send_error(404)
+            return
+        try:
+            book, chapter = int(parts[1]), int(parts[3])
+        except ValueError:
+            self.send_error(404)
+            return
+
+        body = render_chapter(book, chapter, self.server.paragraphs).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.server.requests += 1
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    # Local HTTP server on an ephemeral port, run in a daemon thread.
+    # Usable as a context manager.
+
+    def __init__(self, paragraphs: int = 40):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ChapterHandler)
+        self.httpd.paragraphs = paragraphs
+        self.httpd.requests = 0
+        self.httpd.not_modified = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def chapter_urls(self, count: int, book: int = 1) -> list:
+        return [f"{self.base_url}/book/{book}/chapter/{c}" for c in range(1, count + 1)]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
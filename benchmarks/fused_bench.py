@@ -0,0 +1,92 @@
+import argparse
+import contextlib
+import os
+import statistics
+import tempfile
+
+import config
+from batch_runner import BatchRunner
+from benchmarks.corpus import make_chapter
+from benchmarks.e2e_bench import use_hash_embedder, use_temp_paths
+from benchmarks.fake_model import FakeGenerativeModel
+from benchmarks.pipeline_bench import TextScraper
+from fused_agent import FusedAgent
+from job_queue import JobQueue
+from reviewer_agent import ReviewerAgent
+from reward_scoring import RewardScorer
+from workflow_context import WorkflowContext
+from writer_agent import WriterAgent
+
+BOOK = "bench"
+
+
+def fake(args, seed: int) -> FakeGenerativeModel:
+    return FakeGenerativeModel(args.latency, args.jitter, args.output_chars, seed=seed,
+                               per_char_latency=args.per_char_latency)
+
+
+def bench(args, fused: bool) -> dict:
+    # Chapters go through the batch runner one at a time, so p50 is the
+    # latency of a single chapter's spin+review.
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_paths(tmp)
+        config.PASSAGE_INDEX_ENABLED = False
+        config.FUSED_SPIN_REVIEW = fused
+        if fused:
+            models = [fake(args, 2)]
+            ctx = WorkflowContext(fused=FusedAgent(model=models[0]))
+        else:
+            models = [fake(args, 0), fake(args, 1)]
+            ctx = WorkflowContext(writer=WriterAgent(model=models[0]), reviewer=ReviewerAgent(model=models[1]))
+        texts = {f"bench://{i}": make_chapter(args.chars, seed=i) for i in range(args.chapters)}
+        ctx._scraper = TextScraper(texts)
+        queue = JobQueue(os.path.join(tmp, "queue.sqlite3"))
+        queue.enqueue([{"url": url, "book": BOOK, "chapter": f"chapter-{i:03d}"} for i, url in enumerate(texts)])
+        runner = BatchRunner(ctx=ctx, queue=queue, max_workers=1)
+        runner.run()
+        queue.close()
+
+        db = ctx.db_manager
+        results, elapsed = [], []
+        for row in db.catalog.chapters(BOOK):
+            history = db.list_versions(BOOK, row["chapter"])
+            results.append({"statuses": [version["status"] for version in history],
+                            "revised": db.get_version_text(history[-1]["version"], BOOK, row["chapter"])})
+            elapsed.append(history[-1]["created_at"] - history[0]["created_at"])
+
+    scores = RewardScorer().score_many([result["revised"] for result in results if result["revised"]])
+    return {
+        "label": "fused, 1 call" if fused else "writer + reviewer",
+        "p50": statistics.median(elapsed),
+        "calls": sum(model.calls for model in models),
+        "prompt_tokens": sum(model.prompt_chars for model in models) // 4,
+        "response_tokens": sum(model.response_chars for model in models) // 4,
+        "score": float(scores.mean()) if len(scores) else 0.0,
+        "lineage_ok": all(result["statuses"] == ["original", "spun", "reviewed"] for result in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused vs. two-stage spin+review on the offline fake model.")
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--chars", type=int, default=8000, help="Characters per source chapter.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixed seconds per model call.")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--output-chars", type=int, default=8000)
+    parser.add_argument("--per-char-latency", type=float, default=0.00005,
+                        help="Generation seconds per output character.")
+    args = parser.parse_args()
+
+    use_hash_embedder()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows = [bench(args, fused=False), bench(args, fused=True)]
+
+    print(f"\n{args.chapters} chapters, one at a time")
+    print(f"{'mode':20}{'p50/chapter':>13}{'calls':>7}{'prompt tok':>12}{'output tok':>12}{'score':>8}{'lineage':>9}")
+    for row in rows:
+        print(f"{row['label']:20}{row['p50']:>12.2f}s{row['calls']:>7}{row['prompt_tokens']:>12}"
+              f"{row['response_tokens']:>12}{row['score']:>8.1f}{'ok' if row['lineage_ok'] else 'BROKEN':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import config
+from benchmarks.fixture_server import FixtureServer
+from http_fetcher import ConditionalCache, HttpFetcher
+from scraper_agent import ScraperAgent
+
+
+def time_pages(fn, urls: list) -> list:
+    timings = []
+    for url in urls:
+        start = time.perf_counter()
+        fn(url)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summary(timings: list) -> str:
+    timings = sorted(timings)
+    return (f"p50 {timings[len(timings) // 2] * 1000:8.1f} ms   "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP fast path vs. headless browser on a local fixture site.")
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--skip-browser", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer() as server:
+        urls = server.chapter_urls(args.chapters)
+        fetcher = HttpFetcher(ConditionalCache(os.path.join(tmp, "http")))
+
+        tracemalloc.start()
+        cold = time_pages(fetcher.fetch, urls)
+        warm = time_pages(fetcher.fetch, urls)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        fetcher.close()
+
+        print(f"\nChapters: {args.chapters}")
+        print(f"http cold:         {summary(cold)}   python peak {peak / 1024 / args.chapters:8.1f} KiB/page")
+        print(f"http revalidated:  {summary(warm)}   ({server.httpd.not_modified} responses were 304)")
+
+        if not args.skip_browser:
+            config.HTTP_FAST_PATH_ENABLED = False
+            os.chdir(tmp)
+            browser = time_pages(ScraperAgent().run, urls)
+            child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            print(f"browser:           {summary(browser)}   browser peak RSS {child_rss / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+import chromadb
+from chromadb.api.types import EmbeddingFunction
+from chromadb.utils import embedding_functions
+
+from benchmarks.corpus import make_chapter, mutate
+from passage_index import EmbeddingCache, PassageIndex
+
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    # Cheap deterministic embedder (bag of hashed words) with an optional
+    # per-text delay, for runs that should not load the ONNX model.
+
+    def __init__(self, dimensions: int = 64, delay: float = 0.0):
+        self.dimensions = dimensions
+        self.delay = delay
+
+    @staticmethod
+    def name() -> str:
+        return "hash-bench"
+
+    def get_config(self) -> dict:
+        return {"dimensions": self.dimensions, "delay": self.delay}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "HashEmbeddingFunction":
+        return HashEmbeddingFunction(**config)
+
+    def __call__(self, input):
+        if self.delay:
+            time.sleep(self.delay * len(input))
+        vectors = []
+        for text in input:
+            vector = [0.0] * self.dimensions
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dimensions] += 1.0
+            norm = sum(x * x for x in vector) ** 0.5 or 1.0
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Passage indexing throughput and query latency.")
+    parser.add_argument("--books", type=int, default=3)
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--versions", type=int, default=5)
+    parser.add_argument("--chars", type=int, default=15000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--embedder", choices=["default", "hash"], default="hash")
+    args = parser.parse_args()
+
+    if args.embedder == "default":
+        embedder = embedding_functions.DefaultEmbeddingFunction()
+    else:
+        embedder = HashEmbeddingFunction(delay=0.002)
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "db"))
+        index = PassageIndex(client, embedder, EmbeddingCache(os.path.join(tmp, "embeddings.sqlite3")))
+
+        passages = 0
+        start = time.perf_counter()
+        for book in range(args.books):
+            for chapter in range(args.chapters):
+                text = make_chapter(args.chars, seed=book * 1000 + chapter)
+                for version in range(1, args.versions + 1):
+                    if version > 1:
+                        text = mutate(text, rng, 3)
+                    doc_id = f"book{book}/ch{chapter}-v{version}"
+                    meta = {"version": version, "book": f"book{book}", "chapter": f"ch{chapter}"}
+                    passages += index.index(doc_id, text, meta)
+        indexing = time.perf_counter() - start
+        embedded = index.embedded
+
+        latencies = []
+        for i in range(args.queries):
+            query = f"the canoes at the reef {i}"
+            start = time.perf_counter()
+            index.query(query, num_results=5)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+
+    print(f"\nCorpus: {args.books} books x {args.chapters} chapters x {args.versions} versions")
+    print(f"passages indexed: {passages} in {indexing:.2f}s ({passages / indexing:,.0f} passages/s)")
+    print(f"embedded: {embedded}, reused from cache: {passages - embedded}")
+    print(f"query latency p50/p95: {latencies[len(latencies) // 2] * 1000:.1f} / "
+          f"{latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
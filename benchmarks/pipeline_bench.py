@@ -0,0 +1,76 @@
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+import config
+from batch_runner import BatchRunner
+from benchmarks.e2e_bench import use_hash_embedder, use_temp_paths
+from benchmarks.fake_model import FakeGenerativeModel
+from job_queue import JobQueue
+from rate_limiter import RateLimiter
+from reviewer_agent import ReviewerAgent
+from workflow_context import WorkflowContext
+from writer_agent import WriterAgent
+
+BOOK = "bench"
+
+
+class TextScraper:
+    # Serves fixed chapter texts by URL in place of the web scraper.
+
+    def __init__(self, texts: dict):
+        self.texts = texts
+
+    def run(self, url: str) -> tuple:
+        return self.texts[url], None, 1.0
+
+
+def bench(args, workers: int) -> float:
+    # Whole-book spin+review through the batch runner: `workers` chapters at
+    # a time, every agent sharing one rate limiter.
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_paths(tmp)
+        config.PASSAGE_INDEX_ENABLED = False
+        limiter = RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm, max_in_flight=args.in_flight)
+        writer = WriterAgent(model=FakeGenerativeModel(args.latency, args.jitter, args.output_chars), limiter=limiter)
+        reviewer = ReviewerAgent(model=FakeGenerativeModel(args.latency, args.jitter, args.output_chars, seed=1),
+                                 limiter=limiter)
+        texts = {f"bench://{i}": f"Chapter {i} original text. " * 200 for i in range(args.chapters)}
+        ctx = WorkflowContext(limiter=limiter, scraper=TextScraper(texts), writer=writer, reviewer=reviewer)
+        queue = JobQueue(os.path.join(tmp, "queue.sqlite3"))
+        queue.enqueue([{"url": url, "book": BOOK, "chapter": f"chapter-{i}"} for i, url in enumerate(texts)])
+
+        start = time.perf_counter()
+        report = BatchRunner(ctx=ctx, queue=queue, max_workers=workers).run()
+        elapsed = time.perf_counter() - start
+        queue.close()
+    if report["failed"]:
+        print(f"{report['failed']} chapters failed.")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spin+review throughput against a local fake model.")
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--output-chars", type=int, default=4000)
+    parser.add_argument("--rpm", type=int, default=6000)
+    parser.add_argument("--tpm", type=int, default=10000000)
+    parser.add_argument("--in-flight", type=int, default=8)
+    args = parser.parse_args()
+
+    use_hash_embedder()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows = [(workers, bench(args, workers)) for workers in args.workers]
+
+    print(f"\nChapters: {args.chapters}, model latency: {args.latency}s")
+    for workers, elapsed in rows:
+        print(f"workers={workers:>3}: {elapsed:8.2f}s  ({args.chapters / elapsed:6.2f} chapters/s)")
+
+
+if __name__ == "__main__":
+    main()
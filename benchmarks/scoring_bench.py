@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+import config
+from benchmarks.corpus import make_chapter
+from reward_scoring import RewardScorer, reference_score
+
+
+def make_pages(count: int, chars: int) -> list:
+    # Chapter text with a sprinkling of navigation noise, like a real scrape.
+    rng = random.Random(0)
+    pages = []
+    for i in range(count):
+        noise = " ".join(rng.choice(config.NOISE_WORDS) for _ in range(rng.randint(0, 20)))
+        pages.append(f"{noise}\n{make_chapter(chars, seed=i)}")
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scalar vs. batch reward scoring.")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--chars", type=int, default=8000)
+    parser.add_argument("--reweights", type=int, default=100)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, args.chars)
+    scorer = RewardScorer()
+    rng = random.Random(1)
+    weight_sets = [
+        {"length": rng.random(), "keywords": rng.random(), "noise": -rng.random()}
+        for _ in range(args.reweights)
+    ]
+
+    start = time.perf_counter()
+    reference = [reference_score(page) for page in pages]
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = scorer.feature_matrix(pages)
+    batch = time.perf_counter() - start
+    scores = RewardScorer.score_matrix(matrix)
+    assert np.array_equal(scores, np.array(reference, dtype=np.float64)), "batch scores differ"
+
+    original_weights = dict(config.REWARD_WEIGHTS)
+    start = time.perf_counter()
+    for weights in weight_sets:
+        config.REWARD_WEIGHTS.update(weights)
+        [reference_score(page) for page in pages]
+    scalar_reweight = time.perf_counter() - start
+    config.REWARD_WEIGHTS.update(original_weights)
+
+    start = time.perf_counter()
+    for weights in weight_sets:
+        RewardScorer.score_matrix(matrix, weights)
+    batch_reweight = time.perf_counter() - start
+
+    print(f"\nPages: {args.pages} x ~{args.chars} chars (scores identical)")
+    print(f"score once:       scalar {scalar:7.3f}s   batch {batch:7.3f}s")
+    print(f"{args.reweights} re-weightings: scalar {scalar_reweight:7.3f}s   batch {batch_reweight:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import time
+
+from benchmarks.fixture_server import FixtureServer
+from scraper_agent import ScraperAgent
+
+
+def bench_serial(agent: ScraperAgent, urls: list) -> float:
+    start = time.perf_counter()
+    for url in urls:
+        agent.run(url)
+    return time.perf_counter() - start
+
+
+def bench_batch(agent: ScraperAgent, urls: list, concurrency: int) -> float:
+    start = time.perf_counter()
+    agent.run_many(urls, max_concurrency=concurrency)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial vs. pooled scraping on a local fixture site.")
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-serial", action="store_true")
+    args = parser.parse_args()
+
+    agent = ScraperAgent()
+    with FixtureServer() as server:
+        urls = server.chapter_urls(args.chapters)
+
+        results = {}
+        if not args.skip_serial:
+            results["serial"] = bench_serial(agent, urls)
+        results["batch"] = bench_batch(agent, urls, args.concurrency)
+
+    print(f"\nChapters: {args.chapters}")
+    for mode, elapsed in results.items():
+        print(f"{mode:>8}: {elapsed:8.2f}s  ({args.chapters / elapsed:6.2f} chapters/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import tempfile
+import time
+
+import config
+import instrumentation
+from benchmarks.fixture_server import FixtureServer
+from instrumentation import Tracer
+from scraper_agent import ScraperAgent
+
+# (label, enabled, format, full_page)
+MODES = [
+    ("off", False, "jpeg", False),
+    ("png, full page", True, "png", True),
+    ("jpeg q70, viewport", True, "jpeg", False),
+    ("webp q70, viewport", True, "webp", False),
+]
+
+
+def bench(urls: list, concurrency: int, mode: tuple) -> dict:
+    label, enabled, image_format, full_page = mode
+    config.SCREENSHOTS_ENABLED = enabled
+    config.SCREENSHOT_FORMAT = image_format
+    config.SCREENSHOT_FULL_PAGE = full_page
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.SCREENSHOT_DIR = tmp
+        agent = ScraperAgent()
+        passes = []
+        for _ in range(2):
+            # The second pass sees unchanged pages and should reuse every screenshot.
+            tracer = Tracer()
+            previous = instrumentation.set_tracer(tracer)
+            start = time.perf_counter()
+            try:
+                agent.run_many(urls, max_concurrency=concurrency)
+                agent.screenshots.flush()
+            finally:
+                instrumentation.set_tracer(previous)
+            fetch = next(row for row in tracer.summary() if row["span"] == "scraper.fetch")
+            passes.append({"total": time.perf_counter() - start, "p50": fetch["p50"], "p95": fetch["p95"]})
+
+    return {
+        "label": label,
+        "passes": passes,
+        "captured": agent.screenshots.captured,
+        "reused": agent.screenshots.deduplicated,
+        "bytes": agent.screenshots.bytes_written,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Browser scrape latency and disk use per screenshot mode.")
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--paragraphs", type=int, default=80)
+    args = parser.parse_args()
+
+    # Force the browser path; the HTTP fast path never takes screenshots.
+    config.HTTP_FAST_PATH_ENABLED = False
+    with FixtureServer(paragraphs=args.paragraphs) as server:
+        urls = server.chapter_urls(args.chapters)
+        rows = [bench(urls, args.concurrency, mode) for mode in MODES]
+
+    print(f"\n{args.chapters} pages, {args.concurrency} concurrent")
+    print(f"{'mode':22}{'page p50':>10}{'page p95':>10}{'batch':>9}{'rerun':>9}{'captured':>10}{'reused':>8}{'KiB':>10}")
+    for row in rows:
+        first, second = row["passes"]
+        print(f"{row['label']:22}{first['p50'] * 1000:>8.0f}ms{first['p95'] * 1000:>8.0f}ms"
+              f"{first['total']:>8.2f}s{second['total']:>8.2f}s{row['captured']:>10}{row['reused']:>8}"
+              f"{row['bytes'] / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from chromadb.utils import embedding_functions
+
+from benchmarks.corpus import SENTENCES, make_chapter, mutate
+from benchmarks.e2e_bench import use_temp_paths
+from benchmarks.passage_bench import HashEmbeddingFunction
+from passage_index import split_passages
+from version_catalog import make_doc_id
+
+STATUSES = ("original", "spun", "reviewed")
+BULK_SIZE = 1000
+
+# (label, semantic_search keyword arguments)
+MODES = [
+    ("unfiltered", {}),
+    ("status=reviewed", {"status": "reviewed"}),
+    ("book + version range", {"book": "book-0", "min_version": 3, "max_version": 6}),
+    ("latest only", {"latest_only": True}),
+    ("one hit per chapter", {"per_chapter": True}),
+    ("latest, one per chapter", {"latest_only": True, "per_chapter": True}),
+]
+
+
+def populate(db, args):
+    # `versions` stored versions spread over books and chapters, each a small
+    # edit of the one before, like successive spins and reviews. Loaded in
+    # bulk (documents, passages, then the catalog) rather than one
+    # store_version call at a time, which would take many minutes.
+    rng = random.Random(0)
+    chapters = args.versions // args.per_chapter
+    start = time.perf_counter()
+    ids, documents, metadatas = [], [], []
+    passage_ids, passages, passage_metadatas = [], [], []
+    for c in range(chapters):
+        book, chapter = f"book-{c % args.books}", f"chapter-{c:05d}"
+        text = make_chapter(args.chars, seed=c)
+        for v in range(1, args.per_chapter + 1):
+            metadata = {"version": v, "status": STATUSES[min(v - 1, 2)], "book": book, "chapter": chapter}
+            if v > 1:
+                metadata["source_version"] = v - 1
+            doc_id = make_doc_id(book, chapter, v)
+            ids.append(doc_id)
+            documents.append(text)
+            metadatas.append(metadata)
+            for i, passage in enumerate(split_passages(text)):
+                passage_ids.append(f"{doc_id}#p{i}")
+                passages.append(passage)
+                passage_metadatas.append({"version": v, "status": metadata["status"], "book": book,
+                                          "chapter": chapter, "parent_id": doc_id, "passage": i})
+            text = mutate(text, rng, 2)
+
+    for i in range(0, len(ids), BULK_SIZE):
+        db.collection.add(ids=ids[i:i + BULK_SIZE], documents=documents[i:i + BULK_SIZE],
+                          metadatas=metadatas[i:i + BULK_SIZE])
+    for i in range(0, len(passage_ids), BULK_SIZE):
+        batch = passages[i:i + BULK_SIZE]
+        db.passages.collection.add(ids=passage_ids[i:i + BULK_SIZE], embeddings=db.passages.embed(batch),
+                                   documents=batch, metadatas=passage_metadatas[i:i + BULK_SIZE])
+    db.catalog.rebuild(ids, metadatas)
+    return time.perf_counter() - start
+
+
+def make_queries(count: int) -> list:
+    rng = random.Random(1)
+    return [" ".join(rng.sample(" ".join(SENTENCES).split(), 6)) for _ in range(count)]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def percentile(times: list, q: float) -> float:
+    ordered = sorted(times)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic search latency on a large version store.")
+    parser.add_argument("--versions", type=int, default=10000)
+    parser.add_argument("--per-chapter", type=int, default=10, help="Versions per chapter.")
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--chars", type=int, default=1500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=20, help="Queries per semantic_search_many call.")
+    parser.add_argument("--embed-delay", type=float, default=0.005,
+                        help="Seconds per embedded text, standing in for the ONNX model.")
+    args = parser.parse_args()
+
+    embedding_functions.DefaultEmbeddingFunction = HashEmbeddingFunction
+    queries = make_queries(args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_paths(tmp)
+        from ChromaDB import ChromaDBManager
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = ChromaDBManager()
+            build = populate(db, args)
+        # Only query embeddings pay the simulated model cost.
+        db.embedding_function._load().delay = args.embed_delay
+        print(f"Stored {args.versions} versions ({db.passages.collection.count()} passages) in {build:.1f}s")
+        print(f"{'mode':28}{'p50 ms':>9}{'p95 ms':>9}{'cached p95':>12}")
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rows = []
+            for label, filters in MODES:
+                # First pass with cold caches, second pass served from the result LRU.
+                cold = [timed(lambda: db.semantic_search(query, 5, **filters)) for query in queries]
+                warm = [timed(lambda: db.semantic_search(query, 5, **filters)) for query in queries]
+                rows.append((label, cold, warm))
+
+            # Unseen queries, so neither cache helps: one call per query
+            # versus one embedding pass and store round trip per batch.
+            fresh = make_queries(args.queries * 3)[args.queries:]
+            single = [timed(lambda: db.semantic_search(query, 5)) for query in fresh[:args.queries]]
+            batched = []
+            for start in range(args.queries, len(fresh), args.batch):
+                batch = fresh[start:start + args.batch]
+                batched.append(timed(lambda: db.semantic_search_many(batch, 5)) / len(batch))
+
+    for label, cold, warm in rows:
+        print(f"{label:28}{statistics.median(cold) * 1000:>9.1f}{percentile(cold, 0.95) * 1000:>9.1f}"
+              f"{percentile(warm, 0.95) * 1000:>12.2f}")
+    print(f"{'unseen, one at a time':28}{statistics.median(single) * 1000:>9.1f}"
+          f"{percentile(single, 0.95) * 1000:>9.1f}")
+    print(f"{f'unseen, batches of {args.batch}':28}{statistics.median(batched) * 1000:>9.1f}"
+          f"{percentile(batched, 0.95) * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from rich.console import Console
+
+import config
+import instrumentation
+import main_workflow
+from benchmarks.corpus import make_chapter
+from benchmarks.e2e_bench import use_hash_embedder, use_temp_paths
+from benchmarks.fake_model import FakeGenerativeModel
+from instrumentation import Tracer
+from reviewer_agent import ReviewerAgent
+from workflow_context import WorkflowContext
+from writer_agent import WriterAgent
+
+# (label, speculation enabled, operator takes the prepared rewrite)
+MODES = [
+    ("feedback rewrite, no speculation", False, False),
+    ("feedback rewrite, speculation on", True, False),
+    ("prepared rewrite", True, True),
+]
+
+
+class ScriptedOperator:
+    # Stands in for the rich prompts: reads each displayed version for
+    # `read_seconds`, asks for a rewrite `turns` times, then quits.
+
+    def __init__(self, read_seconds: float, turns: int, take_prepared: bool):
+        self.read_seconds = read_seconds
+        self.turns = turns
+        self.take_prepared = take_prepared
+
+    def ask(self, prompt: str, **kwargs) -> str:
+        if prompt.startswith("What would you like to do"):
+            time.sleep(self.read_seconds)
+            self.turns -= 1
+            return "rewrite" if self.turns >= 0 else "quit"
+        return "tighten the dialogue"
+
+    def confirm(self, prompt: str, **kwargs) -> bool:
+        return self.take_prepared if prompt.startswith("Use the best") else False
+
+
+def bench(args, mode: tuple, read_seconds: float) -> dict:
+    label, enabled, take_prepared = mode
+    config.SPECULATION_ENABLED = enabled
+    config.SPECULATIVE_CANDIDATES = args.candidates
+    operator = ScriptedOperator(read_seconds, args.turns, take_prepared)
+    main_workflow.Prompt = SimpleNamespace(ask=operator.ask)
+    main_workflow.Confirm = SimpleNamespace(ask=operator.confirm)
+
+    tracer = Tracer()
+    previous = instrumentation.set_tracer(tracer)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            use_temp_paths(tmp)
+            writer = WriterAgent(model=FakeGenerativeModel(args.latency, output_chars=args.chars))
+            reviewer = ReviewerAgent(model=FakeGenerativeModel(args.latency, output_chars=args.chars, seed=1))
+            ctx = WorkflowContext(writer=writer, reviewer=reviewer, book="bench", chapter="hitl")
+            ctx.db_manager.store_version(make_chapter(args.chars), {
+                "version": 1, "status": "original", "book": "bench", "chapter": "hitl"
+            })
+            while main_workflow.run_human_in_the_loop(ctx):
+                pass
+            if enabled:
+                ctx.speculator.shutdown()
+    finally:
+        instrumentation.set_tracer(previous)
+
+    row = next(row for row in tracer.summary() if row["span"] == "hitl.response")
+    return {"label": label, "read": read_seconds, "p50": row["p50"], "max": row["max"], "calls": writer.client.model.calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceived HITL rewrite latency with and without speculation.")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--read", type=float, nargs="+", default=[0.0, 1.0, 3.0],
+                        help="Seconds the operator spends reading each version.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per fake model call.")
+    parser.add_argument("--chars", type=int, default=4000)
+    parser.add_argument("--candidates", type=int, default=2, help="Rewrites sampled per turn when speculating.")
+    args = parser.parse_args()
+
+    use_hash_embedder()
+    main_workflow.console = Console(quiet=True)
+    rows = []
+    for read_seconds in args.read:
+        for mode in MODES:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                rows.append(bench(args, mode, read_seconds))
+
+    print(f"\n{args.turns} rewrite turns, {args.latency}s per model call")
+    print(f"{'mode':36}{'read':>7}{'p50':>9}{'max':>9}{'writer calls':>14}")
+    for row in rows:
+        print(f"{row['label']:36}{row['read']:>6.1f}s{row['p50']:>8.2f}s{row['max']:>8.2f}s{row['calls']:>14}")
+
+
+if __name__ == "__main__":
+    main()
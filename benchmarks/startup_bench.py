@@ -0,0 +1,80 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import config
+
+MODULES = ("main_workflow", "ChromaDB", "writer_agent", "scraper_agent", "voice_interface")
+
+
+def cold_import(module: str, runs: int) -> float:
+    # Median wall time of `import module` in a fresh interpreter, minus the
+    # interpreter's own startup.
+    def timed(code: str) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    baseline = statistics.median(timed("pass") for _ in range(runs))
+    return statistics.median(timed(f"import {module}") for _ in range(runs)) - baseline
+
+
+def use_temp_store(directory: str):
+    config.CHROMA_DB_PATH = directory
+    config.VERSION_CATALOG_PATH = os.path.join(directory, "version_catalog.sqlite3")
+    config.EMBEDDING_CACHE_PATH = os.path.join(directory, "embeddings.sqlite3")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start and per-loop setup cost of the workflow.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--loops", type=int, default=20, help="HITL rewrite loops to simulate.")
+    args = parser.parse_args()
+
+    print("\nCold import (fresh interpreter, median):")
+    for module in MODULES:
+        print(f"  {module:16} {cold_import(module, args.runs) * 1000:8.1f} ms")
+
+    # Agents run on the local fake model, so the benchmark needs neither an
+    # API key nor the network; no request is ever sent.
+    config.RESPONSE_CACHE_ENABLED = False
+
+    from benchmarks.e2e_bench import use_hash_embedder
+    from benchmarks.fake_model import FakeGenerativeModel
+    from workflow_context import WorkflowContext
+    from writer_agent import WriterAgent
+    from reviewer_agent import ReviewerAgent
+
+    use_hash_embedder()
+    model = FakeGenerativeModel(latency=0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_store(tmp)
+        start = time.perf_counter()
+        ctx = WorkflowContext(writer=WriterAgent(model=model), reviewer=ReviewerAgent(model=model))
+        ctx.db_manager.get_latest_version()
+        resume = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.loops):
+            WriterAgent(model=model)
+            ReviewerAgent(model=model)
+        fresh = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.loops):
+            ctx.writer
+            ctx.reviewer
+        reused = time.perf_counter() - start
+
+    print(f"\nOpen store + get_latest_version: {resume * 1000:8.1f} ms")
+    print(f"Agent setup over {args.loops} loops:")
+    print(f"  fresh agents per loop: {fresh * 1000:8.1f} ms")
+    print(f"  reused via context:    {reused * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
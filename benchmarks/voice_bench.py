@@ -0,0 +1,82 @@
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+
+import config
+import voice_interface
+from voice_interface import LocalVoiceEngine
+
+PROMPT = "Please provide feedback for the AI Writer. You can speak or type."
+
+
+def make_engine(args, turns: int) -> LocalVoiceEngine:
+    return LocalVoiceEngine(
+        responses=["make the dialogue snappier"] * turns,
+        synthesis_latency=args.synthesis,
+        calibration_latency=args.calibration,
+        listen_latency=args.listen,
+    )
+
+
+def per_call_turns(args) -> list:
+    # The previous behaviour: every turn calibrates and synthesizes the prompt.
+    engine = make_engine(args, args.turns)
+    times = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/temp_audio.mp3"
+        for _ in range(args.turns):
+            start = time.perf_counter()
+            engine.calibrate(config.VOICE_CALIBRATION_SECONDS)
+            engine.synthesize(PROMPT, path)
+            engine.play(path)
+            engine.listen(10, 15)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def session_turns(args, warm: bool) -> list:
+    engine = make_engine(args, args.turns)
+    session = voice_interface.set_engine(engine)
+    if warm:
+        voice_interface.warm_up([PROMPT]).join()
+        session.ensure_calibrated()
+    times = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        voice_interface.listen_for_input(PROMPT)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice turn latency with a local stand-in engine.")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--synthesis", type=float, default=0.3, help="Seconds per synthesized phrase.")
+    parser.add_argument("--calibration", type=float, default=1.0, help="Seconds per ambient-noise calibration.")
+    parser.add_argument("--listen", type=float, default=0.5, help="Seconds until the reply is recognized.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.VOICE_CACHE_DIR = tmp
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = [
+                ("calibrate + synthesize per turn", per_call_turns(args)),
+                ("session, cold cache", session_turns(args, warm=False)),
+            ]
+        with tempfile.TemporaryDirectory() as warm_tmp:
+            config.VOICE_CACHE_DIR = warm_tmp
+            with contextlib.redirect_stdout(io.StringIO()):
+                rows.append(("session, pre-synthesized + calibrated", session_turns(args, warm=True)))
+
+    print(f"\n{args.turns} voice turns (synthesis {args.synthesis}s, calibration {args.calibration}s, "
+          f"recognition {args.listen}s)")
+    for label, times in rows:
+        print(f"{label:40} first {times[0]:6.2f}s  median {statistics.median(times):6.2f}s  "
+              f"total {sum(times):7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+import zipfile
+
+import config
+from instrumentation import annotate, traced
+
+FORMATS = ("epub", "md", "txt")
+
+# File extension of the per-chapter files each format is assembled from.
+CHAPTER_EXTENSIONS = {"epub": "xhtml", "md": "md", "txt": "txt"}
+
+STATE_FILE = "export_state.json"
+
+CONTAINER_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+    '  <rootfiles>\n'
+    '    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>\n'
+    '  </rootfiles>\n'
+    '</container>\n'
+)
+
+
+def paragraphs(text: str) -> list:
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+def render_markdown(title: str, text: str) -> str:
+    return f"# {title}\n\n{text.strip()}\n"
+
+
+def render_text(title: str, text: str) -> str:
+    return f"{title}\n{'=' * len(title)}\n\n{text.strip()}\n"
+
+
+def render_xhtml(title: str, text: str) -> str:
+    body = "\n".join(f"<p>{html.escape(p).replace(chr(10), '<br/>')}</p>" for p in paragraphs(text))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+        f'<head><title>{html.escape(title)}</title></head>\n'
+        f'<body>\n<h1>{html.escape(title)}</h1>\n{body}\n</body>\n</html>\n'
+    )
+
+
+RENDERERS = {"epub": render_xhtml, "md": render_markdown, "txt": render_text}
+
+
+def chapter_filename(chapter: str, fmt: str) -> str:
+    # Readable stem plus a hash of the exact chapter id, so ids that only
+    # differ in characters the stem replaces ("ch 1" and "ch_1") never share
+    # a file.
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", chapter)
+    digest = hashlib.sha1(chapter.encode("utf-8")).hexdigest()[:8]
+    return f"{stem}-{digest}.{CHAPTER_EXTENSIONS[fmt]}"
+
+
+def chapter_title(chapter: str) -> str:
+    return chapter.replace("-", " ").replace("_", " ").strip().title()
+
+
+class BookExporter:
+    # Publishes a book's approved chapter versions. Chapters are read from
+    # the catalog a page at a time and each one is rendered to its own file
+    # under EXPORT_DIR/<book>/<format>/; the book file is then assembled by
+    # streaming those files in reading order. An export state file records
+    # the stored version (doc_id and creation time) behind every chapter
+    # file, so a re-export only fetches and renders chapters whose approved
+    # version changed, and a different catalog never reuses stale files.
+
+    def __init__(self, db_manager, directory: str = None, page_size: int = None):
+        self.db_manager = db_manager
+        self.directory = directory or config.EXPORT_DIR
+        self.page_size = page_size or config.EXPORT_PAGE_SIZE
+
+    def _load_state(self, path: str) -> dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self, path: str, state: dict):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    @traced("export.book")
+    def export(self, book: str = None, fmt: str = "epub") -> dict:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'. Choose one of: {', '.join(FORMATS)}.")
+        book = book or config.DEFAULT_BOOK_ID
+        start = time.perf_counter()
+        chapter_dir = os.path.join(self.directory, book, fmt)
+        os.makedirs(chapter_dir, exist_ok=True)
+        state_path = os.path.join(chapter_dir, STATE_FILE)
+        previous = self._load_state(state_path)
+
+        # Only (chapter, file) pairs are kept for the whole book; chapter
+        # texts live for one page at most.
+        order, state, rendered = [], {}, 0
+        render = RENDERERS[fmt]
+        for page in self.db_manager.iter_approved(book, self.page_size):
+            stale = []
+            for row in page:
+                filename = chapter_filename(row['chapter'], fmt)
+                entry = previous.get(row['chapter'])
+                source = {"doc_id": row['doc_id'], "created_at": row['created_at']}
+                unchanged = (entry and all(entry.get(key) == value for key, value in source.items())
+                             and entry["file"] == filename and os.path.exists(os.path.join(chapter_dir, filename)))
+                if not unchanged:
+                    stale.append(row)
+                order.append((row['chapter'], filename))
+                state[row['chapter']] = dict(source, version=row['version'], file=filename)
+
+            texts = self.db_manager.get_texts(stale)
+            for row in stale:
+                text = texts.get(row['doc_id'])
+                if text is None:
+                    raise ValueError(f"Approved version {row['version']} of {book}/{row['chapter']} is missing.")
+                path = os.path.join(chapter_dir, state[row['chapter']]["file"])
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(render(chapter_title(row['chapter']), text))
+                os.replace(path + ".tmp", path)
+                rendered += 1
+            del texts
+
+        # Files of chapters that are no longer approved (or were renamed) are
+        # dropped from the output; a file still in use is never removed.
+        live = {filename for _, filename in order}
+        for entry in previous.values():
+            path = os.path.join(chapter_dir, entry["file"])
+            if entry["file"] not in live and os.path.exists(path):
+                os.remove(path)
+        self._save_state(state_path, state)
+
+        if not order:
+            print(f"No approved chapters to export for '{book}'.")
+            return {"book": book, "format": fmt, "path": None, "chapters": 0, "rendered": 0,
+                    "bytes": 0, "seconds": time.perf_counter() - start}
+
+        output = os.path.join(self.directory, book, f"{book}.{fmt}")
+        if fmt == "epub":
+            self._write_epub(output, book, chapter_dir, order)
+        else:
+            self._concatenate(output, chapter_dir, order)
+
+        result = {
+            "book": book, "format": fmt, "path": output, "chapters": len(order), "rendered": rendered,
+            "bytes": os.path.getsize(output), "seconds": time.perf_counter() - start,
+        }
+        annotate(chapters=result["chapters"], rendered=rendered, bytes_written=result["bytes"])
+        print(f"Exported {len(order)} chapters of '{book}' to '{output}' ({rendered} re-rendered).")
+        return result
+
+    def _concatenate(self, output: str, chapter_dir: str, order: list):
+        with open(output + ".tmp", "wb") as out:
+            for i, (_, filename) in enumerate(order):
+                if i:
+                    out.write(b"\n")
+                with open(os.path.join(chapter_dir, filename), "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(output + ".tmp", output)
+
+    def _write_epub(self, output: str, book: str, chapter_dir: str, order: list):
+        # EPUB 3: the uncompressed mimetype entry must come first; chapter
+        # files are streamed into the archive, and the package document and
+        # navigation are written last, once the reading order is known.
+        with zipfile.ZipFile(output + ".tmp", "w", zipfile.ZIP_DEFLATED) as epub:
+            epub.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            epub.writestr("META-INF/container.xml", CONTAINER_XML)
+            for _, filename in order:
+                epub.write(os.path.join(chapter_dir, filename), f"OEBPS/text/{filename}")
+            epub.writestr("OEBPS/nav.xhtml", self._nav(book, order))
+            epub.writestr("OEBPS/content.opf", self._package(book, order))
+        os.replace(output + ".tmp", output)
+
+    def _nav(self, book: str, order: list) -> str:
+        items = "\n".join(
+            f'<li><a href="text/{filename}">{html.escape(chapter_title(chapter))}</a></li>'
+            for chapter, filename in order
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<!DOCTYPE html>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+            f'<head><title>{html.escape(book)}</title></head>\n'
+            f'<body>\n<nav epub:type="toc" id="toc"><h1>Contents</h1>\n<ol>\n{items}\n</ol></nav>\n</body>\n</html>\n'
+        )
+
+    def _package(self, book: str, order: list) -> str:
+        manifest = "\n".join(
+            f'<item id="c{i}" href="text/{filename}" media-type="application/xhtml+xml"/>'
+            for i, (_, filename) in enumerate(order)
+        )
+        spine = "\n".join(f'<itemref idref="c{i}"/>' for i in range(len(order)))
+        identifier = uuid.uuid5(uuid.NAMESPACE_URL, f"book-workflow:{book}")
+        modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="book-id">urn:uuid:{identifier}</dc:identifier>\n'
+            f'<dc:title>{html.escape(book)}</dc:title>\n'
+            f'<dc:language>{config.EXPORT_LANGUAGE}</dc:language>\n'
+            f'<meta property="dcterms:modified">{modified}</meta>\n'
+            '</metadata>\n'
+            f'<manifest>\n<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+            f'{manifest}\n</manifest>\n'
+            f'<spine>\n{spine}\n</spine>\n'
+            '</package>\n'
+        )
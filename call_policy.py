@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+from collections import deque
+
+import config
+
+# Exception class names (google.api_core and common HTTP clients) that mark
+# a transient failure worth retrying, and a rate-limit rejection.
+RETRYABLE_ERRORS = {
+    "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "Aborted", "Unknown",
+    "GatewayTimeout", "BadGateway", "ServerError", "ConnectError", "ReadTimeout",
+}
+RATE_LIMIT_ERRORS = {"ResourceExhausted", "TooManyRequests", "RateLimitError"}
+RETRYABLE_CODES = {500, 502, 503, 504}
+
+
+class AttemptTimeout(TimeoutError):
+    # One attempt ran past MODEL_ATTEMPT_TIMEOUT; the call may still retry.
+    pass
+
+
+class LimiterTimeout(AttemptTimeout):
+    # No local rate-limiter slot came free in time. This is congestion in
+    # this process, not a sign of trouble at the endpoint, so it is retried
+    # but never counted against the circuit breaker.
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    # The whole call, retries included, ran out of MODEL_CALL_DEADLINE.
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def _code(error) -> int:
+    code = getattr(error, "code", None)
+    code = code() if callable(code) else code
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit(error) -> bool:
+    return _code(error) == 429 or type(error).__name__ in RATE_LIMIT_ERRORS
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if is_rate_limit(error) or isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return _code(error) in RETRYABLE_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def backoff_delay(attempt: int, rate_limited: bool) -> float:
+    # Exponential backoff with jitter. Transient errors use full jitter;
+    # rate-limit rejections start from a longer base and always wait at
+    # least half of it, since retrying early only gets rejected again.
+    if rate_limited:
+        ceiling = min(config.MODEL_RETRY_MAX_DELAY, config.MODEL_RATE_LIMIT_DELAY * 2 ** attempt)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+    ceiling = min(config.MODEL_RETRY_MAX_DELAY, config.MODEL_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive transient failures, so a
+    # dead endpoint fails calls at once instead of making each of them wait
+    # out its retries. After `reset_timeout` seconds one probe call is let
+    # through; its outcome closes the circuit or re-opens it. A probe that
+    # ends without a verdict (a rate limit or a non-transient error) is
+    # released, so the next call probes instead.
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        self.failure_threshold = config.MODEL_BREAKER_FAILURES if failure_threshold is None else failure_threshold
+        self.reset_timeout = config.MODEL_BREAKER_RESET if reset_timeout is None else reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def before_call(self) -> bool:
+        # Raises CircuitOpenError while open; returns True when this call is
+        # the half-open probe.
+        if not self.failure_threshold:
+            return False
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return False
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return True
+            raise CircuitOpenError(f"model circuit is open after {self.failures} consecutive failures")
+
+    def release_probe(self):
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class LatencyWindow:
+    # Recent successful attempt latencies, used to time hedged requests.
+
+    def __init__(self, size: int = None):
+        self._samples = deque(maxlen=size or config.MODEL_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_delay(self) -> float:
+        # p95 of recent attempts, or None until there are enough samples.
+        with self._lock:
+            if len(self._samples) < config.MODEL_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return max(config.MODEL_HEDGE_MIN_DELAY, ordered[int(0.95 * (len(ordered) - 1))])
+
+
+_breakers = {}
+_latencies = {}
+_registry_lock = threading.Lock()
+
+
+def breaker_for(model_name: str) -> CircuitBreaker:
+    # Agents calling the same model share one breaker and latency window.
+    with _registry_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker()
+        return _breakers[model_name]
+
+
+def latencies_for(model_name: str) -> LatencyWindow:
+    with _registry_lock:
+        if model_name not in _latencies:
+            _latencies[model_name] = LatencyWindow()
+        return _latencies[model_name]
+
+
+def reset():
+    # Forgets all breaker and latency state (e.g. between benchmark runs).
+    with _registry_lock:
+        _breakers.clear()
+        _latencies.clear()
@@ -0,0 +1,135 @@
+import re
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+import config
+
+# Scene breaks ("* * *", "***", "---") are preferred split points over plain
+# paragraph breaks.
+SCENE_BREAK = re.compile(r"^\s*(\*\s*){3,}\s*$|^\s*-{3,}\s*$")
+
+
+@dataclass
+class Window:
+    index: int
+    body: str
+    context_before: str = ""
+    context_after: str = ""
+
+
+def split_paragraphs(text: str) -> list:
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+")
+
+
+def _fit(paragraph: str, max_chars: int) -> list:
+    # Splits a paragraph longer than `max_chars` into pieces that fit,
+    # packing whole sentences where possible and cutting an over-long
+    # sentence at the last space before the limit (or at the limit itself).
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    sentences, start = [], 0
+    for match in SENTENCE_END.finditer(paragraph):
+        sentences.append(paragraph[start:match.end()].strip())
+        start = match.end()
+    sentences.append(paragraph[start:].strip())
+
+    pieces, current = [], ""
+    for sentence in filter(None, sentences):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars + 1)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut].rstrip())
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_windows(text: str, max_chars: int = None, overlap: int = None) -> list:
+    # Groups whole paragraphs into windows of at most `max_chars` characters,
+    # closing a window early at a scene break once it is at least half full.
+    # Each window carries `overlap` neighbouring paragraphs on either side as
+    # read-only context so the rewrite stays continuous across seams. A
+    # paragraph longer than `max_chars` is first split at sentence boundaries,
+    # so no window (and no single model call) exceeds the budget; its pieces
+    # come back as separate paragraphs.
+    max_chars = max_chars or config.CHUNK_MAX_CHARS
+    overlap = config.CHUNK_OVERLAP_PARAGRAPHS if overlap is None else overlap
+    paragraphs = [piece for paragraph in split_paragraphs(text) for piece in _fit(paragraph, max_chars)]
+
+    groups, current, size = [], [], 0
+    for paragraph in paragraphs:
+        if current and size + len(paragraph) > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+        if SCENE_BREAK.match(paragraph) and size >= max_chars // 2:
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+
+    windows, start = [], 0
+    for i, group in enumerate(groups):
+        end = start + len(group)
+        windows.append(Window(
+            index=i,
+            body="\n\n".join(group),
+            context_before="\n\n".join(paragraphs[max(0, start - overlap):start]) if overlap else "",
+            context_after="\n\n".join(paragraphs[end:end + overlap]) if overlap else ""
+        ))
+        start = end
+    return windows
+
+
+def _similar(a: str, b: str) -> bool:
+    a, b = " ".join(a.split()).lower(), " ".join(b.split()).lower()
+    if a == b:
+        return True
+    return SequenceMatcher(None, a, b, autojunk=False).ratio() >= config.CHUNK_SEAM_SIMILARITY
+
+
+def stitch(parts: list, windows: list = None) -> str:
+    # Joins rewritten windows. Models sometimes echo the context they were
+    # given, so leading/trailing paragraphs of a part that repeat its window's
+    # preceding/following context are dropped at each seam.
+    stitched = []
+    for i, part in enumerate(parts):
+        paragraphs = split_paragraphs(part)
+        if windows:
+            before = split_paragraphs(windows[i].context_before)
+            after = split_paragraphs(windows[i].context_after)
+            while paragraphs and any(_similar(paragraphs[0], seen) for seen in before):
+                paragraphs.pop(0)
+            while paragraphs and any(_similar(paragraphs[-1], seen) for seen in after):
+                paragraphs.pop()
+        stitched.extend(paragraphs)
+    return "\n\n".join(stitched)
+
+
+def contextual_prompt(prompt: str, window: Window, total: int) -> str:
+    # Wraps an agent prompt for one window with its neighbouring context.
+    if total <= 1:
+        return prompt
+    preamble = (
+        f"The text below is part {window.index + 1} of {total} of a longer chapter. "
+        "Work ONLY on that part. Any surrounding text is given for continuity and "
+        "must not appear in your output.\n\n"
+    )
+    if window.context_before:
+        preamble += f"Preceding text (context only):\n---\n{window.context_before}\n---\n\n"
+    following = ""
+    if window.context_after:
+        following = f"\n\n---\nFollowing text (context only):\n{window.context_after}"
+    return f"{preamble}{prompt}{following}"
@@ -16,6 +16,24 @@ CHROMA_DB_PATH = "./db"
 
 CHROMA_COLLECTION_NAME = "book_versions"
 
+# Sidecar SQLite index of every stored version (book/chapter/version, status,
+# lineage and a latest-version pointer), so lookups never scan the collection.
+VERSION_CATALOG_PATH = os.path.join(CHROMA_DB_PATH, "version_catalog.sqlite3")
+
+# Passage Index
+# Each stored version is also split into passages of at most PASSAGE_MAX_CHARS
+# and indexed in a separate collection for semantic search. Passage embeddings
+# are memoized by content hash in EMBEDDING_CACHE_PATH.
+PASSAGE_INDEX_ENABLED = True
+CHROMA_PASSAGE_COLLECTION_NAME = "book_passages"
+EMBEDDING_CACHE_PATH = os.path.join(CHROMA_DB_PATH, "embedding_cache.sqlite3")
+PASSAGE_MAX_CHARS = 1000
+PASSAGE_BATCH_SIZE = 64
+
+# Book and chapter keys used when a version's metadata does not name them.
+DEFAULT_BOOK_ID = "default"
+DEFAULT_CHAPTER_ID = "chapter"
+
 
 
 # These weights are used in our reward function to score
@@ -36,3 +54,213 @@ NOISE_WORDS = ["menu", "search", "login", "portal", "navigation", "edit"]
 # The minimum acceptable reward score. If a scrape's score falls below
 # this threshold, the system will flag it as potentially low quality.
 REWARD_THRESHOLD = 70.0 
+
+
+# Batch Ingestion Configuration
+# Upper bound on the number of pages fetched at the same time from the
+# shared browser, and on how many of those may target the same host.
+SCRAPER_MAX_CONCURRENCY = 8
+SCRAPER_PER_HOST_LIMIT = 4
+
+# Screenshots
+# Browser scrapes can save a screenshot per chapter under SCREENSHOT_DIR,
+# named by the hash of the page text so an unchanged page is never captured
+# twice. SCREENSHOT_FORMAT is "png", "jpeg" or "webp" (quality applies to the
+# lossy formats); SCREENSHOT_FULL_PAGE = False captures only the viewport.
+# Pages served by the HTTP fast path never start the browser, so with
+# HTTP_FAST_PATH_ENABLED most static chapters (e.g. Wikisource) are stored
+# without a screenshot; turn the fast path off to capture every page.
+SCREENSHOTS_ENABLED = True
+SCREENSHOT_DIR = "./screenshots"
+SCREENSHOT_FORMAT = "jpeg"
+SCREENSHOT_QUALITY = 70
+SCREENSHOT_FULL_PAGE = False
+
+# Model Call Limits
+# Shared across every Writer/Reviewer call so concurrent chapters stay inside
+# the API quota. MODEL_MAX_IN_FLIGHT bounds simultaneous requests.
+MODEL_REQUESTS_PER_MINUTE = 15
+MODEL_TOKENS_PER_MINUTE = 1000000
+MODEL_MAX_IN_FLIGHT = 4
+
+# Response Cache Configuration
+# Gemini responses are cached on disk keyed by a hash of the prompt, model
+# name and generation config. Entries are evicted least-recently-used once
+# the cache exceeds RESPONSE_CACHE_MAX_BYTES, or when older than
+# RESPONSE_CACHE_MAX_AGE seconds.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_PATH = "./cache/responses.sqlite3"
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESPONSE_CACHE_MAX_AGE = 30 * 24 * 3600
+
+# When True, agents sampling with temperature > 0 skip the cache so every
+# run produces fresh output.
+RESPONSE_CACHE_BYPASS_SAMPLED = False
+
+# Stream model output to the terminal as it is generated instead of waiting
+# for the full response.
+STREAM_RESPONSES = True
+
+# Chunked Rewriting
+# Chapters longer than CHUNKING_THRESHOLD_CHARS are split at paragraph/scene
+# boundaries into windows of at most CHUNK_MAX_CHARS, rewritten in parallel
+# and stitched back together. Keep CHUNK_MAX_CHARS comfortably inside the
+# model's output budget (roughly 4 characters per token).
+CHUNKING_THRESHOLD_CHARS = 16000
+CHUNK_MAX_CHARS = 12000
+CHUNK_OVERLAP_PARAGRAPHS = 1
+CHUNK_SEAM_SIMILARITY = 0.9
+CHUNK_MAX_WORKERS = 4
+
+# Delta Storage
+# When enabled, each version is stored as a compressed line diff against its
+# source_version, with a full snapshot every DELTA_SNAPSHOT_INTERVAL versions
+# along a lineage. Only the changed text is written to (and embedded by)
+# ChromaDB; full texts are rebuilt from the catalog on read.
+DELTA_STORAGE_ENABLED = False
+DELTA_SNAPSHOT_INTERVAL = 10
+DELTA_CACHE_SIZE = 64
+
+# HTTP Fast Path
+# Static pages are first fetched with a plain pooled HTTP client and parsed
+# locally; the headless browser is only used when that result scores below
+# REWARD_THRESHOLD. ETag/Last-Modified validators and extracted text are kept
+# in HTTP_CACHE_DIR so unchanged chapters revalidate with a 304.
+HTTP_FAST_PATH_ENABLED = True
+HTTP_CACHE_DIR = "./cache/http"
+HTTP_TIMEOUT = 30.0
+HTTP_USER_AGENT = "Automated-Book-Publication-Workflow/1.0"
+
+# Instrumentation
+# Spans (agent runs, model calls, DB reads/writes, voice) are always summed
+# in memory as bounded per-span histograms. With BOOK_WORKFLOW_TRACE=1 in the
+# environment, or with `--profile`, every span is also appended to TRACE_PATH
+# as JSON lines (rotated to TRACE_PATH.1 past TRACE_MAX_BYTES), and per-span
+# totals plus cache hit rates are written to METRICS_TEXTFILE_PATH in the
+# Prometheus textfile format on exit. `--profile` also prints a per-stage
+# breakdown; `--profile-dump` saves a cProfile of the slowest stage.
+TRACE_ENABLED = os.getenv("BOOK_WORKFLOW_TRACE", "").lower() in ("1", "true", "yes")
+TRACE_MAX_BYTES = 50 * 1024 * 1024
+TRACE_PATH = "./traces/trace.jsonl"
+METRICS_TEXTFILE_PATH = "./traces/book_workflow.prom"
+PROFILE_DUMP_PATH = "./traces/slowest_stage.prof"
+
+# Batch Mode
+# `python main_workflow.py --batch MANIFEST` queues one scrape -> spin ->
+# review job per chapter in JOB_QUEUE_PATH and runs them headlessly on
+# BATCH_MAX_WORKERS threads. Failed stages are retried with exponential
+# backoff from JOB_RETRY_BACKOFF seconds, up to JOB_MAX_ATTEMPTS times. Jobs
+# are leased for JOB_LEASE_SECONDS (renewed while the run is alive), so a
+# killed run's chapters are picked up again by the next one; on the same
+# host, the next run sees the dead process and takes them back at once.
+JOB_QUEUE_PATH = os.path.join(CHROMA_DB_PATH, "job_queue.sqlite3")
+BATCH_MAX_WORKERS = 4
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 30.0
+JOB_LEASE_SECONDS = 120
+JOB_POLL_INTERVAL = 1.0
+
+# Voice
+# Synthesized phrases are cached in VOICE_CACHE_DIR by content hash, and the
+# workflow's fixed prompts are pre-synthesized in the background at startup.
+# The recognizer is calibrated once per session and re-calibrated in the
+# background after VOICE_RECALIBRATE_AFTER seconds. VOICE_ENGINE = "local"
+# swaps gTTS/Google recognition for an offline stand-in that reads typed input.
+VOICE_ENGINE = "google"
+VOICE_LANGUAGE = "en"
+VOICE_CACHE_ENABLED = True
+VOICE_CACHE_DIR = "./cache/voice"
+VOICE_CALIBRATION_SECONDS = 1.0
+VOICE_RECALIBRATE_AFTER = 300
+
+# Speculative HITL
+# While the operator reads a version at the HITL prompt, its passages are
+# embedded for search and SPECULATIVE_CANDIDATES feedback-free rewrites are
+# sampled in the background; the best one by reward score is pre-reviewed so
+# "rewrite" can take it at once. Unused work is cancelled when the operator
+# answers. Off by default. Each candidate is an extra model call per HITL
+# turn, so with the default SPECULATIVE_CANDIDATES = 0 nothing is generated
+# ahead of time: speculation only pre-indexes the displayed version, which
+# speeds up search but not "rewrite". Raise it (e.g. to 2) to pre-generate.
+SPECULATION_ENABLED = False
+SPECULATIVE_CANDIDATES = 0
+SPECULATION_MAX_WORKERS = 3
+
+# Semantic Search
+# Query embeddings and search results are kept in in-memory LRU caches of
+# SEARCH_CACHE_SIZE entries; cached results are dropped whenever a version is
+# stored. SEARCH_LATEST_ONLY skips hits from superseded versions and
+# SEARCH_ONE_PER_CHAPTER keeps only the best hit per chapter (callers can
+# override both). Collapsing first fetches SEARCH_OVERFETCH times the
+# requested hits and asks for more when that is not enough.
+SEARCH_CACHE_SIZE = 256
+SEARCH_LATEST_ONLY = False
+SEARCH_ONE_PER_CHAPTER = False
+SEARCH_OVERFETCH = 4
+
+# Export
+# `python main_workflow.py --export epub|md|txt [--book BOOK]` publishes each
+# chapter's approved version under EXPORT_DIR/<book>/. Chapters are read
+# EXPORT_PAGE_SIZE at a time, and a re-export only re-renders chapters whose
+# approved version changed since the last export in that format.
+EXPORT_DIR = "./exports"
+EXPORT_PAGE_SIZE = 50
+EXPORT_LANGUAGE = "en"
+
+# Fused Spin + Review
+# With FUSED_SPIN_REVIEW = True a rewrite pass is a single model call that
+# returns the spun draft, the review notes and the revised chapter, instead
+# of a writer call followed by a reviewer call. Both versions are still
+# stored for lineage. Chapters above CHUNKING_THRESHOLD_CHARS keep the
+# chunked two-stage path, a response without a revised chapter has its
+# draft reviewed by a separate call, and a failed call falls back to both.
+FUSED_SPIN_REVIEW = False
+FUSED_TEMPERATURE = 0.6
+
+# Model Call Resilience
+# Every model call runs under MODEL_CALL_DEADLINE seconds in total, and each
+# attempt under MODEL_ATTEMPT_TIMEOUT (for streamed calls, the longest wait
+# for the next chunk); None disables either limit. Transient
+# errors and timeouts are retried up to MODEL_MAX_RETRIES times with jittered
+# exponential backoff from MODEL_RETRY_BASE_DELAY; rate-limit rejections back
+# off from the longer MODEL_RATE_LIMIT_DELAY. With MODEL_HEDGING_ENABLED, an
+# attempt still running after the p95 of the last MODEL_LATENCY_WINDOW
+# attempts gets a duplicate request and the first answer wins (this spends
+# quota, so it is off by default). After MODEL_BREAKER_FAILURES consecutive
+# transient failures the circuit opens and calls fail at once for
+# MODEL_BREAKER_RESET seconds; 0 disables the breaker.
+MODEL_CALL_DEADLINE = 300.0
+MODEL_ATTEMPT_TIMEOUT = 120.0
+MODEL_MAX_RETRIES = 3
+MODEL_RETRY_BASE_DELAY = 1.0
+MODEL_RETRY_MAX_DELAY = 30.0
+MODEL_RATE_LIMIT_DELAY = 10.0
+MODEL_HEDGING_ENABLED = False
+MODEL_HEDGE_MIN_SAMPLES = 20
+MODEL_HEDGE_MIN_DELAY = 1.0
+MODEL_LATENCY_WINDOW = 100
+MODEL_BREAKER_FAILURES = 5
+MODEL_BREAKER_RESET = 30.0
+
+# Near-Duplicate Detection
+# Every stored version gets a MinHash signature over FINGERPRINT_SHINGLE_WORDS-
+# word shingles. A scraped chapter whose text is at least
+# FINGERPRINT_THRESHOLD similar to a stored original is not stored again, and
+# spin/review stages whose input matches a version that already has that
+# stage's output reuse it instead of calling the model. Lines matching
+# FINGERPRINT_NOISE_PATTERNS (page chrome) are ignored when fingerprinting.
+# Off by default: a near-duplicate is treated as the same chapter and its
+# stored outputs are reused, which is only safe for sources that re-serve the
+# same text.
+FINGERPRINT_ENABLED = False
+FINGERPRINT_THRESHOLD = 0.9
+FINGERPRINT_SHINGLE_WORDS = 5
+FINGERPRINT_PERMUTATIONS = 128
+FINGERPRINT_NOISE_PATTERNS = [
+    r"^\s*(previous|next)( chapter| page)?\b",
+    r"^\s*jump to (navigation|search)",
+    r"^\s*retrieved from\b",
+    r"this page was last edited",
+    r"^\s*(navigation menu|from wikisource|main menu)\b",
+    r"^\s*\[?\d{1,4}\]?\s*$",
+]
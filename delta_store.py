@@ -0,0 +1,137 @@
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+import config
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+
+def make_delta(base: str, target: str) -> list:
+    # Line-level edit script turning `base` into `target`. Unchanged runs are
+    # stored as ["=", start, end] references into the base lines; everything
+    # else is stored literally as ["+", text].
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", "".join(target_lines[j1:j2])])
+    return ops
+
+
+def apply_delta(base: str, ops: list) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == "=":
+            parts.extend(base_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+
+def changed_text(ops: list) -> str:
+    return "".join(op[1] for op in ops if op[0] == "+")
+
+
+def encode(value) -> bytes:
+    return zlib.compress(json.dumps(value).encode("utf-8"))
+
+
+def decode(payload: bytes):
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+class DeltaStore:
+    # Decides how each version body is stored (snapshot vs. delta against its
+    # source_version) and rebuilds full texts from the catalog, keeping an LRU
+    # cache of recently reconstructed versions. `fetch_document(doc_id)` is
+    # used for versions stored before delta mode, which have no body row.
+
+    def __init__(self, catalog, fetch_document, snapshot_interval: int = None, cache_size: int = None):
+        self.catalog = catalog
+        self.fetch_document = fetch_document
+        self.snapshot_interval = snapshot_interval or config.DELTA_SNAPSHOT_INTERVAL
+        self.cache_size = cache_size or config.DELTA_CACHE_SIZE
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, key: tuple, text: str):
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cached(self, key: tuple) -> str:
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+            return text
+
+    def prepare(self, book: str, chapter: str, version: int, source_version, text: str) -> tuple:
+        # Returns (body, document): the catalog body tuple and the text to
+        # hand to ChromaDB (the full text for snapshots, only the inserted
+        # text for deltas).
+        base_version = None
+        try:
+            base_version = int(source_version)
+        except (TypeError, ValueError):
+            pass
+
+        base_text, depth = None, 0
+        if base_version is not None:
+            base_body = self.catalog.get_body(book, chapter, base_version)
+            depth = (base_body["depth"] if base_body else 0) + 1
+            if depth < self.snapshot_interval:
+                base_text = self.reconstruct(book, chapter, base_version)
+
+        if base_text is None:
+            return (SNAPSHOT, None, 0, encode(text)), text
+
+        ops = make_delta(base_text, text)
+        document = changed_text(ops)
+        if not document.strip():
+            document = f"No textual changes from version {base_version}."
+        return (DELTA, base_version, depth, encode(ops)), document
+
+    def reconstruct(self, book: str, chapter: str, version: int) -> str:
+        # Walks back to the nearest snapshot (or cached/legacy full text) and
+        # replays the deltas forward.
+        pending = []
+        current = version
+        text = None
+        while current is not None:
+            text = self._cached((book, chapter, current))
+            if text is not None:
+                break
+
+            body = self.catalog.get_body(book, chapter, current)
+            if body is None:
+                row = self.catalog.get(book, chapter, current)
+                text = self.fetch_document(row["doc_id"]) if row else None
+                break
+            if body["kind"] == SNAPSHOT:
+                text = decode(body["payload"])
+                break
+            pending.append((current, decode(body["payload"])))
+            current = body["base_version"]
+
+        if text is None:
+            return None
+
+        for pending_version, ops in reversed(pending):
+            text = apply_delta(text, ops)
+            self.remember((book, chapter, pending_version), text)
+        if not pending:
+            self.remember((book, chapter, version), text)
+        return text
@@ -0,0 +1,73 @@
+import functools
+import re
+import zlib
+
+import numpy as np
+
+import config
+
+# Hash functions are (a * x + b) mod MERSENNE_PRIME over 32-bit shingle
+# hashes, as in datasketch; the uint64 products are allowed to wrap.
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_WORD = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=4)
+def _permutations(count: int) -> tuple:
+    # Fixed seed: signatures are persisted, so they must be comparable
+    # across processes.
+    rng = np.random.default_rng(20240611)
+    a = rng.integers(1, MERSENNE_PRIME, size=count, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=count, dtype=np.uint64)
+    return a, b
+
+
+@functools.lru_cache(maxsize=1)
+def _noise_pattern(patterns: tuple):
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE) if patterns else None
+
+
+def words(text: str) -> list:
+    # Lower-cased words with navigation and page chrome lines (matched by
+    # FINGERPRINT_NOISE_PATTERNS) removed, so a re-scrape that differs only
+    # in that noise fingerprints the same.
+    noise = _noise_pattern(tuple(config.FINGERPRINT_NOISE_PATTERNS))
+    lines = text.splitlines()
+    if noise is not None:
+        lines = [line for line in lines if not noise.search(line)]
+    return _WORD.findall("\n".join(lines).lower())
+
+
+def shingles(text: str) -> set:
+    tokens = words(text)
+    size = config.FINGERPRINT_SHINGLE_WORDS
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def signature(text: str) -> np.ndarray:
+    # MinHash signature over word shingles: for each of
+    # FINGERPRINT_PERMUTATIONS hash functions, the smallest hash of any
+    # shingle. The share of positions two signatures agree on estimates the
+    # Jaccard similarity of their shingle sets.
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+    a, b = _permutations(config.FINGERPRINT_PERMUTATIONS)
+    permuted = (np.outer(a, hashes) + b[:, None]) % np.uint64(MERSENNE_PRIME) & np.uint64(MAX_HASH)
+    return permuted.min(axis=1)
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    if len(first) != len(second):
+        return 0.0
+    return float(np.mean(first == second))
+
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u8").tobytes()
+
+
+def from_bytes(payload: bytes) -> np.ndarray:
+    return np.frombuffer(payload, dtype="<u8")
@@ -0,0 +1,134 @@
+import config
+from instrumentation import annotate, traced
+from model_client import ModelClient
+from response_cache import get_default_cache
+from reviewer_agent import REVISED_MARKER
+
+DRAFT_MARKER = "**Draft Chapter:**"
+REVIEW_MARKER = "**Review & Suggestions:**"
+
+
+def _split_first(text: str, markers: tuple) -> tuple:
+    # (text before the earliest of `markers`, the rest from that marker on).
+    found = [text.index(marker) for marker in markers if marker in text]
+    if not found:
+        return text, ""
+    return text[:min(found)], text[min(found):]
+
+
+def parse_fused(response_text: str) -> tuple:
+    # Splits a fused response into (draft, review notes, revised chapter).
+    # Everything after the draft is in the reviewer's own format, so it is
+    # split on REVISED_MARKER exactly as ReviewerAgent.run does. Sections may
+    # come in any order: the draft ends at the first marker after it, and a
+    # review placed after (or before) the rest still goes to the notes. One
+    # without a draft section is a plain review whose revision doubles as the
+    # draft, and an unstructured response is taken as the draft. A response
+    # with no revised chapter returns (draft, None, None), so the caller
+    # reviews the draft with a separate call.
+    draft, review = None, response_text
+    if DRAFT_MARKER in response_text:
+        before, after = response_text.split(DRAFT_MARKER, 1)
+        draft, review = _split_first(after, (REVIEW_MARKER, REVISED_MARKER))
+        if _split_first(before, (REVIEW_MARKER, REVISED_MARKER))[1]:
+            review = before + "\n\n" + review
+    elif REVISED_MARKER not in response_text:
+        draft, review = response_text, ""
+
+    feedback, revised_text = review, None
+    if REVISED_MARKER in review:
+        feedback, revised_text = review.split(REVISED_MARKER, 1)
+        revised_text, notes = _split_first(revised_text, (REVIEW_MARKER,))
+        feedback = feedback.strip() + "\n\n" + notes
+    feedback, revised_text = feedback.strip(), (revised_text or "").strip()
+
+    draft = (draft if draft is not None else revised_text).strip()
+    if not draft:
+        return None, None, None
+    if not revised_text:
+        return draft, None, None
+    return draft, feedback or "No review notes were returned.", revised_text
+
+
+class FusedAgent:
+    # Writer and reviewer in a single model call: one structured response
+    # carries the spun draft, the review suggestions and the revised chapter,
+    # so a pass costs one round trip and the draft is never sent back in.
+
+    def __init__(self, model=None, limiter=None, cache=None):
+
+        print("Initializing Fused Writer/Reviewer Agent...")
+        self.generation_config = {"temperature": config.FUSED_TEMPERATURE}
+
+        if model is None:
+            # Imported here so runs that never call the model skip the ~1s import.
+            import google.generativeai as genai
+
+            if not config.GOOGLE_API_KEY:
+                raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
+            genai.configure(api_key=config.GOOGLE_API_KEY)
+
+            model = genai.GenerativeModel(
+                config.GEMINI_MODEL,
+                generation_config=self.generation_config
+            )
+            if cache is None and config.RESPONSE_CACHE_ENABLED:
+                cache = get_default_cache()
+
+        self.model = model
+        self.client = ModelClient(model, self.generation_config, limiter=limiter, cache=cache)
+        print("Fused Agent ready.")
+
+    def _create_prompt(self, original_text: str, human_feedback: str = None) -> str:
+
+        feedback_prompt = ""
+        if human_feedback:
+            feedback_prompt = f"In the rewrite, specifically address this feedback: '{human_feedback}'.\n"
+
+        return (
+            "You are a talented author specializing in modernizing classic literature, working with "
+            "a sharp, meticulous book editor. Perform three steps in order:\n"
+            "1. Rewrite the chapter below, preserving the core plot and character intentions, but "
+            "infusing it with a more contemporary, dynamic, and descriptive prose. Make it engaging "
+            "for a 21st-century reader.\n"
+            f"{feedback_prompt}"
+            "2. As the editor, give a concise, bulleted list of 3-5 key suggestions for improving "
+            "your rewrite. Focus on clarity, pacing, grammar, and style.\n"
+            "3. Provide the fully revised and polished chapter that incorporates those suggestions.\n\n"
+            "Structure your response exactly as follows:\n"
+            f"{DRAFT_MARKER}\n"
+            "[The full rewritten chapter]\n\n"
+            f"{REVIEW_MARKER}\n"
+            "- Suggestion 1\n"
+            "- Suggestion 2\n"
+            "...\n\n"
+            f"{REVISED_MARKER}\n"
+            "[The full, edited text starts here]\n\n"
+            "---\n"
+            f"Original Chapter Text:\n{original_text}"
+        )
+
+    @traced("fused.run")
+    def run(self, original_text: str, human_feedback: str = None) -> tuple:
+        # Returns (draft, review notes, revised chapter); all None on failure,
+        # and only the draft when the response carried no revision.
+        prompt = self._create_prompt(original_text, human_feedback)
+
+        print("Sending request to Gemini for a fused rewrite and review...")
+        try:
+            response_text = self.client.generate(prompt)
+        except Exception as e:
+            print(f"An error occurred while communicating with the Gemini API: {e}")
+            return None, None, None
+
+        draft, feedback, revised_text = parse_fused(response_text)
+        if draft is None:
+            print("Warning: Fused output was empty or not in the expected format.")
+        elif revised_text is None:
+            annotate(draft_chars=len(draft))
+            print("Warning: Fused output had no revised chapter; only the draft is usable.")
+        else:
+            annotate(draft_chars=len(draft), revised_chars=len(revised_text))
+            print("Successfully received and parsed the fused rewrite and review.")
+        return draft, feedback, revised_text
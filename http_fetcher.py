@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from html.parser import HTMLParser
+
+import httpx
+
+import config
+
+# Elements whose text starts on a new line in the rendered page, roughly
+# matching what Playwright's inner_text() produces for Wikisource markup.
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "figcaption",
+    "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main",
+    "nav", "ol", "p", "pre", "section", "table", "tr", "ul", "center", "poem"
+}
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "source", "track", "wbr"
+}
+SKIP_TAGS = {"script", "style", "noscript", "template"}
+
+
+def parse_selector(selector: str) -> tuple:
+    # Supports the simple compound selectors used in config, e.g.
+    # "div.mw-parser-output.ws-page-container" or "#content".
+    selector = selector.strip()
+    if not selector or any(c in selector for c in " >+~[:,"):
+        raise ValueError(f"Unsupported selector for the HTTP fast path: '{selector}'")
+    tag, element_id, classes = None, None, set()
+    token, kind = "", "tag"
+    for char in selector + ".":
+        if char in ".#":
+            if kind == "tag" and token:
+                tag = token.lower()
+            elif kind == "class" and token:
+                classes.add(token)
+            elif kind == "id" and token:
+                element_id = token
+            token, kind = "", "class" if char == "." else "id"
+        else:
+            token += char
+    return tag, element_id, frozenset(classes)
+
+
+class ContentExtractor(HTMLParser):
+    # Collects the visible text of the first element matching the selector.
+    # Only elements with the container's own tag name are counted to find
+    # where it ends, since elements such as <p> and <li> may be closed
+    # implicitly and never send an end tag.
+
+    def __init__(self, selector: str):
+        super().__init__(convert_charrefs=True)
+        self.tag, self.element_id, self.classes = parse_selector(selector)
+        self.container = None
+        self.depth = 0
+        self.skip_depth = 0
+        self.found = False
+        self.done = False
+        self.parts = []
+
+    def _matches(self, tag: str, attrs: list) -> bool:
+        attributes = dict(attrs)
+        if self.tag and tag != self.tag:
+            return False
+        if self.element_id and attributes.get("id") != self.element_id:
+            return False
+        return self.classes.issubset((attributes.get("class") or "").split())
+
+    def _newline(self):
+        if self.parts and not self.parts[-1].endswith("\n"):
+            self.parts.append("\n")
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if not self.depth:
+            if self._matches(tag, attrs):
+                self.found = True
+                self.container = tag
+                self.depth = 1
+            return
+        if tag in VOID_TAGS:
+            if tag in ("br", "hr") and not self.skip_depth:
+                self.parts.append("\n")
+            return
+        if tag == self.container:
+            self.depth += 1
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS and not self.skip_depth:
+            self._newline()
+
+    def handle_endtag(self, tag):
+        if not self.depth or self.done or tag in VOID_TAGS:
+            return
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS and not self.skip_depth:
+            self._newline()
+        if tag == self.container:
+            self.depth -= 1
+            if not self.depth:
+                self.done = True
+
+    def handle_data(self, data):
+        if not self.depth or self.skip_depth or self.done:
+            return
+        collapsed = re.sub(r"\s+", " ", data)
+        if not self.parts or self.parts[-1].endswith(("\n", " ")):
+            collapsed = collapsed.lstrip()
+        if collapsed:
+            self.parts.append(collapsed)
+
+    def text(self) -> str:
+        lines = [line.strip() for line in "".join(self.parts).split("\n")]
+        return "\n\n".join(line for line in lines if line)
+
+
+def extract_content(html: str, selector: str = None) -> str:
+    extractor = ContentExtractor(selector or config.CONTENT_SELECTOR)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text() if extractor.found else None
+
+
+class ConditionalCache:
+    # On-disk ETag/Last-Modified cache. Each URL maps to a JSON file holding
+    # its validators and the extracted text, so a 304 costs no parsing.
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or config.HTTP_CACHE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> dict:
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, etag: str, last_modified: str, text: str):
+        entry = {"url": url, "etag": etag, "last_modified": last_modified, "text": text}
+        path = self._path(url)
+        with self._lock:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(path + ".tmp", path)
+
+
+class HttpFetcher:
+    # Plain-HTTP fast path for static pages, on one pooled keep-alive client.
+
+    def __init__(self, cache: ConditionalCache = None):
+        self.cache = cache or ConditionalCache()
+        self.client = httpx.Client(
+            timeout=config.HTTP_TIMEOUT,
+            follow_redirects=True,
+            headers={"User-Agent": config.HTTP_USER_AGENT},
+            limits=httpx.Limits(max_connections=config.SCRAPER_MAX_CONCURRENCY,
+                                max_keepalive_connections=config.SCRAPER_MAX_CONCURRENCY)
+        )
+
+    def fetch(self, url: str) -> tuple[str, str]:
+        # Returns (text, status) where status is "fresh", "revalidated" or
+        # "error"; text is None when the selector was not found.
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = self.client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            print(f"HTTP fast path failed for {url}: {e}")
+            return None, "error"
+
+        if response.status_code == 304 and cached:
+            return cached["text"], "revalidated"
+        if response.status_code != 200:
+            print(f"HTTP fast path got status {response.status_code} for {url}.")
+            return None, "error"
+
+        text = extract_content(response.text)
+        if text:
+            self.cache.put(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), text)
+        return text, "fresh"
+
+    def close(self):
+        self.client.close()
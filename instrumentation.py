@@ -0,0 +1,319 @@
+import atexit
+import bisect
+import contextvars
+import cProfile
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+METRIC_PREFIX = "book_workflow"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+# Upper bounds (seconds) of the latency histogram buckets: 0.1 ms to about
+# 20 minutes in steps of 25%, so estimated percentiles are within ~12%.
+BUCKETS = tuple(0.0001 * 1.25 ** i for i in range(74))
+
+# Numeric span attributes that are counts or sizes, summed per span name and
+# exported as `*_total` counters.
+COUNTERS = frozenset({
+    "bytes_read", "bytes_written", "cache_hits", "candidates", "chapters", "documents_read",
+    "documents_written", "draft_chars", "duplicate", "hedged", "http_revalidated", "passages",
+    "prompt_chars", "prompt_tokens", "queries", "rate_limited", "rendered", "response_chars",
+    "response_tokens", "retries", "review_failed", "revised_chars", "screenshot_reused", "text_chars",
+})
+
+# Per-call measurements that are not additive (a sum of scores means
+# nothing); each gets a histogram per span name instead. Any other attribute
+# is only written to the trace.
+OBSERVED = frozenset({"reward_score", "ttft_seconds"})
+
+
+class SpanStats:
+    # Bounded latency summary for one span name: count, sum, max and a fixed
+    # histogram, instead of every duration ever recorded. Also used for the
+    # OBSERVED attributes, whose values fit the same buckets.
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def percentile(self, q: float) -> float:
+        # Interpolates inside the bucket holding the q-th observation.
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(self.max, low + (high - low) * max(0.0, rank - seen) / count)
+            seen += count
+        return self.max
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Tracer:
+    # Records timed spans for the pipeline stages. Every finished span is
+    # appended to a JSON-lines trace (when a path is set) and folded into
+    # bounded per-span statistics used for the Prometheus textfile and the
+    # --profile breakdown. Attributes in COUNTERS (sizes, token estimates,
+    # documents read) are summed per span name, and those in OBSERVED (scores,
+    # time to first token) get a histogram. The trace file is rotated to
+    # `<path>.1` once it grows past `max_trace_bytes`.
+
+    def __init__(self, trace_path: str = None, metrics_path: str = None, max_trace_bytes: int = None):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.max_trace_bytes = max_trace_bytes or config.TRACE_MAX_BYTES
+        self.stats = {}
+        self.errors = {}
+        self.totals = {}
+        self.observations = {}
+        self.gauges = {}
+        self.collectors = []
+        self.profile_prefix = None
+        self.slowest_profile = None
+        self._lock = threading.Lock()
+        self._trace_file = None
+        self._trace_bytes = 0
+        if trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            self._open_trace()
+
+    def _open_trace(self):
+        self._trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+        self._trace_bytes = self._trace_file.tell()
+
+    def _write_trace(self, line: str):
+        if self._trace_bytes + len(line) > self.max_trace_bytes:
+            self._trace_file.close()
+            os.replace(self.trace_path, self.trace_path + ".1")
+            self._open_trace()
+        self._trace_file.write(line)
+        self._trace_bytes += len(line)
+
+    def enable_profiling(self, prefix: str = "stage."):
+        # cProfile every span whose name starts with `prefix`, keeping only
+        # the slowest one. Only top-level stages should match, since a thread
+        # can run just one profiler at a time.
+        self.profile_prefix = prefix
+
+    def add_collector(self, collector):
+        # `collector()` returns {metric_name: value}; called at each flush.
+        self.collectors.append(collector)
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        record = {
+            "span": name,
+            "id": next(_span_ids),
+            "parent": parent["id"] if parent else None,
+            "thread": threading.current_thread().name,
+            "start": time.time(),
+            "attributes": dict(attributes),
+        }
+        token = _current_span.set(record)
+
+        profiler = None
+        if self.profile_prefix and name.startswith(self.profile_prefix):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this thread.
+                profiler = None
+
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield record["attributes"]
+        except BaseException as e:
+            status = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            _current_span.reset(token)
+            record["duration"] = duration
+            record["status"] = status
+            self._finish(record, profiler)
+
+    def _finish(self, record: dict, profiler):
+        name = record["span"]
+        with self._lock:
+            self.stats.setdefault(name, SpanStats()).add(record["duration"])
+            if record["status"] == "error":
+                self.errors[name] = self.errors.get(name, 0) + 1
+            totals = self.totals.setdefault(name, {})
+            for key, value in record["attributes"].items():
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                if key in COUNTERS:
+                    totals[key] = totals.get(key, 0) + value
+                elif key in OBSERVED:
+                    self.observations.setdefault((name, key), SpanStats()).add(value)
+            if profiler is not None and (self.slowest_profile is None
+                                         or record["duration"] > self.slowest_profile[1]):
+                self.slowest_profile = (name, record["duration"], profiler)
+            if self._trace_file is not None:
+                self._write_trace(json.dumps(record, default=str) + "\n")
+
+    def summary(self) -> list:
+        # Per-span latency breakdown, slowest total first. Percentiles are
+        # estimated from the histogram.
+        rows = []
+        with self._lock:
+            for name, stats in self.stats.items():
+                rows.append({
+                    "span": name,
+                    "count": stats.count,
+                    "total": stats.total,
+                    "mean": stats.total / stats.count,
+                    "p50": stats.percentile(0.5),
+                    "p95": stats.percentile(0.95),
+                    "max": stats.max,
+                    "errors": self.errors.get(name, 0),
+                })
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def dump_slowest_profile(self, path: str) -> tuple:
+        # Writes the cProfile stats of the slowest profiled span to `path`
+        # (readable with pstats or snakeviz). Returns (span, seconds) or None.
+        if self.slowest_profile is None:
+            return None
+        name, duration, profiler = self.slowest_profile
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        return name, duration
+
+    def prometheus_text(self) -> str:
+        for collector in self.collectors:
+            try:
+                for name, value in collector().items():
+                    self.gauge(name, value)
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_seconds Time spent in instrumented spans.",
+            f"# TYPE {METRIC_PREFIX}_span_seconds summary",
+        ]
+        with self._lock:
+            for name, stats in sorted(self.stats.items()):
+                label = f'span="{_label(name)}"'
+                for q in (0.5, 0.95):
+                    lines.append(f'{METRIC_PREFIX}_span_seconds{{{label},quantile="{q}"}} {stats.percentile(q)}')
+                lines.append(f"{METRIC_PREFIX}_span_seconds_sum{{{label}}} {stats.total}")
+                lines.append(f"{METRIC_PREFIX}_span_seconds_count{{{label}}} {stats.count}")
+
+            lines.append(f"# TYPE {METRIC_PREFIX}_span_errors_total counter")
+            for name in sorted(self.stats):
+                lines.append(f'{METRIC_PREFIX}_span_errors_total{{span="{_label(name)}"}} {self.errors.get(name, 0)}')
+
+            attributes = sorted({key for totals in self.totals.values() for key in totals})
+            for key in attributes:
+                lines.append(f"# TYPE {METRIC_PREFIX}_span_{key}_total counter")
+                for name, totals in sorted(self.totals.items()):
+                    if key in totals:
+                        lines.append(f'{METRIC_PREFIX}_span_{key}_total{{span="{_label(name)}"}} {totals[key]}')
+
+            for key in sorted({key for _, key in self.observations}):
+                lines.append(f"# TYPE {METRIC_PREFIX}_span_{key} summary")
+                for (name, observed), stats in sorted(self.observations.items()):
+                    if observed != key:
+                        continue
+                    label = f'span="{_label(name)}"'
+                    for q in (0.5, 0.95):
+                        lines.append(f'{METRIC_PREFIX}_span_{key}{{{label},quantile="{q}"}} {stats.percentile(q)}')
+                    lines.append(f"{METRIC_PREFIX}_span_{key}_sum{{{label}}} {stats.total}")
+                    lines.append(f"{METRIC_PREFIX}_span_{key}_count{{{label}}} {stats.count}")
+
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+                lines.append(f"{METRIC_PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        # The textfile is replaced atomically so the node_exporter collector
+        # never reads a half-written file.
+        if self.metrics_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.metrics_path)), exist_ok=True)
+            with open(self.metrics_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(self.metrics_path + ".tmp", self.metrics_path)
+        if self._trace_file is not None:
+            self._trace_file.flush()
+
+
+_default_tracer = None
+_default_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    global _default_tracer
+    with _default_lock:
+        if _default_tracer is None:
+            if config.TRACE_ENABLED:
+                _default_tracer = Tracer(config.TRACE_PATH, config.METRICS_TEXTFILE_PATH)
+                atexit.register(_default_tracer.flush)
+            else:
+                _default_tracer = Tracer()
+        return _default_tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    # Swaps the process tracer (e.g. a fresh one per benchmark run) and
+    # returns the previous one.
+    global _default_tracer
+    with _default_lock:
+        previous, _default_tracer = _default_tracer, tracer
+    return previous
+
+
+def span(name: str, **attributes):
+    return get_tracer().span(name, **attributes)
+
+
+def annotate(**attributes):
+    # Adds attributes to the innermost open span; a no-op outside any span.
+    record = _current_span.get()
+    if record is not None:
+        record["attributes"].update(attributes)
+
+
+def traced(name: str):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
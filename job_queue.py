@@ -0,0 +1,327 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import config
+
+# Stages run in this order; a job's `stage` column is the next one to run.
+STAGES = ("scrape", "spin", "review")
+DONE = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    url TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    input_version INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    owner TEXT,
+    lease_until REAL,
+    not_before REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    UNIQUE (book, chapter)
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, not_before);
+CREATE TABLE IF NOT EXISTS hitl_queue (
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    reviewed_at REAL,
+    PRIMARY KEY (book, chapter, version)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    finished_at REAL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    # Persistent scrape -> spin -> review queue, one job per chapter. A job
+    # records the next stage to run and the version that stage starts from,
+    # so a killed run resumes at the first unfinished stage. Claimed jobs
+    # carry a lease that the owning run renews; jobs whose lease lapses (the
+    # run died) are claimable again. A run whose process is gone from this
+    # host is recognised at once by start_run(), without waiting out the lease.
+
+    def __init__(self, path: str = None):
+        self.path = path or config.JOB_QUEUE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def enqueue(self, entries: list) -> int:
+        # `entries` are dicts with url, book and chapter. Chapters that are
+        # already queued keep their progress. Returns the number added.
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (book, chapter, url, stage, status, created_at) "
+                    "VALUES (?, ?, ?, ?, 'pending', ?)",
+                    [(entry["book"], entry["chapter"], entry["url"], STAGES[0], now) for entry in entries]
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def requeue(self, entries: list) -> int:
+        # Sends finished chapters back to the scrape stage, e.g. to pick up a
+        # new edition of the source. Jobs still in progress or failed are left
+        # alone. Returns the number requeued.
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE jobs SET url = ?, stage = ?, status = 'pending', input_version = NULL, attempts = 0, "
+                    "last_error = NULL, owner = NULL, lease_until = NULL, not_before = 0, created_at = ?, "
+                    "started_at = NULL, finished_at = NULL WHERE book = ? AND chapter = ? AND status = ?",
+                    [(entry["url"], STAGES[0], now, entry["book"], entry["chapter"], DONE) for entry in entries]
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def claim(self, owner: str) -> dict:
+        # Takes the oldest ready job: pending and past its retry delay, or
+        # running under a lease that has expired.
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE (status = 'pending' AND not_before <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) ORDER BY id LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, "
+                        "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                        (owner, now + config.JOB_LEASE_SECONDS, now, row["id"])
+                    )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return dict(row) if row else None
+
+    def renew(self, owner: str):
+        # Extends the owner's leases and records that its run is still alive.
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = 'running'",
+                (now + config.JOB_LEASE_SECONDS, owner)
+            )
+            self._conn.execute("UPDATE runs SET heartbeat_at = ? WHERE id = ?", (now, owner))
+
+    def checkpoint(self, job_id: int, stage: str, input_version: int):
+        # Records that the previous stage finished and produced `input_version`.
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, input_version = ?, attempts = 0, last_error = NULL WHERE id = ?",
+                (stage, input_version, job_id)
+            )
+
+    def complete(self, job_id: int, run_id: str, book: str, chapter: str, version: int):
+        # Marks the job done and queues its reviewed version for a HITL pass.
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET stage = ?, status = ?, input_version = ?, owner = NULL, "
+                    "lease_until = NULL, finished_at = ? WHERE id = ?",
+                    (DONE, DONE, version, now, job_id)
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO hitl_queue (book, chapter, version, status, enqueued_at) "
+                    "VALUES (?, ?, ?, 'pending', ?)",
+                    (book, chapter, version, now)
+                )
+                self._conn.execute(
+                    "UPDATE runs SET completed = completed + 1, heartbeat_at = ? WHERE id = ?", (now, run_id)
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def fail(self, job_id: int, error: str) -> bool:
+        # Schedules a retry with exponential backoff, or marks the job failed
+        # after JOB_MAX_ATTEMPTS. Returns True when it will be retried.
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            attempts = row["attempts"] + 1
+            retry = attempts < config.JOB_MAX_ATTEMPTS
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, last_error = ?, owner = NULL, lease_until = NULL, "
+                "not_before = ? WHERE id = ?",
+                ("pending" if retry else "failed", attempts, error,
+                 time.time() + config.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), job_id)
+            )
+        return retry
+
+    def release(self, owner: str):
+        # Hands unfinished jobs back without counting an attempt (e.g. on Ctrl+C).
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'pending', owner = NULL, lease_until = NULL "
+                "WHERE owner = ? AND status = 'running'",
+                (owner,)
+            )
+
+    def retry_failed(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, not_before = 0 WHERE status = 'failed'"
+            ).rowcount
+
+    def has_work(self) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM jobs WHERE status IN ('pending', 'running') LIMIT 1"
+            ).fetchone() is not None
+
+    def recover(self) -> int:
+        # Ends the unfinished runs of this host whose process has exited (a
+        # crash or kill -9) at their last heartbeat, and hands their running
+        # jobs back. Returns the number of jobs released.
+        host = socket.gethostname()
+        released = 0
+        with self._lock:
+            runs = self._conn.execute(
+                "SELECT id, pid FROM runs WHERE finished_at IS NULL AND host = ?", (host,)
+            ).fetchall()
+            for run in runs:
+                if run["pid"] == os.getpid() or _process_alive(run["pid"]):
+                    continue
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    released += self._conn.execute(
+                        "UPDATE jobs SET status = 'pending', owner = NULL, lease_until = NULL "
+                        "WHERE owner = ? AND status = 'running'",
+                        (run["id"],)
+                    ).rowcount
+                    self._conn.execute("UPDATE runs SET finished_at = heartbeat_at WHERE id = ?", (run["id"],))
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._conn.execute("COMMIT")
+        return released
+
+    def start_run(self) -> str:
+        # Recovers dead runs first, so a resume never waits on their leases.
+        released = self.recover()
+        if released:
+            print(f"Recovered {released} jobs from a run that exited without finishing.")
+        run_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (id, host, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, socket.gethostname(), os.getpid(), now, now)
+            )
+        return run_id
+
+    def finish_run(self, run_id: str):
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def hitl_pending(self) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM hitl_queue WHERE status = 'pending' ORDER BY enqueued_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_reviewed(self, book: str, chapter: str, version: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE hitl_queue SET status = 'reviewed', reviewed_at = ? "
+                "WHERE book = ? AND chapter = ? AND version = ?",
+                (time.time(), book, chapter, version)
+            )
+
+    def report(self) -> dict:
+        # Job counts by status/stage and throughput in chapters per hour,
+        # both over the runs' busy time and for the most recent run.
+        with self._lock:
+            counts = {
+                (row["status"], row["stage"]): row["n"]
+                for row in self._conn.execute("SELECT status, stage, COUNT(*) AS n FROM jobs GROUP BY status, stage")
+            }
+            hitl = self._conn.execute("SELECT COUNT(*) FROM hitl_queue WHERE status = 'pending'").fetchone()[0]
+            runs = [dict(row) for row in self._conn.execute("SELECT * FROM runs ORDER BY started_at")]
+
+        def per_hour(completed: int, seconds: float) -> float:
+            return completed / seconds * 3600 if seconds > 0 else 0.0
+
+        now = time.time()
+
+        def ended(run: dict) -> float:
+            # A run that never finished is still alive while its heartbeat is
+            # within a lease; otherwise it was killed, and its busy time ends
+            # at its last heartbeat rather than growing with the clock.
+            if run["finished_at"] is not None:
+                return run["finished_at"]
+            heartbeat = run["heartbeat_at"]
+            return now if heartbeat + config.JOB_LEASE_SECONDS >= now else heartbeat
+
+        busy = sum(ended(run) - run["started_at"] for run in runs)
+        completed = sum(run["completed"] for run in runs)
+        last = runs[-1] if runs else None
+        return {
+            "jobs": counts,
+            "done": sum(n for (status, _), n in counts.items() if status == DONE),
+            "failed": sum(n for (status, _), n in counts.items() if status == "failed"),
+            "remaining": sum(n for (status, _), n in counts.items() if status in ("pending", "running")),
+            "awaiting_hitl": hitl,
+            "runs": len(runs),
+            "chapters_per_hour": per_hour(completed, busy),
+            "last_run_chapters_per_hour": per_hour(
+                last["completed"], ended(last) - last["started_at"]
+            ) if last else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
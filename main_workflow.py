@@ -1,49 +1,122 @@
+import argparse
+import time
+from contextlib import contextmanager
+
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt, Confirm
+from rich.live import Live
+from rich.text import Text
+from rich.table import Table
 
 import config
-from ChromaDB import ChromaDBManager
-from scraper_agent import ScraperAgent
+from workflow_context import WorkflowContext
 from writer_agent import WriterAgent
-from reviewer_agent import ReviewerAgent
 import voice_interface
+from response_cache import get_default_cache
+from instrumentation import get_tracer, span, traced
+from batch_runner import BatchRunner, load_manifest, print_report
+from job_queue import JobQueue
+from passage_index import PassagePrefetcher
 
 console = Console()
 
+# Spoken prompts, pre-synthesized once the operator first picks voice input.
+FEEDBACK_PROMPT = "Please provide feedback for the AI Writer. You can speak or type."
+SEARCH_PROMPT = "What are you looking for? (e.g., 'a scene about a conflict')"
+
 def print_header():
     console.print(Panel("[bold magenta]Automated Book Publication Workflow[/bold magenta]", 
                         title="[cyan]Welcome[/cyan]", 
                         subtitle="[green]Powered by Gemini & ChromaDB[/green]"))
 
-def run_scraper_stage(db_manager: ChromaDBManager):
+@traced("stage.scrape")
+def run_scraper_stage(ctx: WorkflowContext) -> dict:
+    # Returns the stored original the scraped text duplicates, if any; an
+    # unchanged chapter is not stored again. A duplicate is only returned
+    # when the latest version descends from it, so the caller can continue
+    # from that version.
 
     console.print("\n[bold yellow]Stage 1: Web Content Ingestion[/bold yellow]")
-    scraper = ScraperAgent()
-    content, screenshot, score = scraper.run(config.TARGET_URL)
+    db_manager = ctx.db_manager
+    scraper = ctx.scraper
+    content, screenshot, score = scraper.run(ctx.target_url or config.TARGET_URL)
 
     if content:
         console.print(f"[green]Scraping successful! Score: {score:.2f}[/green]")
-        console.print(f"Screenshot saved to: '{screenshot}'")
-        
-        metadata = {"version": 1, "status": "original", "score": f"{score:.2f}"}
+        if screenshot:
+            console.print(f"Screenshot saved to: '{screenshot}'")
+
+        history = db_manager.list_versions(ctx.book, ctx.chapter)
+        originals = [row['version'] for row in history if row['status'] == "original"]
+        if originals:
+            duplicate = db_manager.find_duplicate(content, ctx.book, ctx.chapter, versions={originals[-1]})
+            latest = db_manager.catalog.latest(ctx.book, ctx.chapter)
+            # Work stored since then is only reusable if it was made from the
+            # duplicate; otherwise the scrape is stored and rewritten afresh.
+            if duplicate is not None and descends_from(db_manager, ctx.book, ctx.chapter, latest['version'],
+                                                       duplicate['version']):
+                db_manager.note_skipped_version(content)
+                console.print(f"[green]Chapter unchanged since version {duplicate['version']} "
+                              f"({duplicate['similarity']:.0%} similar); not storing it again.[/green]")
+                return duplicate
+
+        metadata = {"version": db_manager.catalog.next_version(ctx.book, ctx.chapter), "status": "original",
+                    "score": f"{score:.2f}", "book": ctx.book, "chapter": ctx.chapter}
+        if screenshot:
+            metadata["screenshot"] = screenshot
         db_manager.store_version(content, metadata)
+        return None
     else:
         console.print("[bold red]Scraping failed. Exiting workflow.[/bold red]")
         exit()
 
-def run_writer_stage(db_manager: ChromaDBManager, feedback: str = None):
+def descends_from(db_manager, book: str, chapter: str, version: int, ancestor: int) -> bool:
+    # True when `ancestor` is `version` itself or on its source_version lineage.
+    return ancestor in [row['version'] for row in db_manager.catalog.lineage(book, chapter, version)]
+
+def model_outputs_since(db_manager, book: str, chapter: str, version: int, source_version: int) -> int:
+    # Number of writer/reviewer versions between `source_version` and
+    # `version` in its lineage, i.e. the model output a skipped rewrite reuses.
+    chain = db_manager.catalog.lineage(book, chapter, version)
+    if source_version not in [row['version'] for row in chain]:
+        return 0
+    outputs = 0
+    for row in chain:
+        if row['version'] == source_version:
+            break
+        outputs += row['status'] in ("spun", "reviewed")
+    return outputs
+
+def stream_writer(writer: WriterAgent, text: str, feedback: str = None) -> str:
+    # Renders the draft into a live panel as tokens arrive.
+    draft = Text()
+    panel = Panel(draft, title="[cyan]Writer Draft[/cyan]")
+    with Live(panel, console=console, refresh_per_second=8, vertical_overflow="visible"):
+        return writer.run_stream(text, human_feedback=feedback, on_token=draft.append)
+
+@traced("stage.write")
+def run_writer_stage(ctx: WorkflowContext, feedback: str = None, spun_text: str = None):
     console.print("\n[bold yellow]Stage 2: AI Writer Agent[/bold yellow]")
+    db_manager = ctx.db_manager
     
     # Get the latest version to work on
-    meta, text, doc_id = db_manager.get_latest_version()
+    meta, text, doc_id = db_manager.get_latest_version(ctx.book, ctx.chapter)
     if not text:
         console.print("[bold red]Could not retrieve text for writer. Exiting.[/bold red]")
         exit()
 
     console.print(f"Rewriting version {meta.get('version', 'N/A')}...")
-    writer = WriterAgent()
-    spun_text = writer.run(text, human_feedback=feedback)
+    writer = ctx.writer
+    if spun_text:
+        # Already generated in the background during the HITL pause.
+        console.print(Panel(spun_text, title="[cyan]Writer Draft[/cyan]"))
+    elif len(text) > config.CHUNKING_THRESHOLD_CHARS:
+        spun_text = writer.run_chunked(text, human_feedback=feedback)
+    elif config.STREAM_RESPONSES:
+        spun_text = stream_writer(writer, text, feedback)
+    else:
+        spun_text = writer.run(text, human_feedback=feedback)
 
     if spun_text:
         console.print("[green]AI Writer finished.[/green]")
@@ -51,35 +124,61 @@ def run_writer_stage(db_manager: ChromaDBManager, feedback: str = None):
         metadata = {
             "version": new_version,
             "status": "spun",
-            "source_version": meta.get('version', 'N/A')
+            "source_version": meta.get('version', 'N/A'),
+            "book": meta.get('book'),
+            "chapter": meta.get('chapter')
         }
         db_manager.store_version(spun_text, metadata)
     else:
         console.print("[bold red]AI Writer failed. Exiting workflow.[/bold red]")
         exit()
 
-def run_reviewer_stage(db_manager: ChromaDBManager):
+@traced("stage.review")
+def run_reviewer_stage(ctx: WorkflowContext, review: tuple = None):
 
     console.print("\n[bold yellow]Stage 3: AI Reviewer Agent[/bold yellow]")
+    db_manager = ctx.db_manager
     
-    meta, text, doc_id = db_manager.get_latest_version()
+    meta, text, doc_id = db_manager.get_latest_version(ctx.book, ctx.chapter)
     if not text:
         console.print("[bold red]Could not retrieve text for reviewer. Exiting.[/bold red]")
         exit()
 
     console.print(f"Reviewing version {meta.get('version', 'N/A')}...")
-    reviewer = ReviewerAgent()
-    feedback, revised_text = reviewer.run(text)
+    reviewer = ctx.reviewer
+    streamed = review is None and config.STREAM_RESPONSES and len(text) <= config.CHUNKING_THRESHOLD_CHARS
+    if review is not None:
+        feedback, revised_text = review
+    elif len(text) > config.CHUNKING_THRESHOLD_CHARS:
+        feedback, revised_text = reviewer.run_chunked(text)
+    elif streamed:
+        # The revised chapter's passages are embedded as they stream in, so
+        # storing it afterwards mostly hits the embedding cache.
+        prefetch = PassagePrefetcher(db_manager.passages) if db_manager.passages is not None else None
+        console.print("[cyan]Reviewer's Feedback:[/cyan]")
+        try:
+            feedback, revised_text = reviewer.run_stream(
+                text, on_suggestion=lambda suggestion: console.print(suggestion, style="cyan", markup=False),
+                on_revised_chunk=prefetch.feed if prefetch is not None else None
+            )
+        finally:
+            if prefetch is not None:
+                prefetch.close()
+    else:
+        feedback, revised_text = reviewer.run(text)
 
     if feedback and revised_text:
         console.print("[green]AI Reviewer finished.[/green]")
-        console.print(Panel(feedback, title="[cyan]Reviewer's Feedback[/cyan]"))
+        if not streamed:
+            console.print(Panel(feedback, title="[cyan]Reviewer's Feedback[/cyan]"))
         
         new_version = meta.get('version', 0) + 1
         metadata = {
             "version": new_version,
             "status": "reviewed",
             "source_version": meta.get('version', 'N/A'),
+            "book": meta.get('book'),
+            "chapter": meta.get('chapter'),
             "review_notes": feedback
         }
         db_manager.store_version(revised_text, metadata)
@@ -87,10 +186,96 @@ def run_reviewer_stage(db_manager: ChromaDBManager):
         console.print("[bold red]AI Reviewer failed. Exiting workflow.[/bold red]")
         exit()
 
-def run_human_in_the_loop(db_manager: ChromaDBManager):
+@traced("stage.fused")
+def run_fused_stage(ctx: WorkflowContext, feedback: str = None):
+
+    console.print("\n[bold yellow]Stage 2+3: AI Writer and Reviewer (single call)[/bold yellow]")
+    db_manager = ctx.db_manager
+
+    meta, text, doc_id = db_manager.get_latest_version(ctx.book, ctx.chapter)
+    if not text:
+        console.print("[bold red]Could not retrieve text for writer. Exiting.[/bold red]")
+        exit()
+
+    console.print(f"Rewriting and reviewing version {meta.get('version', 'N/A')}...")
+    spun_text, review_notes, revised_text = ctx.fused.run(text, human_feedback=feedback)
+    if not spun_text:
+        # Falls back to the two-call path rather than ending the session.
+        console.print("[yellow]Fused call failed; running the writer and reviewer separately.[/yellow]")
+        run_writer_stage(ctx, feedback=feedback)
+        run_reviewer_stage(ctx)
+        return
+
+    console.print("[green]AI Writer finished.[/green]")
+    # Both versions are stored, so lineage matches the two-stage path.
+    version = meta.get('version', 0)
+    db_manager.store_version(spun_text, {
+        "version": version + 1,
+        "status": "spun",
+        "source_version": version,
+        "book": meta.get('book'),
+        "chapter": meta.get('chapter')
+    })
+    if not revised_text:
+        console.print("[yellow]The fused response had no revision; reviewing the draft separately.[/yellow]")
+        run_reviewer_stage(ctx)
+        return
+
+    console.print("[green]AI Reviewer finished.[/green]")
+    console.print(Panel(review_notes, title="[cyan]Reviewer's Feedback[/cyan]"))
+    db_manager.store_version(revised_text, {
+        "version": version + 2,
+        "status": "reviewed",
+        "source_version": version + 1,
+        "book": meta.get('book'),
+        "chapter": meta.get('chapter'),
+        "review_notes": review_notes
+    })
+
+def run_rewrite(ctx: WorkflowContext, feedback: str = None):
+    # Writer then reviewer, or both in one model call in fused mode (long
+    # chapters always take the chunked two-stage path).
+    if config.FUSED_SPIN_REVIEW:
+        _, text, _ = ctx.db_manager.get_latest_version(ctx.book, ctx.chapter)
+        if text and len(text) <= config.CHUNKING_THRESHOLD_CHARS:
+            run_fused_stage(ctx, feedback)
+            return
+    run_writer_stage(ctx, feedback=feedback)
+    run_reviewer_stage(ctx)
+
+@contextmanager
+def perceived_latency(choice: str, speculative: bool = False):
+    # Times what the operator actually waits for: from their answer until
+    # the next version is ready.
+    start = time.perf_counter()
+    with span("hitl.response", choice=choice, speculative=int(speculative)):
+        yield
+    console.print(f"[dim]Ready {time.perf_counter() - start:.2f}s after your answer.[/dim]")
+
+def use_prepared_rewrite(ctx: WorkflowContext, speculation) -> bool:
+    # Stores the best pre-generated rewrite and its review, waiting for any
+    # part that is still running. Returns False when no rewrite came back; a
+    # missing or failed review is redone live instead of ending the session.
+    with perceived_latency("rewrite", speculative=True):
+        prepared = speculation.take()
+        if not prepared:
+            return False
+        console.print(f"[dim]Best of {prepared['candidates']} pre-generated rewrites "
+                      f"(score {prepared['score']:.2f}).[/dim]")
+        run_writer_stage(ctx, spun_text=prepared["text"])
+        review = prepared["review"]
+        if review and all(review):
+            run_reviewer_stage(ctx, review=review)
+        else:
+            run_reviewer_stage(ctx)
+    return True
+
+@traced("session.hitl")
+def run_human_in_the_loop(ctx: WorkflowContext):
 
     console.print("\n[bold yellow]Stage 4: Human-in-the-Loop (HITL)[/bold yellow]")
-    meta, text, doc_id = db_manager.get_latest_version()
+    db_manager = ctx.db_manager
+    meta, text, doc_id = db_manager.get_latest_version(ctx.book, ctx.chapter)
     
     if not text:
         console.print("[bold red]Nothing to review. Exiting.[/bold red]")
@@ -99,11 +284,18 @@ def run_human_in_the_loop(db_manager: ChromaDBManager):
     console.print(Panel(text, title=f"[cyan]Version {meta.get('version')} | Status: {meta.get('status').upper()}[/cyan]"))
     
     # Use voice to ask the user for their action
+    # Work on the likely next steps while the operator reads.
+    speculation = ctx.speculator.start(text) if config.SPECULATION_ENABLED else None
+
     action_prompt = "What would you like to do? Choose 'approve', 'edit', 'rewrite', or 'quit'."
     choice = Prompt.ask(action_prompt, choices=["approve", "edit", "rewrite", "quit"], default="approve")
+    if speculation is not None and choice != "rewrite":
+        speculation.cancel()
 
     if choice == "approve":
-        console.print("[bold green]Chapter Approved! Workflow complete.[/bold green]")
+        with perceived_latency(choice):
+            db_manager.approve_version(meta.get('book'), meta.get('chapter'), meta.get('version'))
+            console.print("[bold green]Chapter Approved! Workflow complete.[/bold green]")
         return False 
     
     elif choice == "edit":
@@ -119,23 +311,35 @@ def run_human_in_the_loop(db_manager: ChromaDBManager):
         metadata = {
             "version": new_version, 
             "status": "human_edited",
-            "source_version": meta.get('version')
+            "source_version": meta.get('version'),
+            "book": meta.get('book'),
+            "chapter": meta.get('chapter')
         }
         db_manager.store_version(edited_text, metadata)
         console.print("[green]Your edits have been saved as a new version.[/green]")
         return True 
 
     elif choice == "rewrite":
-        feedback_prompt = "Please provide feedback for the AI Writer. You can speak or type."
+        if speculation is not None and speculation.candidates:
+            ready = speculation.candidates_ready()
+            if Confirm.ask(f"Use the best of {len(speculation.candidates)} rewrites prepared while you were reading "
+                           f"({ready} ready) instead of giving feedback?", default=False):
+                if use_prepared_rewrite(ctx, speculation):
+                    return True
+                console.print("[yellow]No pre-generated rewrite came back; please give feedback instead.[/yellow]")
+            # Feedback-free candidates cannot answer specific feedback.
+            speculation.cancel()
+
+        feedback_prompt = FEEDBACK_PROMPT
         use_voice = Confirm.ask("Use voice for feedback?", default=True)
         if use_voice:
-            feedback = voice_interface.listen_for_input(prompt=feedback_prompt)
+            feedback = listen_by_voice(feedback_prompt)
         else:
             feedback = Prompt.ask(feedback_prompt)
         
         if feedback:
-            run_writer_stage(db_manager, feedback=feedback)
-            run_reviewer_stage(db_manager) 
+            with perceived_latency(choice):
+                run_rewrite(ctx, feedback)
         else:
             console.print("[yellow]No feedback provided. Returning to options.[/yellow]")
         return True 
@@ -146,21 +350,28 @@ def run_human_in_the_loop(db_manager: ChromaDBManager):
     
     return True
 
-def run_semantic_search(db_manager: ChromaDBManager):
+def listen_by_voice(prompt: str) -> str:
+    # The voice libraries and engine are only loaded once the operator picks
+    # voice input; the other spoken prompts are then cached in the background.
+    voice_interface.warm_up([FEEDBACK_PROMPT, SEARCH_PROMPT])
+    return voice_interface.listen_for_input(prompt=prompt)
+
+@traced("session.search")
+def run_semantic_search(ctx: WorkflowContext):
 
     console.print("\n[bold yellow]Bonus Stage: Semantic Search[/bold yellow]")
     if not Confirm.ask("Do you want to search the content archive?", default=True):
         return
 
-    query_prompt = "What are you looking for? (e.g., 'a scene about a conflict')"
+    query_prompt = SEARCH_PROMPT
     use_voice = Confirm.ask("Use voice for search query?", default=False)
     if use_voice:
-        query = voice_interface.listen_for_input(prompt=query_prompt)
+        query = listen_by_voice(query_prompt)
     else:
         query = Prompt.ask(query_prompt)
 
     if query:
-        results = db_manager.semantic_search(query)
+        results = ctx.db_manager.semantic_search(query)
         if results:
             console.print(f"\n[bold green]Found {len(results)} results for '{query}':[/bold green]")
             for res in results:
@@ -172,30 +383,202 @@ def run_semantic_search(db_manager: ChromaDBManager):
         else:
             console.print("[yellow]No relevant results found.[/yellow]")
 
+def response_cache_metrics() -> dict:
+    stats = get_default_cache().stats()
+    return {
+        "response_cache_hit_rate": stats["hit_rate"],
+        "response_cache_hits": stats["hits"],
+        "response_cache_misses": stats["misses"],
+    }
+
+
+def print_profile(dump_path: str = None):
+    tracer = get_tracer()
+    rows = tracer.summary()
+    wall = sum(row["total"] for row in rows if row["span"].startswith("stage."))
+
+    table = Table(title="Per-stage latency breakdown")
+    table.add_column("Span", no_wrap=True)
+    for column in ("Calls", "Total s", "Mean s", "p50 s", "p95 s", "Max s", "Share"):
+        table.add_column(column, justify="right")
+    for row in rows:
+        share = f"{row['total'] / wall:.0%}" if wall and row["span"].startswith("stage.") else ""
+        table.add_row(row["span"], str(row["count"]), f"{row['total']:.3f}", f"{row['mean']:.3f}",
+                      f"{row['p50']:.3f}", f"{row['p95']:.3f}", f"{row['max']:.3f}", share)
+    console.print(table)
+
+    if dump_path:
+        dumped = tracer.dump_slowest_profile(dump_path)
+        if dumped:
+            console.print(f"[dim]cProfile of the slowest stage ({dumped[0]}, {dumped[1]:.2f}s) "
+                          f"saved to '{dump_path}'.[/dim]")
+
+
+def run_batch(args):
+    # Headless mode: no prompts, and a failed stage is retried by the queue
+    # instead of exiting.
+    queue = JobQueue()
+    if args.batch:
+        entries = load_manifest(args.batch, args.book)
+        added = queue.enqueue(entries)
+        console.print(f"Queued {added} new chapters from '{args.batch}'.")
+        if args.rescrape:
+            console.print(f"Requeued {queue.requeue(entries)} finished chapters for a fresh scrape.")
+    if args.retry_failed:
+        console.print(f"Requeued {queue.retry_failed()} failed jobs.")
+
+    if args.batch or args.resume or args.retry_failed:
+        runner = BatchRunner(queue=queue, max_workers=args.workers)
+        if args.batch:
+            runner.ctx.db_manager.catalog.set_positions(entries)
+        print_report(runner.run())
+        print_dedup_savings(runner.ctx.db_manager)
+    else:
+        print_report(queue.report())
+
+
+def print_dedup_savings(db_manager):
+    if db_manager.dedup_versions_skipped or db_manager.dedup_outputs_reused:
+        console.print(f"Near-duplicates: {db_manager.dedup_versions_skipped} unchanged chapters not stored again "
+                      f"({db_manager.dedup_bytes_skipped / 1024:.0f} KiB), "
+                      f"{db_manager.dedup_outputs_reused} stage outputs reused instead of calling the model.")
+
+
+def run_export(args):
+    from book_export import BookExporter
+
+    result = BookExporter(WorkflowContext().db_manager).export(args.book, args.export)
+    if result["path"]:
+        console.print(f"[green]Exported {result['chapters']} chapters ({result['rendered']} re-rendered, "
+                      f"{result['bytes'] / 1024:.0f} KiB) to '{result['path']}' in {result['seconds']:.2f}s.[/green]")
+
+
+def run_review_queue(ctx: WorkflowContext):
+    # HITL pass over chapters that batch runs finished and queued. One
+    # context (database, agents, speculator) serves every chapter; only the
+    # chapter it points at changes. A chapter leaves the queue only once the
+    # operator approves it, so quitting keeps it for the next pass.
+    queue = JobQueue()
+    pending = queue.hitl_pending()
+    console.print(f"\n[bold]{len(pending)} chapters are waiting for review.[/bold]")
+    for item in pending:
+        console.print(f"\n[bold cyan]{item['book']} / {item['chapter']}[/bold cyan]")
+        ctx.book, ctx.chapter = item['book'], item['chapter']
+        started = time.time()
+        while run_human_in_the_loop(ctx):
+            pass
+        approval = ctx.db_manager.catalog.approval(item['book'], item['chapter'])
+        if approval and approval['approved_at'] >= started:
+            queue.mark_reviewed(item['book'], item['chapter'], item['version'])
+        if not Confirm.ask("Continue with the next chapter?", default=True):
+            break
+
+
+def print_hitl_latency(tracer, speculator=None):
+    row = next((row for row in tracer.summary() if row["span"] == "hitl.response"), None)
+    if row is None:
+        return
+    line = (f"HITL: {row['count']} turns, perceived latency p50 {row['p50']:.2f}s, "
+            f"p95 {row['p95']:.2f}s, max {row['max']:.2f}s")
+    if speculator is not None:
+        line += (f"; pre-generated rewrites used in {speculator.used} of {speculator.started} turns, "
+                 f"{speculator.cancelled} speculative tasks cancelled")
+    console.print(f"[dim]{line}.[/dim]")
+
+
+def finish_session(args, tracer, ctx: WorkflowContext = None):
+    if config.RESPONSE_CACHE_ENABLED:
+        stats = get_default_cache().stats()
+        console.print(f"[dim]Response cache: {stats['hits']} hits, {stats['misses']} misses "
+                      f"({stats['hit_rate']:.0%} hit rate).[/dim]")
+
+    speculator = None
+    if ctx is not None and config.SPECULATION_ENABLED:
+        speculator = ctx.speculator
+        speculator.shutdown()
+    print_hitl_latency(tracer, speculator)
+    
+    if args.profile or args.profile_dump:
+        print_profile(args.profile_dump)
+    tracer.flush()
+
+
 def main():
-    print_header()
+    parser = argparse.ArgumentParser(description="Automated Book Publication Workflow")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a per-stage latency breakdown when the workflow ends.")
+    parser.add_argument("--profile-dump", nargs="?", const=config.PROFILE_DUMP_PATH, default=None,
+                        metavar="PATH", help="Also save a cProfile dump of the slowest stage.")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="Queue the chapter URLs in MANIFEST and process them without prompts.")
+    parser.add_argument("--book", help="Book id for manifest entries that do not set one.")
+    parser.add_argument("--resume", action="store_true", help="Process the jobs left in the batch queue.")
+    parser.add_argument("--rescrape", action="store_true",
+                        help="With --batch, also requeue chapters the queue has already finished.")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue failed batch jobs and run them.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker threads for batch mode.")
+    parser.add_argument("--report", action="store_true", help="Print batch progress and chapters/hour.")
+    parser.add_argument("--review-queue", action="store_true",
+                        help="Review the chapters finished by batch runs, one by one.")
+    parser.add_argument("--export", choices=["epub", "md", "txt"],
+                        help="Write the approved chapters of --book (or the default book) as one file.")
+    args = parser.parse_args()
+
+    if args.profile or args.profile_dump:
+        config.TRACE_ENABLED = True
+    tracer = get_tracer()
+    if args.profile_dump:
+        tracer.enable_profiling("stage.")
+    if config.RESPONSE_CACHE_ENABLED:
+        tracer.add_collector(response_cache_metrics)
+
+    runs_jobs = bool(args.batch or args.resume or args.retry_failed)
+    headless = runs_jobs or args.report or bool(args.export)
+    if not headless:
+        print_header()
     
-    if not config.GOOGLE_API_KEY:
+    if not config.GOOGLE_API_KEY and (runs_jobs or not headless):
         console.print("[bold red]Error: GOOGLE_API_KEY is not set.[/bold red]")
         console.print("Please create a '.env' file and add your key.")
         return
 
-    db_manager = ChromaDBManager()
+    if headless or args.review_queue:
+        ctx = None
+        if runs_jobs or args.report:
+            run_batch(args)
+        elif args.review_queue:
+            ctx = WorkflowContext()
+            run_review_queue(ctx)
+        if args.export:
+            run_export(args)
+        finish_session(args, tracer, ctx)
+        return
 
-    latest_meta, _, _ = db_manager.get_latest_version()
+    ctx = WorkflowContext()
+
+    latest_meta, _, _ = ctx.db_manager.get_latest_version(ctx.book, ctx.chapter)
     if latest_meta and Confirm.ask("\n[bold]Previous work found. Continue from the latest version?[/bold]", default=True):
         console.print(f"Resuming workflow from version {latest_meta.get('version')}.")
     else:
         if latest_meta:
             console.print("Starting workflow from scratch...")
-        run_scraper_stage(db_manager)
-        run_writer_stage(db_manager)
-        run_reviewer_stage(db_manager)
+        duplicate = run_scraper_stage(ctx)
+        latest = ctx.db_manager.catalog.latest(ctx.book, ctx.chapter)
+        if duplicate is not None and latest['version'] != duplicate['version']:
+            # The unchanged source was already rewritten; skip paying for it again.
+            ctx.db_manager.note_reused_output(model_outputs_since(
+                ctx.db_manager, ctx.book, ctx.chapter, latest['version'], duplicate['version']
+            ))
+            console.print(f"Skipping the rewrite; continuing from version {latest['version']}.")
+        else:
+            run_rewrite(ctx)
 
-    while run_human_in_the_loop(db_manager): #Human Interaction
+    while run_human_in_the_loop(ctx): #Human Interaction
         pass 
 
-    run_semantic_search(db_manager)
+    run_semantic_search(ctx)
+
+    finish_session(args, tracer, ctx)
     
     console.print("\n[bold magenta]Workflow finished. Goodbye![/bold magenta]")
 
@@ -0,0 +1,262 @@
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+import config
+from call_policy import (AttemptTimeout, DeadlineExceeded, LimiterTimeout, breaker_for, backoff_delay,
+                         is_rate_limit, is_retryable, latencies_for)
+from instrumentation import annotate, traced
+from rate_limiter import estimate_tokens
+from response_cache import make_key
+
+
+class ModelClient:
+    # Single entry point for model calls made by the agents. Applies the
+    # shared rate limiter and the response cache around generate_content,
+    # and runs every call under a deadline with jittered retries, optional
+    # hedging and a circuit breaker shared by all clients of the same model.
+
+    def __init__(self, model, generation_config: dict = None, limiter=None, cache=None):
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+        self.generation_config = generation_config or {}
+        self.limiter = limiter
+
+        if (cache is not None and config.RESPONSE_CACHE_BYPASS_SAMPLED
+                and self.generation_config.get("temperature", 0) > 0):
+            cache = None
+        self.cache = cache
+        self.breaker = breaker_for(self.model_name)
+        self.latencies = latencies_for(self.model_name)
+
+    def _acquire(self, prompt: str, timeout: float):
+        # Takes a limiter slot for one request, waiting no longer than the
+        # attempt may take. Returns a release function that is safe to call
+        # more than once: an attempt that is abandoned (timed out, or beaten
+        # by its hedge) releases its slot at once rather than when the
+        # abandoned request finally returns.
+        if self.limiter is None:
+            return lambda: None
+        if not self.limiter.acquire(prompt, timeout=timeout):
+            raise LimiterTimeout(f"no rate-limiter slot within {timeout:.1f}s")
+        once = threading.Lock()
+
+        def release():
+            if once.acquire(blocking=False):
+                self.limiter.release()
+
+        return release
+
+    def _deadline(self) -> float:
+        return time.monotonic() + config.MODEL_CALL_DEADLINE if config.MODEL_CALL_DEADLINE else None
+
+    @staticmethod
+    def _timeout(deadline: float) -> float:
+        # Time the next attempt may take: the per-attempt timeout, capped by
+        # what is left of the call's deadline.
+        limits = [config.MODEL_ATTEMPT_TIMEOUT] if config.MODEL_ATTEMPT_TIMEOUT else []
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"model call exceeded its {config.MODEL_CALL_DEADLINE}s deadline")
+            limits.append(remaining)
+        return min(limits) if limits else None
+
+    def _with_retries(self, attempt, deadline: float, retry_ok=lambda: True, quiet: bool = False):
+        # Runs `attempt(deadline)` until it succeeds, the error is not
+        # transient, MODEL_MAX_RETRIES is used up or the deadline would pass.
+        # Rate-limit rejections back off longer and do not count towards
+        # opening the circuit.
+        for number in range(config.MODEL_MAX_RETRIES + 1):
+            probe = self.breaker.before_call()
+            try:
+                result = attempt(deadline)
+            except BaseException as e:
+                # Only transient failures at the endpoint count against it; a
+                # probe that ended any other way (including waiting for a
+                # local limiter slot, or Ctrl+C) is released.
+                rate_limited = is_rate_limit(e)
+                if is_retryable(e) and not rate_limited and not isinstance(e, LimiterTimeout):
+                    self.breaker.record_failure()
+                elif probe:
+                    self.breaker.release_probe()
+                if not is_retryable(e) or number == config.MODEL_MAX_RETRIES or not retry_ok():
+                    raise
+                delay = backoff_delay(number, rate_limited)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded(f"no time left to retry before the deadline: {e}") from e
+                if not quiet:
+                    print(f"Model call failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s...")
+                annotate(retries=number + 1, rate_limited=int(rate_limited))
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _start(self, prompt: str, timeout: float) -> Future:
+        # Runs one generate_content call on a daemon thread, so an attempt
+        # that overruns its timeout can be abandoned without blocking exit.
+        # The future's `release` frees its limiter slot.
+        future = Future()
+        future.release = self._acquire(prompt, timeout)
+
+        def call():
+            try:
+                start = time.perf_counter()
+                text = self.model.generate_content(prompt).text
+                self.latencies.record(time.perf_counter() - start)
+                future.set_result(text)
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                future.release()
+
+        threading.Thread(target=call, daemon=True).start()
+        return future
+
+    def _attempt(self, prompt: str, deadline: float) -> str:
+        # One attempt, hedged with a duplicate request once it runs longer
+        # than the recent p95; the first successful response wins.
+        timeout = self._timeout(deadline)
+        ends = time.monotonic() + timeout if timeout is not None else None
+
+        def remaining():
+            return max(0.0, ends - time.monotonic()) if ends is not None else None
+
+        pending = [self._start(prompt, timeout)]
+        try:
+            hedge_after = self.latencies.hedge_delay() if config.MODEL_HEDGING_ENABLED else None
+            if hedge_after is not None and (timeout is None or hedge_after < remaining()):
+                done, _ = wait(pending, timeout=hedge_after)
+                if not done:
+                    # A hedge only goes out if the limiter has room right now.
+                    try:
+                        pending.append(self._start(prompt, 0))
+                        annotate(hedged=1)
+                    except AttemptTimeout:
+                        pass
+
+            error = None
+            while pending:
+                done, still = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise AttemptTimeout(f"no response within {timeout:.1f}s")
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+                pending = list(still)
+            raise error
+        finally:
+            # Requests still running here are abandoned.
+            for future in pending:
+                future.release()
+
+    def _cached(self, prompt: str, use_cache: bool):
+        # Returns (key, cached_text); key is None when caching is off.
+        if self.cache is None or not use_cache:
+            return None, None
+        key = make_key(prompt, self.model_name, self.generation_config)
+        return key, self.cache.get(key)
+
+    @traced("model.generate")
+    def generate(self, prompt: str, use_cache: bool = True, quiet: bool = False) -> str:
+        # quiet=True keeps progress messages off the terminal, for calls made
+        # in the background while the operator is at a prompt.
+        annotate(prompt_chars=len(prompt), prompt_tokens=estimate_tokens(prompt))
+        key, cached = self._cached(prompt, use_cache)
+        if cached is not None:
+            if not quiet:
+                print("Using cached model response.")
+            annotate(cache_hits=1, response_chars=len(cached), response_tokens=estimate_tokens(cached))
+            return cached
+
+        text = self._with_retries(lambda deadline: self._attempt(prompt, deadline), self._deadline(), quiet=quiet)
+        if key is not None:
+            self.cache.put(key, text)
+        annotate(response_chars=len(text), response_tokens=estimate_tokens(text))
+        return text
+
+    @traced("model.stream")
+    def stream(self, prompt: str, on_chunk, use_cache: bool = True, collect: bool = True) -> tuple[str, dict]:
+        # Streams the response, calling `on_chunk` with each text fragment as
+        # it arrives. Returns the full text (None when `collect` is False and
+        # nothing needs it for the cache) and a timing dict with time to first
+        # token and total latency in seconds.
+        start = time.perf_counter()
+        annotate(prompt_chars=len(prompt), prompt_tokens=estimate_tokens(prompt))
+        key, cached = self._cached(prompt, use_cache)
+        if cached is not None:
+            on_chunk(cached)
+            elapsed = time.perf_counter() - start
+            annotate(cache_hits=1, response_chars=len(cached), response_tokens=estimate_tokens(cached))
+            return cached, {"ttft": elapsed, "total": elapsed, "cached": True}
+
+        keep = collect or key is not None
+        parts = []
+        ttft = None
+        response_chars = 0
+
+        def attempt(deadline):
+            nonlocal ttft, response_chars
+            for text in self._stream_chunks(prompt, deadline):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                if keep:
+                    parts.append(text)
+                response_chars += len(text)
+                on_chunk(text)
+
+        # Once text has reached on_chunk a retry would repeat it, so only
+        # failures before the first chunk are retried.
+        self._with_retries(attempt, self._deadline(), retry_ok=lambda: ttft is None)
+
+        total = time.perf_counter() - start
+        annotate(response_chars=response_chars, response_tokens=max(1, response_chars // 4),
+                 ttft_seconds=ttft if ttft is not None else total)
+        full_text = "".join(parts) if keep else None
+        if key is not None:
+            self.cache.put(key, full_text)
+        return full_text, {"ttft": ttft if ttft is not None else total, "total": total, "cached": False}
+
+    def _stream_chunks(self, prompt: str, deadline: float):
+        # Yields the text of each streamed chunk. The response is read on a
+        # daemon thread, so the wait for each next chunk is bounded by the
+        # attempt timeout (and the deadline) instead of blocking on a stalled
+        # connection.
+        chunks = queue.Queue()
+        release = self._acquire(prompt, self._timeout(deadline))
+
+        def pump():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks carrying only finish/safety metadata have no text.
+                        continue
+                    if text:
+                        chunks.put(("text", text))
+                chunks.put(("done", None))
+            except BaseException as e:
+                chunks.put(("error", e))
+            finally:
+                release()
+
+        threading.Thread(target=pump, daemon=True).start()
+        try:
+            while True:
+                timeout = self._timeout(deadline)
+                try:
+                    kind, value = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise AttemptTimeout(f"stream stalled for {timeout:.1f}s")
+                if kind == "done":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            # A stalled stream that is given up on frees its slot now.
+            release()
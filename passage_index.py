@@ -0,0 +1,233 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import config
+from chunking import split_paragraphs
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Metadata key of the token store_version tags its rows with. It is kept out
+# of the metadata callers see; public() strips it from rows read back.
+WRITE_TOKEN = "_write_id"
+
+
+def split_passages(text: str, max_chars: int = None) -> list:
+    # Groups consecutive paragraphs into passages of at most `max_chars`
+    # characters so long chapters are embedded piecewise instead of being
+    # truncated by the embedding model.
+    max_chars = max_chars or config.PASSAGE_MAX_CHARS
+    passages, current, size = [], [], 0
+    for paragraph in split_paragraphs(text):
+        if current and size + len(paragraph) > max_chars:
+            passages.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+    if current:
+        passages.append("\n\n".join(current))
+    return passages
+
+
+def public(metadata: dict) -> dict:
+    return {key: value for key, value in metadata.items() if key != WRITE_TOKEN}
+
+
+def mean_vector(vectors: list) -> list:
+    # Normalised mean of passage embeddings, used as the embedding of the
+    # whole text so it never has to be embedded in one piece.
+    mean = [sum(column) / len(vectors) for column in zip(*vectors)]
+    norm = sum(x * x for x in mean) ** 0.5 or 1.0
+    return [x / norm for x in mean]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    # Persistent memo of passage embeddings keyed by content hash, so an
+    # unchanged paragraph is embedded once no matter how many versions share it.
+
+    def __init__(self, path: str = None):
+        self.path = path or config.EMBEDDING_CACHE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+
+    def get_many(self, hashes: list) -> dict:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, blob in self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})", batch
+                ):
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        self.hits += len(found)
+        self.misses += len(set(hashes)) - len(found)
+        return found
+
+    def put_many(self, items: dict):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+
+class PassageIndex:
+    # Passage-level companion to the version collection. Every stored version
+    # is split into passages whose embeddings come from the cache when the
+    # text is unchanged, and only new passages are sent to the embedding
+    # function, in batches.
+
+    def __init__(self, client, embedding_function, cache: EmbeddingCache = None):
+        self.embedding_function = embedding_function
+        self.cache = cache or EmbeddingCache()
+        self.collection = client.get_or_create_collection(
+            name=config.CHROMA_PASSAGE_COLLECTION_NAME,
+            embedding_function=embedding_function
+        )
+        self.embedded = 0
+
+    def embed(self, texts: list) -> list:
+        hashes = [content_hash(text) for text in texts]
+        vectors = self.cache.get_many(hashes)
+
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing[key] = text
+        keys = list(missing)
+        for start in range(0, len(keys), config.PASSAGE_BATCH_SIZE):
+            batch = keys[start:start + config.PASSAGE_BATCH_SIZE]
+            embeddings = self.embedding_function([missing[key] for key in batch])
+            fresh = {key: [float(x) for x in vector] for key, vector in zip(batch, embeddings)}
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+            self.embedded += len(batch)
+
+        return [vectors[key] for key in hashes]
+
+    def prepare(self, text: str) -> tuple[list, list]:
+        # Passages of `text` and their embeddings, without writing anything.
+        passages = split_passages(text)
+        return passages, self.embed(passages) if passages else []
+
+    def index(self, doc_id: str, text: str, metadata: dict, prepared: tuple = None, write_id: str = None) -> int:
+        # `prepared` is the result of prepare(), when the caller already has it;
+        # `write_id` tags the passages so remove() can tell them apart.
+        passages, embeddings = prepared or self.prepare(text)
+        if not passages:
+            return 0
+
+        metadatas = []
+        for i in range(len(passages)):
+            passage_meta = {
+                key: value for key, value in metadata.items()
+                if key in ("version", "status", "book", "chapter")
+            }
+            passage_meta.update({"parent_id": doc_id, "passage": i})
+            if write_id is not None:
+                passage_meta[WRITE_TOKEN] = write_id
+            metadatas.append(passage_meta)
+
+        self.collection.add(
+            ids=[f"{doc_id}#p{i}" for i in range(len(passages))],
+            embeddings=embeddings,
+            documents=passages,
+            metadatas=metadatas
+        )
+        return len(passages)
+
+    def remove(self, doc_id: str, write_id: str = None):
+        # With `write_id`, only the passages written under that tag go.
+        where = {"parent_id": doc_id}
+        if write_id is not None:
+            where = {"$and": [where, {WRITE_TOKEN: write_id}]}
+        self.collection.delete(where=where)
+
+    def query(self, query: str, num_results: int = 3) -> list:
+        query_embedding = self.embed([query])
+        results = self.collection.query(
+            query_embeddings=query_embedding,
+            n_results=num_results,
+            include=["documents", "metadatas", "distances"]
+        )
+        hits = []
+        for i, distance in enumerate(results['distances'][0]):
+            metadata = public(results['metadatas'][0][i])
+            hits.append({
+                "passage_id": results['ids'][0][i],
+                "parent_id": metadata.get("parent_id"),
+                "distance": distance,
+                "metadata": metadata,
+                "passage": results['documents'][0][i]
+            })
+        return hits
+
+
+class PassagePrefetcher:
+    # Embeds the passages of a text while it is still streaming in, so that
+    # storing the finished text finds their vectors in the embedding cache.
+    # Passages are closed exactly where split_passages() would close them on
+    # the full text, and each one is embedded on a background thread.
+
+    def __init__(self, index: PassageIndex, max_chars: int = None):
+        self.index = index
+        self.max_chars = max_chars or config.PASSAGE_MAX_CHARS
+        self.passages = []
+        self._buffer = ""
+        self._current, self._size = [], 0
+        self._futures = []
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+    def _add(self, paragraph: str):
+        if self._current and self._size + len(paragraph) > self.max_chars:
+            self._submit()
+        self._current.append(paragraph)
+        self._size += len(paragraph) + 2
+
+    def _submit(self):
+        passage = "\n\n".join(self._current)
+        self._current, self._size = [], 0
+        self.passages.append(passage)
+        self._futures.append(self._pool.submit(self.index.embed, [passage]))
+
+    def feed(self, chunk: str):
+        # Paragraphs are complete once a blank line follows them.
+        self._buffer += chunk
+        last = None
+        for last in PARAGRAPH_BREAK.finditer(self._buffer):
+            pass
+        if last is None:
+            return
+        for paragraph in split_paragraphs(self._buffer[:last.start()]):
+            self._add(paragraph)
+        self._buffer = self._buffer[last.end():]
+
+    def close(self) -> list:
+        # Embeds the last passage and waits for all of them. A failed embed
+        # is left for store_version to redo.
+        for paragraph in split_paragraphs(self._buffer):
+            self._add(paragraph)
+        self._buffer = ""
+        if self._current:
+            self._submit()
+        wait(self._futures)
+        self._pool.shutdown()
+        return self.passages
@@ -0,0 +1,84 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic (~4 characters per token) that is good enough for
+    # budgeting against a tokens-per-minute quota.
+    return max(1, len(text or "") // 4)
+
+
+class TokenBucket:
+    # Classic token bucket refilled continuously at `rate_per_minute`.
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0, timeout: float = None) -> bool:
+        # A request larger than the bucket would never fit, so it is clamped
+        # to the capacity and simply waits for a full bucket. Returns False,
+        # taking nothing, when that would take longer than `timeout`.
+        amount = min(amount, self.capacity)
+        ends = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait = (amount - self.tokens) / self.rate
+            if ends is not None and time.monotonic() + wait > ends:
+                return False
+            time.sleep(wait)
+
+
+class RateLimiter:
+    # Shared limiter for model calls: requests/min, tokens/min and a cap on
+    # concurrent in-flight calls. One instance is shared by every agent.
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None, max_in_flight: int = None):
+        self.requests = TokenBucket(requests_per_minute or config.MODEL_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(tokens_per_minute or config.MODEL_TOKENS_PER_MINUTE)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight or config.MODEL_MAX_IN_FLIGHT)
+
+    def acquire(self, prompt: str, expected_output_tokens: int = 0, timeout: float = None) -> bool:
+        # Takes an in-flight slot plus request and token budget, waiting at
+        # most `timeout` seconds overall. Returns False, holding no slot, when
+        # they are not available in time; a request already taken from the
+        # requests bucket is not refunded. Call release() when the request
+        # finishes or is given up on.
+        ends = time.monotonic() + timeout if timeout is not None else None
+
+        def remaining():
+            return max(0.0, ends - time.monotonic()) if ends is not None else None
+
+        if not self.in_flight.acquire(timeout=remaining()):
+            return False
+        if (self.requests.acquire(1, timeout=remaining())
+                and self.tokens.acquire(estimate_tokens(prompt) + expected_output_tokens, timeout=remaining())):
+            return True
+        self.in_flight.release()
+        return False
+
+    def release(self):
+        self.in_flight.release()
+
+    @contextmanager
+    def slot(self, prompt: str, expected_output_tokens: int = 0):
+        self.acquire(prompt, expected_output_tokens)
+        try:
+            yield
+        finally:
+            self.release()
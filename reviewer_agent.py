@@ -1,20 +1,101 @@
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+
 import config
+from chunking import split_into_windows, contextual_prompt, stitch
+from instrumentation import traced
+from model_client import ModelClient
+from response_cache import get_default_cache
+
+REVISED_MARKER = "**Revised Chapter:**"
+
+class ReviewStreamParser:
+    # Incremental parser for the reviewer's response format. Suggestions are
+    # reported as soon as their line completes, and once the revised-chapter
+    # marker is seen the remaining fragments go straight to the revised body,
+    # so the response is never buffered and re-split as a whole.
+
+    def __init__(self, on_suggestion=None, on_revised_chunk=None):
+        self.on_suggestion = on_suggestion
+        self.on_revised_chunk = on_revised_chunk
+        self.found_marker = False
+        self._pending = ""
+        self._feedback_lines = []
+        self._revised_parts = []
+
+    def _consume_lines(self, text: str):
+        for line in text.splitlines():
+            self._feedback_lines.append(line)
+            stripped = line.strip()
+            if stripped.startswith(("-", "*")) and not stripped.startswith("**") and self.on_suggestion:
+                self.on_suggestion(stripped)
+
+    def _emit_revised(self, chunk: str):
+        if not self._revised_parts:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return
+        self._revised_parts.append(chunk)
+        if self.on_revised_chunk:
+            self.on_revised_chunk(chunk)
+
+    def feed(self, chunk: str):
+        if self.found_marker:
+            self._emit_revised(chunk)
+            return
+
+        self._pending += chunk
+        marker_index = self._pending.find(REVISED_MARKER)
+        if marker_index != -1:
+            self._consume_lines(self._pending[:marker_index])
+            tail = self._pending[marker_index + len(REVISED_MARKER):]
+            self._pending = ""
+            self.found_marker = True
+            if tail:
+                self._emit_revised(tail)
+            return
+
+        # Only complete lines are consumed; the marker never spans a newline,
+        # so it can only be hiding in the trailing partial line.
+        last_newline = self._pending.rfind("\n")
+        if last_newline != -1:
+            self._consume_lines(self._pending[:last_newline + 1])
+            self._pending = self._pending[last_newline + 1:]
+
+    def close(self) -> tuple[str, str]:
+        if self._pending:
+            self._consume_lines(self._pending)
+            self._pending = ""
+        feedback = "\n".join(self._feedback_lines).strip()
+        revised_text = "".join(self._revised_parts).rstrip()
+        return feedback, revised_text
 
 class ReviewerAgent:
    
-    def __init__(self):
+    def __init__(self, model=None, limiter=None, cache=None):
         
         print("Initializing Reviewer Agent...")
-        if not config.GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+        self.generation_config = {"temperature": 0.4}
+
+        if model is None:
+            # Imported here so runs that never call the model skip the ~1s import.
+            import google.generativeai as genai
+
+            if not config.GOOGLE_API_KEY:
+                raise ValueError("GOOGLE_API_KEY not found in environment variables.")
             
-        genai.configure(api_key=config.GOOGLE_API_KEY)
+            genai.configure(api_key=config.GOOGLE_API_KEY)
         
-        self.model = genai.GenerativeModel(
-            config.GEMINI_MODEL,
-            generation_config={"temperature": 0.4}
-        )
+            model = genai.GenerativeModel(
+                config.GEMINI_MODEL,
+                generation_config=self.generation_config
+            )
+            if cache is None and config.RESPONSE_CACHE_ENABLED:
+                cache = get_default_cache()
+
+        # Injected models (e.g. a local fake) skip API configuration and
+        # only use a cache when one is passed explicitly.
+        self.model = model
+        self.client = ModelClient(model, self.generation_config, limiter=limiter, cache=cache)
         print("Reviewer Agent ready.")
 
     def _create_prompt(self, spun_text: str) -> str:
@@ -37,25 +118,85 @@ class ReviewerAgent:
             f"Draft to Review:\n{spun_text}"
         )
 
-    def run(self, spun_text: str) -> tuple[str, str]:
-        
+    @traced("reviewer.run")
+    def run(self, spun_text: str, quiet: bool = False) -> tuple[str, str]:
+        # quiet=True prints nothing, for background runs.
         prompt = self._create_prompt(spun_text)
+        log = (lambda *args: None) if quiet else print
         
-        print("Sending request to Gemini for review and refinement...")
+        log("Sending request to Gemini for review and refinement...")
         try:
-            response = self.model.generate_content(prompt)
-            full_response_text = response.text
+            full_response_text = self.client.generate(prompt, quiet=quiet)
             
-            if "**Revised Chapter:**" in full_response_text:
-                parts = full_response_text.split("**Revised Chapter:**", 1)
+            if REVISED_MARKER in full_response_text:
+                parts = full_response_text.split(REVISED_MARKER, 1)
                 feedback = parts[0].strip()
                 revised_text = parts[1].strip()
+                log("Successfully received and parsed the review.")
+                return feedback, revised_text
+            else:
+                log("Warning: Reviewer output was not in the expected format.")
+                return full_response_text, spun_text
+
+        except Exception as e:
+            log(f"An error occurred while communicating with the Gemini API: {e}")
+            return None, None
+
+    @traced("reviewer.run_stream")
+    def run_stream(self, spun_text: str, on_suggestion=None, on_revised_chunk=None) -> tuple[str, str]:
+        # Streaming variant of run. `on_suggestion` receives each suggestion
+        # line as it completes; `on_revised_chunk` receives fragments of the
+        # revised chapter as they arrive.
+        prompt = self._create_prompt(spun_text)
+        parser = ReviewStreamParser(on_suggestion, on_revised_chunk)
+
+        print("Streaming request to Gemini for review and refinement...")
+        try:
+            _, timing = self.client.stream(prompt, parser.feed, collect=False)
+            feedback, revised_text = parser.close()
+            print(f"Reviewer Agent stream finished. Time to first token: {timing['ttft']:.2f}s, "
+                  f"total: {timing['total']:.2f}s")
+
+            if parser.found_marker:
                 print("Successfully received and parsed the review.")
                 return feedback, revised_text
             else:
                 print("Warning: Reviewer output was not in the expected format.")
-                return full_response_text, spun_text
+                return feedback, spun_text
+
+        except Exception as e:
+            print(f"An error occurred while communicating with the Gemini API: {e}")
+            return None, None
+
+    @traced("reviewer.run_chunked")
+    def run_chunked(self, spun_text: str, max_workers: int = None) -> tuple[str, str]:
+        # Reviews a long draft window by window in parallel. Suggestions are
+        # grouped per part and the revised parts are stitched back together;
+        # a part whose response lacks the marker keeps its original text.
+        windows = split_into_windows(spun_text)
+        print(f"Sending {len(windows)} chunk requests to Gemini for review and refinement...")
+
+        def review(window):
+            prompt = contextual_prompt(self._create_prompt(window.body), window, len(windows))
+            return self.client.generate(prompt)
 
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers or config.CHUNK_MAX_WORKERS) as pool:
+                responses = list(pool.map(review, windows))
         except Exception as e:
             print(f"An error occurred while communicating with the Gemini API: {e}")
             return None, None
+
+        feedback_parts, revised_parts = [], []
+        for window, response_text in zip(windows, responses):
+            if REVISED_MARKER in response_text:
+                notes, revised = response_text.split(REVISED_MARKER, 1)
+                revised_parts.append(revised.strip())
+            else:
+                print(f"Warning: Reviewer output for part {window.index + 1} was not in the expected format.")
+                notes = response_text
+                revised_parts.append(window.body)
+            feedback_parts.append(f"Part {window.index + 1}:\n{notes.strip()}")
+
+        print("Successfully received and parsed all review chunks.")
+        return "\n\n".join(feedback_parts), stitch(revised_parts, windows)
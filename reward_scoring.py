@@ -0,0 +1,141 @@
+import numpy as np
+
+import config
+
+# Column order of the feature matrix; matches the keys of config.REWARD_WEIGHTS.
+FEATURES = ("length", "keywords", "noise")
+
+
+def reference_score(text: str, weights: dict = None) -> float:
+    # The original per-page score, kept as the reference RewardScorer must
+    # match bit for bit (see tests/test_reward_scoring.py).
+    weights = weights or config.REWARD_WEIGHTS
+    length_score = min((len(text) / 5000.0) * 100, 100)
+
+    found_keywords = sum(1 for keyword in config.REWARD_KEYWORDS if keyword in text.lower())
+    keyword_score = (found_keywords / len(config.REWARD_KEYWORDS)) * 100
+
+    words = text.lower().split()
+    noise_count = sum(1 for word in words if word in config.NOISE_WORDS)
+    noise_ratio = (noise_count / len(words)) if len(words) > 0 else 0
+    noise_score = noise_ratio * 1000 # Amplify the penalty
+
+    final_score = (
+        (length_score * weights['length']) +
+        (keyword_score * weights['keywords']) +
+        (noise_score * weights['noise'])
+    )
+    return max(0, min(100, final_score))
+
+
+class RewardScorer:
+    # Batch version of reference_score, used by ScraperAgent. Each document is
+    # lowercased and split once, noise words are looked up in a frozenset
+    # instead of a list, and a corpus is scored from an (n, 3) feature matrix
+    # so re-weighting it never rescans the text.
+
+    def __init__(self, keywords: list = None, noise_words: list = None):
+        self.keywords = list(keywords if keywords is not None else config.REWARD_KEYWORDS)
+        self.noise_words = frozenset(noise_words if noise_words is not None else config.NOISE_WORDS)
+        self._unique_keywords = tuple(dict.fromkeys(self.keywords))
+        self._max_keyword = max((len(k) for k in self._unique_keywords), default=0)
+
+    def _keywords_in(self, lowered: str) -> set:
+        # For keyword lists of this size, CPython's substring search on the
+        # single lowered copy is faster than a multi-pattern automaton.
+        return {keyword for keyword in self._unique_keywords if keyword in lowered}
+
+    def _words(self, lowered: str) -> tuple:
+        words = lowered.split()
+        return len(words), sum(map(self.noise_words.__contains__, words))
+
+    def _row(self, length: int, found_keywords: int, word_count: int, noise_count: int) -> tuple:
+        # Same arithmetic, in the same order, as reference_score.
+        length_score = min((length / 5000.0) * 100, 100)
+        keyword_score = (found_keywords / len(self.keywords)) * 100
+        noise_ratio = (noise_count / word_count) if word_count > 0 else 0
+        noise_score = noise_ratio * 1000
+        return length_score, keyword_score, noise_score
+
+    def features(self, text: str) -> tuple:
+        lowered = text.lower()
+        found = self._keywords_in(lowered)
+        found_keywords = sum(1 for keyword in self.keywords if keyword in found)
+        word_count, noise_count = self._words(lowered)
+        return self._row(len(text), found_keywords, word_count, noise_count)
+
+    def feature_matrix(self, texts: list) -> np.ndarray:
+        matrix = np.empty((len(texts), len(FEATURES)), dtype=np.float64)
+        for i, text in enumerate(texts):
+            matrix[i] = self.features(text)
+        return matrix
+
+    @staticmethod
+    def weight_vector(weights: dict = None) -> np.ndarray:
+        weights = weights or config.REWARD_WEIGHTS
+        return np.array([weights[name] for name in FEATURES], dtype=np.float64)
+
+    @staticmethod
+    def score_matrix(matrix: np.ndarray, weights: dict = None) -> np.ndarray:
+        # Weighted sum over the feature columns, clipped to [0, 100]. The
+        # products are summed column by column (rather than with `@`) so the
+        # floating-point result is bit-identical to the scalar function.
+        w = RewardScorer.weight_vector(weights)
+        scores = matrix[:, 0] * w[0]
+        for column in range(1, len(FEATURES)):
+            scores = scores + matrix[:, column] * w[column]
+        return np.clip(scores, 0, 100)
+
+    def score(self, text: str, weights: dict = None) -> float:
+        return float(self.score_matrix(np.array([self.features(text)]), weights)[0])
+
+    def score_many(self, texts: list, weights: dict = None) -> np.ndarray:
+        return self.score_matrix(self.feature_matrix(texts), weights)
+
+    def stream(self) -> "StreamingScore":
+        return StreamingScore(self)
+
+
+class StreamingScore:
+    # Incremental score for a page arriving section by section. Counts are
+    # carried across section boundaries (a partial trailing word, and enough
+    # characters to catch a keyword split between sections), so the final
+    # score equals scoring the concatenated text in one go.
+
+    def __init__(self, scorer: RewardScorer):
+        self.scorer = scorer
+        self.length = 0
+        self.word_count = 0
+        self.noise_count = 0
+        self.found = set()
+        self._partial_word = ""
+        self._keyword_tail = ""
+
+    def feed(self, section: str):
+        self.length += len(section)
+        lowered = section.lower()
+
+        window = self._keyword_tail + lowered
+        self.found |= self.scorer._keywords_in(window)
+        keep = self.scorer._max_keyword - 1
+        self._keyword_tail = window[-keep:] if keep > 0 else ""
+
+        text = self._partial_word + lowered
+        cut = len(text)
+        while cut > 0 and not text[cut - 1].isspace():
+            cut -= 1
+        complete, self._partial_word = text[:cut], text[cut:]
+        word_count, noise_count = self.scorer._words(complete)
+        self.word_count += word_count
+        self.noise_count += noise_count
+
+    def features(self) -> tuple:
+        word_count, noise_count = self.word_count, self.noise_count
+        if self._partial_word:
+            word_count += 1
+            noise_count += 1 if self._partial_word in self.scorer.noise_words else 0
+        found_keywords = sum(1 for keyword in self.scorer.keywords if keyword in self.found)
+        return self.scorer._row(self.length, found_keywords, word_count, noise_count)
+
+    def score(self, weights: dict = None) -> float:
+        return float(RewardScorer.score_matrix(np.array([self.features()]), weights)[0])
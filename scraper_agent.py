@@ -1,35 +1,136 @@
-from playwright.sync_api import sync_playwright, Page
+import asyncio
+from urllib.parse import urlparse
+
 import config 
+from instrumentation import annotate, span, traced
+from reward_scoring import RewardScorer
+from screenshot_store import ScreenshotStore, screenshot_options
+
+class _PagePool:
+    # Bounded pool of pages on one shared browser. The browser is launched on
+    # first use, so batches served entirely by the HTTP fast path never start it.
+
+    def __init__(self, size: int):
+        self.size = size
+        self.slots = asyncio.Semaphore(size)
+        self._lock = asyncio.Lock()
+        self._queue = None
+        self._playwright = None
+        self._browser = None
+        self.captures = set()
+
+    async def get(self):
+        async with self._lock:
+            if self._queue is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch()
+                self._queue = asyncio.Queue()
+                for _ in range(self.size):
+                    context = await self._browser.new_context()
+                    self._queue.put_nowait(await context.new_page())
+        return await self._queue.get()
+
+    def put(self, page):
+        self._queue.put_nowait(page)
+
+    async def close(self):
+        if self.captures:
+            await asyncio.gather(*self.captures, return_exceptions=True)
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
 
 class ScraperAgent:
+
+    def __init__(self):
+        self._http = None
+        self.screenshots = ScreenshotStore()
+        self.scorer = RewardScorer()
+
+    def _screenshot_path(self, url: str, text_content: str) -> tuple[str, bool]:
+        # Returns (path, needs_capture); the path is None when screenshots
+        # are off. A page whose text has not changed reuses its screenshot.
+        if not config.SCREENSHOTS_ENABLED or not text_content:
+            return None, False
+        path = self.screenshots.path_for(url, text_content)
+        needs_capture = not self.screenshots.exists(path)
+        annotate(screenshot_reused=int(not needs_capture))
+        return path, needs_capture
+
+    async def _capture(self, pages: "_PagePool", page, path: str, future):
+        # Runs after the scrape result is returned; the page goes back to the
+        # pool only once the capture is done. `future` is the one begin()
+        # registered for the path, so settle() sees the outcome either way.
+        try:
+            self.screenshots.save(path, await page.screenshot(**screenshot_options()), future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            print(f"Screenshot for '{path}' failed: {e}")
+            future.set_exception(e)
+        finally:
+            pages.put(page)
+
+    @traced("scraper.http_fetch")
+    def _run_fast_path(self, url: str) -> tuple[str, str, float]:
+        # Plain HTTP fetch + local HTML parsing. Returns an empty result when
+        # the page is missing or scores below the threshold, so the caller
+        # falls back to the browser.
+        if self._http is None:
+            from http_fetcher import HttpFetcher
+
+            self._http = HttpFetcher()
+
+        text_content, status = self._http.fetch(url)
+        annotate(http_revalidated=int(status == "revalidated"), text_chars=len(text_content or ""))
+        if not text_content or text_content.isspace():
+            return None, None, 0.0
+
+        score = self._calculate_reward_score(text_content)
+        if score < config.REWARD_THRESHOLD:
+            print(f"HTTP fast path scored {score:.2f}; falling back to the browser.")
+            return None, None, 0.0
+
+        print(f"HTTP fast path succeeded ({status}). Calculated Reward Score: {score:.2f} / 100")
+        return text_content, None, score
     
     def _calculate_reward_score(self, text: str) -> float:
-   
-        length_score = min((len(text) / 5000.0) * 100, 100)
-
-        found_keywords = sum(1 for keyword in config.REWARD_KEYWORDS if keyword in text.lower())
-        keyword_score = (found_keywords / len(config.REWARD_KEYWORDS)) * 100
-
-        words = text.lower().split()
-        noise_count = sum(1 for word in words if word in config.NOISE_WORDS)
-        noise_ratio = (noise_count / len(words)) if len(words) > 0 else 0
-        noise_score = noise_ratio * 1000 # Amplify the penalty
-
-        # Combine scores using weights from the config file
-        final_score = (
-            (length_score * config.REWARD_WEIGHTS['length']) +
-            (keyword_score * config.REWARD_WEIGHTS['keywords']) +
-            (noise_score * config.REWARD_WEIGHTS['noise'])
-        )
-        
-        # Ensure the score is capped between 0 and 100
-        return max(0, min(100, final_score))
+        return self.scorer.score(text)
+
+    def _evaluate(self, text_content: str, screenshot_path: str) -> tuple[str, str, float]:
+
+        if not text_content or text_content.isspace():
+            print("Failed to extract any text content.")
+            return None, None, 0.0
+
+        print("Calculating quality score for the scraped text...")
+        score = self._calculate_reward_score(text_content)
+        print(f"Calculated Reward Score: {score:.2f} / 100")
+        annotate(text_chars=len(text_content), reward_score=score)
 
+        if score < config.REWARD_THRESHOLD:
+            print(f"Warning: Score is below the threshold of {config.REWARD_THRESHOLD}.")
+
+        return text_content, screenshot_path, score
+
+    @traced("scraper.run")
     def run(self, url: str) -> tuple[str, str, float]:
        
         print(f"Scraper Agent starting. Targeting URL: {url}")
+        if config.HTTP_FAST_PATH_ENABLED:
+            result = self._run_fast_path(url)
+            if result[0]:
+                return result
+
+        # Playwright is only imported once the browser is actually needed.
+        from playwright.sync_api import sync_playwright
+
         text_content = None
-        screenshot_path = "screenshot.png"
+        screenshot_path = None
 
         try:
             with sync_playwright() as p:
@@ -46,25 +147,113 @@ class ScraperAgent:
 
                 text_content = content_element.inner_text()
                 
-                print("Content extracted. Taking screenshot...")
-                page.screenshot(path=screenshot_path, full_page=True)
+                screenshot_path, needs_capture = self._screenshot_path(url, text_content)
+                if needs_capture:
+                    # Capture stays on this thread (the page dies with the
+                    # browser); the file is written in the background.
+                    print("Content extracted. Taking screenshot...")
+                    self.screenshots.save(screenshot_path, page.screenshot(**screenshot_options()))
                 
                 browser.close()
-                print(f"Screenshot saved to '{screenshot_path}'")
+                # Only a screenshot that actually reached disk is reported.
+                screenshot_path = self.screenshots.settle(screenshot_path)
+                if screenshot_path:
+                    print(f"Screenshot saved to '{screenshot_path}'")
 
         except Exception as e:
             print(f"An error occurred during scraping: {e}")
             return None, None, 0.0
 
-        if not text_content or text_content.isspace():
-            print("Failed to extract any text content.")
-            return None, None, 0.0
-            
-        print("Calculating quality score for the scraped text...")
-        score = self._calculate_reward_score(text_content)
-        print(f"Calculated Reward Score: {score:.2f} / 100")
+        return self._evaluate(text_content, screenshot_path)
 
-        if score < config.REWARD_THRESHOLD:
-            print(f"Warning: Score is below the threshold of {config.REWARD_THRESHOLD}.")
-        
-        return text_content, screenshot_path, score
+    async def _fetch(self, pages: "_PagePool", host_limits: dict, index: int, url: str) -> tuple:
+
+        host = urlparse(url).netloc
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(config.SCRAPER_PER_HOST_LIMIT)
+
+        async with host_limits[host]:
+            if config.HTTP_FAST_PATH_ENABLED:
+                async with pages.slots:
+                    result = await asyncio.to_thread(self._run_fast_path, url)
+                if result[0]:
+                    return index, url, result
+
+            page = await pages.get()
+            needs_capture = False
+            try:
+                print(f"[{index}] Navigating to {url}...")
+                await page.goto(url, wait_until="networkidle", timeout=60000)
+
+                content_element = page.locator(config.CONTENT_SELECTOR)
+                await content_element.wait_for(timeout=10000)
+                text_content = await content_element.inner_text()
+
+                screenshot_path, needs_capture = self._screenshot_path(url, text_content)
+            except Exception as e:
+                print(f"[{index}] An error occurred during scraping: {e}")
+                return index, url, (None, None, 0.0)
+            finally:
+                if needs_capture:
+                    future = self.screenshots.begin(screenshot_path)
+                    capture = asyncio.create_task(self._capture(pages, page, screenshot_path, future))
+                    pages.captures.add(capture)
+                    capture.add_done_callback(pages.captures.discard)
+                else:
+                    pages.put(page)
+
+        return index, url, self._evaluate(text_content, screenshot_path)
+
+    async def _traced_fetch(self, pages: "_PagePool", host_limits: dict, index: int, url: str) -> tuple:
+        # Each URL runs in its own task (and context), so spans never mix.
+        with span("scraper.fetch", url=url):
+            return await self._fetch(pages, host_limits, index, url)
+
+    async def stream_many(self, urls: list, max_concurrency: int = None):
+        # Async generator yielding (index, url, (text, screenshot, score)) in
+        # completion order, so callers can store each chapter as soon as it lands.
+        # The screenshot may still be capturing: pass it through
+        # self.screenshots.settle() before recording it.
+        urls = list(urls)
+        if not urls:
+            return
+
+        pool_size = min(max_concurrency or config.SCRAPER_MAX_CONCURRENCY, len(urls))
+        print(f"Scraper Agent starting batch of {len(urls)} URLs with {pool_size} pages.")
+
+        pages = _PagePool(pool_size)
+        try:
+            host_limits = {}
+            tasks = [
+                asyncio.create_task(self._traced_fetch(pages, host_limits, i, url))
+                for i, url in enumerate(urls)
+            ]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    yield await finished
+            finally:
+                for task in tasks:
+                    task.cancel()
+        finally:
+            await pages.close()
+
+    @traced("scraper.run_many")
+    def run_many(self, urls: list, on_result=None, max_concurrency: int = None) -> list:
+        # Synchronous wrapper around stream_many. `on_result` is called with each
+        # (index, url, result) tuple as it completes; the return value is the
+        # list of results in the original URL order, with every screenshot
+        # settled (results passed to `on_result` may still be capturing).
+        results = [None] * len(urls)
+
+        async def _consume():
+            async for index, url, result in self.stream_many(urls, max_concurrency):
+                results[index] = result
+                if on_result:
+                    on_result(index, url, result)
+
+        asyncio.run(_consume())
+        for index, result in enumerate(results):
+            if result is not None:
+                text, screenshot, score = result
+                results[index] = (text, self.screenshots.settle(screenshot), score)
+        return results
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import config
+
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+
+def screenshot_options() -> dict:
+    # Keyword arguments for Playwright's page.screenshot() from config.
+    options = {"type": config.SCREENSHOT_FORMAT, "full_page": config.SCREENSHOT_FULL_PAGE, "scale": "css"}
+    if config.SCREENSHOT_FORMAT != "png":
+        options["quality"] = config.SCREENSHOT_QUALITY
+    return options
+
+
+class ScreenshotStore:
+    # Screenshots stored per chapter URL and addressed by the hash of the
+    # page text they show. The path is known before anything is captured, so
+    # an unchanged page maps to the file that already exists and is not
+    # captured again, and capture/writes can finish after the scrape returns.
+    # A path is only worth recording once settle() has seen its file written.
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or config.SCREENSHOT_DIR
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot-writer")
+        self._pending = {}
+        self.captured = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+
+    def path_for(self, url: str, text: str) -> str:
+        chapter_dir = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        content = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, chapter_dir, f"{content}.{EXTENSIONS[config.SCREENSHOT_FORMAT]}")
+
+    def exists(self, path: str) -> bool:
+        if os.path.exists(path):
+            with self._lock:
+                self.deduplicated += 1
+            return True
+        return False
+
+    def begin(self, path: str) -> Future:
+        # Registers a capture of `path` before its bytes exist, so settle()
+        # waits for it. The returned future resolves once the file is written.
+        future = Future()
+        with self._lock:
+            self._drain()
+            self._pending[path] = future
+        return future
+
+    def save(self, path: str, data: bytes, future: Future = None) -> Future:
+        # Queues the write on the background writer thread.
+        future = future or self.begin(path)
+        with self._lock:
+            self.captured += 1
+        self._writer.submit(self._write, path, data, future)
+        return future
+
+    def _write(self, path: str, data: bytes, future: Future):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        with self._lock:
+            self.bytes_written += len(data)
+        future.set_result(path)
+
+    def _drain(self):
+        # Forgets finished writes; called with the lock held.
+        for path, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[path]
+                if future.cancelled() or future.exception() is not None:
+                    print(f"Screenshot '{path}' was not saved.")
+
+    def settle(self, path: str, timeout: float = None) -> str:
+        # Returns `path` once its screenshot is on disk, waiting for a capture
+        # or write still in flight; None when there is nothing to record.
+        if path is None:
+            return None
+        with self._lock:
+            future = self._pending.pop(path, None)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception as e:
+                print(f"Screenshot '{path}' was not saved: {e}")
+                return None
+        return path if os.path.exists(path) else None
+
+    def flush(self):
+        # Waits for queued writes, re-raising the first error.
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for future in pending:
+            future.result()
@@ -0,0 +1,139 @@
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, wait
+
+import config
+from instrumentation import annotate, span
+from passage_index import split_passages
+from reward_scoring import RewardScorer
+
+THREAD_PREFIX = "speculative"
+
+
+class Speculation:
+    # Background work for one HITL turn, started when a version is displayed:
+    # the version's passages are embedded for search, SPECULATIVE_CANDIDATES
+    # feedback-free rewrites are sampled, and the best of them (by reward
+    # score) is sent through the reviewer. The operator's answer decides what
+    # is used; everything else is cancelled. The agents run quietly, so their
+    # progress messages never land in the middle of the operator's prompt.
+
+    def __init__(self, executor: "SpeculativeExecutor", text: str, candidates: int):
+        self.executor = executor
+        self.text = text
+        self.started_at = time.perf_counter()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._best = None
+        pool = executor.pool
+        self.index = pool.submit(self._index)
+        self.candidates = [pool.submit(self._candidate) for _ in range(candidates)]
+        self.review = pool.submit(self._review) if self.candidates else None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _index(self) -> int:
+        # Chapters are indexed when stored; this loads the embedding model and
+        # fills the embedding cache, so a search after "approve" starts warm.
+        with span("speculative.index"):
+            db_manager = self.executor.ctx.db_manager
+            if db_manager.passages is None:
+                db_manager.embedding_function([self.text[:config.PASSAGE_MAX_CHARS]])
+                return 0
+            passages = split_passages(self.text)
+            db_manager.passages.embed(passages)
+            annotate(passages=len(passages))
+            return len(passages)
+
+    def _candidate(self) -> str:
+        if self.cancelled:
+            return None
+        with span("speculative.rewrite"):
+            # Candidates bypass the response cache so each one is a fresh sample.
+            return self.executor.ctx.writer.run(self.text, use_cache=False, quiet=True)
+
+    def _ranked(self) -> tuple:
+        # Best candidate and its score once every candidate has finished.
+        wait(self.candidates)
+        with self._lock:
+            if self._best is None:
+                texts = [future.result() for future in self.candidates
+                         if not future.cancelled() and future.exception() is None and future.result()]
+                if texts:
+                    scores = self.executor.scorer.score_many(texts)
+                    best = int(scores.argmax())
+                    self._best = (texts[best], float(scores[best]), len(texts))
+                else:
+                    self._best = (None, 0.0, 0)
+            return self._best
+
+    def _review(self) -> tuple:
+        best_text, _, _ = self._ranked()
+        if best_text is None or self.cancelled:
+            return None
+        with span("speculative.review"):
+            return self.executor.ctx.reviewer.run(best_text, quiet=True)
+
+    def candidates_ready(self) -> int:
+        return sum(1 for future in self.candidates if future.done())
+
+    def take(self) -> dict:
+        # Waits for whatever is still running and returns the best rewrite,
+        # its score and its review (None when no candidate came back, or when
+        # the review failed, so the caller reviews live). Work already in
+        # flight is reused rather than started again.
+        if not self.candidates:
+            return None
+        best_text, score, count = self._ranked()
+        if best_text is None:
+            return None
+        review = None
+        if self.review is not None:
+            try:
+                review = self.review.result()
+            except (Exception, CancelledError) as e:
+                annotate(review_failed=1)
+                print(f"Speculative review failed ({type(e).__name__}: {e}).")
+        self.executor.used += 1
+        return {"text": best_text, "score": score, "candidates": count, "review": review}
+
+    def cancel(self):
+        # Drops the rewrite/review work: queued tasks never start, and tasks
+        # already calling the model have their results discarded. Indexing is
+        # left to finish because the displayed version stays in the archive.
+        if self.cancelled:
+            return
+        self._cancelled.set()
+        abandoned = [future for future in self.candidates + [self.review] if future is not None]
+        self.executor.cancelled += sum(1 for future in abandoned if future.cancel() or not future.done())
+
+
+class SpeculativeExecutor:
+    # Long-lived worker pool for HITL speculation, shared by every turn of a
+    # session. With no candidates (the default) it only pre-indexes.
+
+    def __init__(self, ctx, candidates: int = None, max_workers: int = None):
+        self.ctx = ctx
+        self.candidates = config.SPECULATIVE_CANDIDATES if candidates is None else candidates
+        if not self.candidates:
+            print("Speculation will only pre-index each version; set SPECULATIVE_CANDIDATES above 0 "
+                  "to pre-generate rewrites.")
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or config.SPECULATION_MAX_WORKERS, thread_name_prefix=THREAD_PREFIX
+        )
+        self.scorer = RewardScorer()
+        self.started = 0
+        self.used = 0
+        self.cancelled = 0
+
+    def start(self, text: str) -> Speculation:
+        # Long chapters only get indexed: N chunked rewrites per turn would
+        # cost far more than the wait they save.
+        candidates = self.candidates if len(text) <= config.CHUNKING_THRESHOLD_CHARS else 0
+        self.started += 1
+        return Speculation(self, text, candidates)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
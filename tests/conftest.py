@@ -0,0 +1,48 @@
+import hashlib
+
+import pytest
+from chromadb.utils import embedding_functions
+
+import config
+
+
+class CountingEmbedder:
+    # Deterministic bag-of-hashed-words embedder that records every text it
+    # is asked to embed.
+
+    calls = []
+
+    def __call__(self, input):
+        CountingEmbedder.calls.extend(input)
+        vectors = []
+        for text in input:
+            vector = [0.0] * 32
+            for word in text.split():
+                vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % 32] += 1.0
+            norm = sum(x * x for x in vector) ** 0.5 or 1.0
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+
+@pytest.fixture
+def temp_paths(tmp_path, monkeypatch):
+    # Everything the workflow writes goes under tmp_path.
+    monkeypatch.setattr(config, "CHROMA_DB_PATH", str(tmp_path / "db"))
+    monkeypatch.setattr(config, "VERSION_CATALOG_PATH", str(tmp_path / "db" / "catalog.sqlite3"))
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(config, "JOB_QUEUE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(config, "EXPORT_DIR", str(tmp_path / "export"))
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(embedding_functions, "DefaultEmbeddingFunction", CountingEmbedder)
+    CountingEmbedder.calls = []
+    return tmp_path
+
+
+@pytest.fixture
+def make_db(temp_paths):
+    def make():
+        from ChromaDB import ChromaDBManager
+
+        return ChromaDBManager()
+
+    return make
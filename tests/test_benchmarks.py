@@ -0,0 +1,54 @@
+import argparse
+
+import pytest
+
+import config
+import main_workflow
+from benchmarks import e2e_bench
+from benchmarks.fake_model import FakeGenerativeModel, ServiceUnavailable
+from benchmarks.fixture_server import FixtureServer
+from fused_agent import parse_fused
+from reviewer_agent import REVISED_MARKER
+
+
+def test_fake_model_is_deterministic():
+    first, second = FakeGenerativeModel(latency=0.0), FakeGenerativeModel(latency=0.0)
+    assert first.generate_content("prompt").text == second.generate_content("prompt").text
+    assert first.generate_content("prompt").text != FakeGenerativeModel(latency=0.0, seed=1).generate_content("prompt").text
+
+
+def test_fake_model_streams_the_same_text():
+    model = FakeGenerativeModel(latency=0.0, chunk_chars=100)
+    chunks = [chunk.text for chunk in model.generate_content("prompt", stream=True)]
+    assert len(chunks) > 1
+    assert "".join(chunks) == model.generate_content("prompt").text
+
+
+def test_fake_model_answers_in_the_agents_formats():
+    model = FakeGenerativeModel(latency=0.0)
+    assert REVISED_MARKER in model.generate_content(f"Review this. {REVISED_MARKER}").text
+    draft, feedback, revised = parse_fused(model.generate_content("**Draft Chapter:** and the rest").text)
+    assert draft and feedback and revised
+
+
+def test_fake_model_injects_faults():
+    model = FakeGenerativeModel(latency=0.0, failure_rate=1.0)
+    with pytest.raises(ServiceUnavailable):
+        model.generate_content("prompt")
+
+
+def test_end_to_end_run_is_offline(temp_paths, monkeypatch):
+    # run_scale points config at its own temporary directory.
+    for name in ("CHROMA_DB_PATH", "VERSION_CATALOG_PATH", "EMBEDDING_CACHE_PATH", "HTTP_CACHE_DIR",
+                 "SCREENSHOT_DIR", "RESPONSE_CACHE_ENABLED"):
+        monkeypatch.setattr(config, name, getattr(config, name))
+    monkeypatch.setattr(config, "STREAM_RESPONSES", True)
+    monkeypatch.setattr(main_workflow, "console", main_workflow.Console(quiet=True))
+
+    args = argparse.Namespace(latency=0.0, jitter=0.0, output_chars=1000)
+    with FixtureServer(paragraphs=40) as server:
+        result = e2e_bench.run_scale(args, server, 2)
+
+    assert result["chapters"] == 2 and result["failed"] == 0
+    assert result["spans"]["pipeline.chapter"]["count"] == 2
+    assert result["spans"]["scraper.http_fetch"]["count"] == 2
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from book_export import BookExporter, chapter_filename
+
+
+@pytest.fixture
+def db(make_db):
+    db = make_db()
+    for chapter, text in (("ch 1", "First chapter text."), ("ch_1", "Second chapter text.")):
+        db.store_version(text, {"version": 1, "status": "reviewed", "book": "b", "chapter": chapter})
+        db.approve_version("b", chapter, 1)
+    return db
+
+
+def test_chapter_ids_that_sanitize_alike_get_distinct_files():
+    assert chapter_filename("ch 1", "md") != chapter_filename("ch_1", "md")
+    assert chapter_filename("ch 1", "md") == chapter_filename("ch 1", "md")
+
+
+def test_export_keeps_both_chapters(db, temp_paths):
+    exporter = BookExporter(db)
+    result = exporter.export("b", "md")
+    assert result["chapters"] == 2
+    with open(result["path"], encoding="utf-8") as f:
+        output = f.read()
+    assert "First chapter text." in output and "Second chapter text." in output
+
+    assert exporter.export("b", "md")["rendered"] == 0
+
+
+def test_dropping_a_chapter_leaves_the_live_files(db, temp_paths):
+    exporter = BookExporter(db)
+    exporter.export("b", "md")
+    db.catalog._conn.execute("DELETE FROM approved WHERE book = 'b' AND chapter = 'ch 1'")
+
+    result = exporter.export("b", "md")
+    chapter_dir = os.path.join(str(temp_paths / "export"), "b", "md")
+    assert os.path.exists(os.path.join(chapter_dir, chapter_filename("ch_1", "md")))
+    assert not os.path.exists(os.path.join(chapter_dir, chapter_filename("ch 1", "md")))
+    with open(result["path"], encoding="utf-8") as f:
+        output = f.read()
+    assert "Second chapter text." in output and "First chapter text." not in output
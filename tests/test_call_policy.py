@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+import call_policy
+import config
+from call_policy import AttemptTimeout, CircuitOpenError, LimiterTimeout
+from model_client import ModelClient
+from rate_limiter import RateLimiter
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class ServiceUnavailable(Exception):
+    code = 503
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class ScriptedModel:
+    # Raises or answers according to `script`, one entry per call; "hang"
+    # blocks until the test releases it.
+
+    model_name = "scripted"
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.released = threading.Event()
+
+    def generate_content(self, prompt, stream=False):
+        step = self.script.pop(0)
+        if step == "hang":
+            self.released.wait(10)
+            return Response("late")
+        if isinstance(step, Exception):
+            raise step
+        return Response(step)
+
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    monkeypatch.setattr(config, "MODEL_CALL_DEADLINE", 5.0)
+    monkeypatch.setattr(config, "MODEL_ATTEMPT_TIMEOUT", 0.2)
+    monkeypatch.setattr(config, "MODEL_MAX_RETRIES", 0)
+    monkeypatch.setattr(config, "MODEL_HEDGING_ENABLED", False)
+    monkeypatch.setattr(config, "MODEL_BREAKER_FAILURES", 1)
+    monkeypatch.setattr(config, "MODEL_BREAKER_RESET", 0.05)
+    call_policy.reset()
+    yield
+    call_policy.reset()
+
+
+def open_circuit(client):
+    with pytest.raises(ServiceUnavailable):
+        client.generate("trip")
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.generate("rejected")
+    time.sleep(config.MODEL_BREAKER_RESET)
+
+
+@pytest.mark.parametrize("error", [ValueError("blocked by safety filters"), ResourceExhausted("quota")])
+def test_probe_without_verdict_is_released(error):
+    client = ModelClient(ScriptedModel([ServiceUnavailable("down"), error, "ok"]))
+    open_circuit(client)
+
+    with pytest.raises(type(error)):
+        client.generate("probe")
+    assert not client.breaker.probing
+
+    # The next call probes again, and its success closes the circuit.
+    assert client.generate("second probe") == "ok"
+    assert client.breaker.state == "closed"
+
+
+def test_failed_probe_reopens_circuit():
+    client = ModelClient(ScriptedModel([ServiceUnavailable("down"), ServiceUnavailable("still down")]))
+    open_circuit(client)
+
+    with pytest.raises(ServiceUnavailable):
+        client.generate("probe")
+    assert client.breaker.state == "open"
+    assert not client.breaker.probing
+
+
+def test_abandoned_attempt_releases_limiter_slot(monkeypatch):
+    monkeypatch.setattr(config, "MODEL_BREAKER_FAILURES", 0)
+    model = ScriptedModel(["hang", "ok"])
+    client = ModelClient(model, limiter=RateLimiter(max_in_flight=1))
+    try:
+        with pytest.raises(AttemptTimeout):
+            client.generate("hangs")
+        # The hung request is still running, but no longer holds the only slot.
+        assert client.generate("next") == "ok"
+    finally:
+        model.released.set()
+
+
+def test_limiter_timeout_leaves_breaker_closed():
+    limiter = RateLimiter(max_in_flight=1)
+    client = ModelClient(ScriptedModel(["ok"]), limiter=limiter)
+    assert limiter.acquire("busy elsewhere in the process")
+    try:
+        for _ in range(3):
+            with pytest.raises(LimiterTimeout):
+                client.generate("waits for a slot")
+        assert client.breaker.state == "closed"
+        assert client.breaker.failures == 0
+    finally:
+        limiter.release()
+    assert client.generate("slot free") == "ok"
+
+
+def test_limiter_timeout_on_probe_releases_it():
+    limiter = RateLimiter(max_in_flight=1)
+    client = ModelClient(ScriptedModel([ServiceUnavailable("down"), "ok"]), limiter=limiter)
+    open_circuit(client)
+
+    assert limiter.acquire("busy elsewhere in the process")
+    try:
+        with pytest.raises(LimiterTimeout):
+            client.generate("probe without a slot")
+        assert not client.breaker.probing
+    finally:
+        limiter.release()
+    assert client.generate("second probe") == "ok"
+    assert client.breaker.state == "closed"
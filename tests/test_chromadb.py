@@ -0,0 +1,66 @@
+import pytest
+
+import config
+from conftest import CountingEmbedder
+
+TEXT = "\n\n".join(f"Paragraph {i}: " + " ".join(f"word{i}x{j}" for j in range(60)) for i in range(8))
+
+
+@pytest.fixture
+def db(make_db, monkeypatch):
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", True)
+    monkeypatch.setattr(config, "PASSAGE_MAX_CHARS", 600)
+    return make_db()
+
+
+def store(db, version, text):
+    metadata = {"version": version, "status": "original", "book": "b", "chapter": "c"}
+    if version > 1:
+        metadata["source_version"] = version - 1
+    return db.store_version(text, metadata)
+
+
+def test_unchanged_version_is_not_embedded_again(db):
+    store(db, 1, TEXT)
+    assert CountingEmbedder.calls
+
+    CountingEmbedder.calls = []
+    store(db, 2, TEXT)
+    assert CountingEmbedder.calls == []
+    assert db.collection.count() == 2
+
+
+def test_edited_version_embeds_only_changed_passages(db):
+    store(db, 1, TEXT)
+    CountingEmbedder.calls = []
+
+    store(db, 2, TEXT.replace("Paragraph 7:", "Paragraph seven:"))
+    assert len(CountingEmbedder.calls) == 1
+    assert "Paragraph seven:" in CountingEmbedder.calls[0]
+
+
+def test_losing_a_version_race_leaves_no_orphans(db, monkeypatch):
+    store(db, 1, TEXT)
+    winner = db.collection.get(ids=["b/c-v1"], include=["documents"])["documents"][0]
+    passages = db.passages.collection.count()
+
+    # A second writer that checked before the first one committed.
+    monkeypatch.setattr(db.catalog, "get", lambda *args: None)
+    longer = TEXT + "\n\n" + "\n\n".join(f"Extra paragraph {i}: " + "filler " * 100 for i in range(4))
+    with pytest.raises(ValueError, match="already stored"):
+        store(db, 1, longer)
+
+    assert db.collection.get(ids=["b/c-v1"], include=["documents"])["documents"] == [winner]
+    assert db.passages.collection.count() == passages
+
+
+def test_write_token_stays_private(db, capsys):
+    metadata = {"version": 1, "status": "original", "book": "b", "chapter": "c"}
+    db.store_version(TEXT, metadata)
+    assert metadata == {"version": 1, "status": "original", "book": "b", "chapter": "c"}
+    assert "write_id" not in capsys.readouterr().out
+
+    latest_metadata, _, _ = db.get_latest_version("b", "c")
+    assert not any("write_id" in key for key in latest_metadata)
+    for hit in db.semantic_search("word3x7", num_results=1) + db.passages.query("word3x7", num_results=1):
+        assert not any("write_id" in key for key in hit["metadata"])
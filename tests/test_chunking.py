@@ -0,0 +1,44 @@
+from chunking import Window, contextual_prompt, split_into_windows, stitch
+
+SENTENCE = "The lighthouse keeper counted the ships that passed in the night. "
+
+
+def test_windows_keep_whole_paragraphs():
+    paragraphs = [f"Paragraph {i}. " + "word " * 40 for i in range(10)]
+    windows = split_into_windows("\n\n".join(paragraphs), max_chars=700, overlap=1)
+    assert all(len(window.body) <= 700 for window in windows)
+    assert "\n\n".join(window.body for window in windows) == "\n\n".join(p.strip() for p in paragraphs)
+    assert windows[1].context_before == windows[0].body.split("\n\n")[-1]
+
+
+def test_scene_break_closes_a_half_full_window():
+    text = "\n\n".join(["a " * 200, "* * *", "b " * 50, "c " * 50])
+    windows = split_into_windows(text, max_chars=800, overlap=0)
+    assert windows[0].body.endswith("* * *")
+
+
+def test_oversize_paragraph_is_split_at_sentences():
+    paragraph = SENTENCE * 40
+    windows = split_into_windows(paragraph, max_chars=500, overlap=0)
+    assert len(windows) > 1
+    assert all(len(window.body) <= 500 for window in windows)
+    assert all(window.body.endswith("night.") for window in windows)
+    assert " ".join(window.body for window in windows) == paragraph.strip()
+
+
+def test_unbroken_text_is_cut_at_the_limit():
+    windows = split_into_windows("word" * 300 + " " + "x" * 50, max_chars=500, overlap=0)
+    assert all(len(window.body) <= 500 for window in windows)
+    assert len(windows[0].body) == 500
+    assert "".join(window.body for window in windows).replace(" ", "") == "word" * 300 + "x" * 50
+
+
+def test_stitch_drops_echoed_context():
+    windows = [Window(0, "One.", context_after="Two."), Window(1, "Two.", context_before="One.")]
+    assert stitch(["One.\n\nTwo.", "One.\n\nTwo, rewritten."], windows) == "One.\n\nTwo, rewritten."
+
+
+def test_single_window_prompt_is_unchanged():
+    assert contextual_prompt("Rewrite this.", Window(0, "body"), 1) == "Rewrite this."
+    prompt = contextual_prompt("Rewrite this.", Window(1, "body", context_before="Before."), 3)
+    assert prompt.startswith("The text below is part 2 of 3") and "Before." in prompt
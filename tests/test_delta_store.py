@@ -0,0 +1,78 @@
+import pytest
+
+import config
+from conftest import CountingEmbedder
+from delta_store import DELTA, SNAPSHOT, apply_delta, make_delta
+
+BASE = "".join(f"Line {i} of the chapter, unchanged across versions.\n" for i in range(40))
+
+
+def edit(text: str, line: int, replacement: str) -> str:
+    lines = text.splitlines(keepends=True)
+    lines[line] = replacement + "\n"
+    return "".join(lines)
+
+
+def test_delta_round_trip():
+    target = edit(BASE, 7, "A rewritten seventh line.") + "A closing line.\n"
+    ops = make_delta(BASE, target)
+    assert apply_delta(BASE, ops) == target
+    assert [op for op in ops if op[0] == "+"] == [["+", "A rewritten seventh line.\n"], ["+", "A closing line.\n"]]
+
+
+@pytest.fixture(params=[False, True], ids=["documents", "passages"])
+def db(request, make_db, monkeypatch):
+    monkeypatch.setattr(config, "DELTA_STORAGE_ENABLED", True)
+    monkeypatch.setattr(config, "DELTA_SNAPSHOT_INTERVAL", 3)
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", request.param)
+    return make_db()
+
+
+def store_chain(db, texts: list):
+    for version, text in enumerate(texts, start=1):
+        metadata = {"version": version, "status": "reviewed", "book": "b", "chapter": "c"}
+        if version > 1:
+            metadata["source_version"] = version - 1
+        db.store_version(text, metadata)
+
+
+def test_versions_are_rebuilt_from_deltas(db):
+    texts = [BASE, edit(BASE, 3, "Third line, edited."), edit(BASE, 3, "Third line, edited."),
+             edit(BASE, 30, "Thirtieth line, edited."), BASE]
+    store_chain(db, texts)
+
+    kinds = [db.catalog.get_body("b", "c", version)["kind"] for version in range(1, 6)]
+    assert kinds == [SNAPSHOT, DELTA, DELTA, SNAPSHOT, DELTA]
+    # Unchanged text is stored as a short placeholder, not a second copy.
+    stored = db.collection.get(ids=["b/c-v3"], include=["documents"])["documents"][0]
+    assert stored == "No textual changes from version 2."
+
+    db.deltas._cache.clear()
+    for version, text in enumerate(texts, start=1):
+        assert db.get_version_text(version, "b", "c") == text
+    meta, latest, _ = db.get_latest_version("b", "c")
+    assert meta["version"] == 5 and latest == BASE
+    page = db.get_texts(db.catalog.history("b", "c"))
+    assert list(page.values()) == texts
+
+
+def test_search_returns_and_ranks_full_text(db):
+    store_chain(db, [BASE, edit(BASE, 0, "Line 0 now mentions a lighthouse keeper.")])
+    db.deltas._cache.clear()
+
+    hits = db.semantic_search("Line of the chapter unchanged across versions", num_results=1,
+                              latest_only=True, per_chapter=True)
+    assert hits[0]["id"] == "b/c-v2"
+    assert hits[0]["content"].startswith("Line 0 now mentions a lighthouse keeper.\nLine 1 of the chapter")
+
+
+def test_delta_versions_embed_the_full_text(make_db, monkeypatch):
+    monkeypatch.setattr(config, "DELTA_STORAGE_ENABLED", True)
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", False)
+    db = make_db()
+    edited = edit(BASE, 0, "Line 0 now mentions a lighthouse keeper.")
+    store_chain(db, [BASE, edited])
+
+    stored = db.collection.get(ids=["b/c-v2"], include=["documents", "embeddings"])
+    assert stored["documents"][0] == "Line 0 now mentions a lighthouse keeper.\n"
+    assert list(stored["embeddings"][0]) == pytest.approx(CountingEmbedder()([edited])[0])
@@ -0,0 +1,66 @@
+import pytest
+
+import config
+import fingerprint
+
+CHAPTER = "\n".join(f"Line {i}: the reef broke the long swell into white foam near the lagoon." for i in range(60))
+OTHER = "\n".join(f"Line {i}: snow lay deep across the mountain pass before the caravan." for i in range(60))
+
+
+def test_signature_round_trips_and_is_stable():
+    sig = fingerprint.signature(CHAPTER)
+    assert len(sig) == config.FINGERPRINT_PERMUTATIONS
+    assert fingerprint.similarity(fingerprint.from_bytes(fingerprint.to_bytes(sig)), sig) == 1.0
+    assert fingerprint.similarity(fingerprint.signature(CHAPTER), sig) == 1.0
+
+
+def test_noise_lines_do_not_change_the_signature(monkeypatch):
+    monkeypatch.setattr(config, "FINGERPRINT_NOISE_PATTERNS", [r"^\s*Retrieved from"])
+    noisy = CHAPTER + "\nRetrieved from https://example.org/chapter-1?oldid=12345"
+    assert fingerprint.similarity(fingerprint.signature(noisy), fingerprint.signature(CHAPTER)) == 1.0
+
+
+def test_similarity_tracks_the_size_of_the_edit():
+    edited = CHAPTER.replace("Line 30:", "Line thirty:")
+    assert fingerprint.similarity(fingerprint.signature(edited), fingerprint.signature(CHAPTER)) >= 0.9
+    assert fingerprint.similarity(fingerprint.signature(OTHER), fingerprint.signature(CHAPTER)) < 0.5
+
+
+@pytest.fixture
+def db(make_db, monkeypatch):
+    monkeypatch.setattr(config, "FINGERPRINT_ENABLED", True)
+    return make_db()
+
+
+def store(db, version, text, status="original", source_version=None):
+    metadata = {"version": version, "status": status, "book": "b", "chapter": "c"}
+    if source_version is not None:
+        metadata["source_version"] = source_version
+    db.store_version(text, metadata)
+
+
+def test_find_duplicate(db):
+    store(db, 1, OTHER)
+    store(db, 2, CHAPTER)
+    duplicate = db.find_duplicate(CHAPTER.replace("Line 30:", "Line thirty:"), "b", "c")
+    assert duplicate["version"] == 2 and duplicate["similarity"] >= config.FINGERPRINT_THRESHOLD
+    assert db.find_duplicate(CHAPTER, "b", "c", statuses="spun") is None
+    assert db.find_duplicate(CHAPTER, "b", "other-chapter") is None
+
+
+def test_versions_stored_before_fingerprinting_are_signed_on_first_use(db, monkeypatch):
+    monkeypatch.setattr(config, "FINGERPRINT_ENABLED", False)
+    store(db, 1, CHAPTER)
+    assert db.find_duplicate(CHAPTER, "b", "c") is None
+    assert db.catalog.fingerprints("b", "c")[0]["signature"] is None
+
+    monkeypatch.setattr(config, "FINGERPRINT_ENABLED", True)
+    assert db.find_duplicate(CHAPTER, "b", "c")["version"] == 1
+    assert db.catalog.fingerprints("b", "c")[0]["signature"] is not None
+
+
+def test_find_output_returns_the_rewrite_of_a_matching_source(db):
+    store(db, 1, CHAPTER)
+    store(db, 2, OTHER, status="spun", source_version=1)
+    assert db.find_output(CHAPTER, "b", "c", "spun")["version"] == 2
+    assert db.find_output(OTHER, "b", "c", "spun") is None
@@ -0,0 +1,128 @@
+import pytest
+
+import config
+import main_workflow
+from batch_runner import BatchRunner
+from fused_agent import DRAFT_MARKER, REVIEW_MARKER, parse_fused
+from job_queue import JobQueue
+from reviewer_agent import REVISED_MARKER
+from workflow_context import WorkflowContext
+
+DRAFT = f"{DRAFT_MARKER}\nThe draft."
+REVIEW = f"{REVIEW_MARKER}\n- Tighten the opening."
+REVISED = f"{REVISED_MARKER}\nThe revision."
+
+
+def test_well_formed_response():
+    draft, feedback, revised = parse_fused("\n\n".join([DRAFT, REVIEW, REVISED]))
+    assert (draft, feedback, revised) == ("The draft.", REVIEW, "The revision.")
+
+
+def test_missing_review_marker_keeps_the_revision():
+    assert parse_fused("\n\n".join([DRAFT, REVISED])) == (
+        "The draft.", "No review notes were returned.", "The revision."
+    )
+
+
+def test_missing_revised_marker_leaves_the_review_to_a_separate_call():
+    assert parse_fused("\n\n".join([DRAFT, REVIEW])) == ("The draft.", None, None)
+
+
+def test_missing_draft_marker_uses_the_revision_as_draft():
+    assert parse_fused("\n\n".join([REVIEW, REVISED])) == ("The revision.", REVIEW, "The revision.")
+
+
+def test_unstructured_response_is_only_a_draft():
+    assert parse_fused("Just a rewritten chapter.") == ("Just a rewritten chapter.", None, None)
+
+
+@pytest.mark.parametrize("response", ["", "   ", DRAFT_MARKER, f"{DRAFT_MARKER}\n\n{REVISED_MARKER}\n"])
+def test_empty_response(response):
+    assert parse_fused(response) == (None, None, None)
+
+
+@pytest.mark.parametrize("order", [
+    (DRAFT, REVISED, REVIEW),
+    (REVIEW, DRAFT, REVISED),
+    (REVISED, DRAFT, REVIEW),
+])
+def test_out_of_order_sections(order):
+    draft, feedback, revised = parse_fused("\n\n".join(order))
+    assert draft == "The draft."
+    assert revised == "The revision."
+    assert feedback == REVIEW
+
+
+class FusedStub:
+
+    def __init__(self, result):
+        self.result = result
+
+    def run(self, text, human_feedback=None):
+        return self.result
+
+
+class WriterStub:
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, text, human_feedback=None):
+        self.calls += 1
+        return "Written separately."
+
+
+class ReviewerStub:
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, text):
+        self.calls += 1
+        return "- Reviewed separately.", f"Reviewed: {text}"
+
+
+@pytest.fixture
+def ctx(make_db, monkeypatch):
+    monkeypatch.setattr(config, "FUSED_SPIN_REVIEW", True)
+    monkeypatch.setattr(config, "STREAM_RESPONSES", False)
+    db = make_db()
+    db.store_version("The original.", {"version": 1, "status": "original", "book": "b", "chapter": "c"})
+
+    def make(result):
+        return WorkflowContext(db_manager=db, fused=FusedStub(result), writer=WriterStub(),
+                               reviewer=ReviewerStub(), book="b", chapter="c")
+    return make
+
+
+def statuses(ctx):
+    return [(row["version"], row["status"]) for row in ctx.db_manager.list_versions("b", "c")]
+
+
+@pytest.mark.parametrize("result, writer_calls, reviewer_calls", [
+    (("The draft.", "- Notes.", "The revision."), 0, 0),
+    (("The draft.", None, None), 0, 1),
+    ((None, None, None), 1, 1),
+])
+def test_interactive_rewrite_falls_back_to_two_calls(ctx, result, writer_calls, reviewer_calls):
+    ctx = ctx(result)
+    main_workflow.run_rewrite(ctx)
+    assert statuses(ctx) == [(1, "original"), (2, "spun"), (3, "reviewed")]
+    assert (ctx.writer.calls, ctx.reviewer.calls) == (writer_calls, reviewer_calls)
+
+
+@pytest.mark.parametrize("result, writer_calls, reviewer_calls", [
+    (("The draft.", "- Notes.", "The revision."), 0, 0),
+    (("The draft.", None, None), 0, 1),
+    ((None, None, None), 1, 1),
+])
+def test_batch_spin_falls_back_to_two_calls(ctx, temp_paths, result, writer_calls, reviewer_calls):
+    ctx = ctx(result)
+    runner = BatchRunner(ctx, JobQueue(), max_workers=1)
+    job = {"id": 1, "book": "b", "chapter": "c"}
+    spun = runner._spin(job, 1)
+    # The review stage reuses a stored review, as _run_job would.
+    if runner._existing_output(job, "review", spun) is None:
+        runner._review(job, spun)
+    assert statuses(ctx) == [(1, "original"), (2, "spun"), (3, "reviewed")]
+    assert (ctx.writer.calls, ctx.reviewer.calls) == (writer_calls, reviewer_calls)
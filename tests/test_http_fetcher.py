@@ -0,0 +1,68 @@
+import pytest
+
+from benchmarks.fixture_server import FixtureServer
+from http_fetcher import ConditionalCache, HttpFetcher, extract_content
+
+SELECTOR = "div.mw-parser-output"
+
+# Wikisource-style markup with paragraphs and list items left unclosed.
+UNCLOSED = """
+<html><body>
+<div id="content">
+  <div class="mw-parser-output">
+    <div class="heading">Chapter One</div>
+    <p>First paragraph.
+    <p>Second paragraph<br>with a break.
+    <ul><li>One<li>Two</ul>
+    <script>var hidden = "<p>not text</p>";</script>
+  </div>
+  <p>Retrieved from the archive.
+  <div class="footer">Navigation menu</div>
+</div>
+</body></html>
+"""
+
+
+def test_unclosed_paragraphs_stay_inside_the_container():
+    assert extract_content(UNCLOSED, SELECTOR) == (
+        "Chapter One\n\nFirst paragraph.\n\nSecond paragraph\n\nwith a break.\n\nOne\n\nTwo"
+    )
+
+
+def test_nested_containers_of_the_same_tag():
+    html = '<div class="mw-parser-output"><div><p>Inner</p></div><p>After</p></div><p>Outside</p>'
+    assert extract_content(html, SELECTOR) == "Inner\n\nAfter"
+
+
+def test_missing_container():
+    assert extract_content("<p>No container here.", SELECTOR) is None
+
+
+@pytest.fixture
+def server():
+    with FixtureServer(paragraphs=3) as server:
+        yield server
+
+
+def test_unchanged_page_is_revalidated_from_the_cache(server, tmp_path):
+    fetcher = HttpFetcher(ConditionalCache(str(tmp_path / "http")))
+    url = server.chapter_urls(1)[0]
+    text, status = fetcher.fetch(url)
+    assert status == "fresh"
+    assert text.startswith("Book 1, Chapter 1")
+
+    # A new fetcher on the same cache directory, as after a restart.
+    fetcher.close()
+    fetcher = HttpFetcher(ConditionalCache(str(tmp_path / "http")))
+    assert fetcher.fetch(url) == (text, "revalidated")
+    assert server.httpd.not_modified == 1
+    fetcher.close()
+
+
+def test_error_status_is_not_cached(server, tmp_path):
+    cache = ConditionalCache(str(tmp_path / "http"))
+    fetcher = HttpFetcher(cache)
+    url = f"{server.base_url}/missing"
+    assert fetcher.fetch(url) == (None, "error")
+    assert cache.get(url) is None
+    fetcher.close()
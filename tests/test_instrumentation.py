@@ -0,0 +1,25 @@
+from instrumentation import Tracer
+
+
+def test_only_counters_are_summed():
+    tracer = Tracer()
+    for score in (40.0, 60.0, 80.0):
+        with tracer.span("scraper.run", url="https://example.org") as attributes:
+            attributes.update(text_chars=1000, reward_score=score, speculative=True)
+
+    assert tracer.totals["scraper.run"] == {"text_chars": 3000}
+    scores = tracer.observations[("scraper.run", "reward_score")]
+    assert scores.count == 3 and scores.total == 180.0 and scores.max == 80.0
+    assert 40.0 <= scores.percentile(0.5) <= 80.0
+
+
+def test_prometheus_exports_scores_as_summaries():
+    tracer = Tracer()
+    with tracer.span("scraper.run") as attributes:
+        attributes.update(text_chars=10, reward_score=55.0)
+
+    text = tracer.prometheus_text()
+    assert 'book_workflow_span_text_chars_total{span="scraper.run"} 10' in text
+    assert "reward_score_total" not in text
+    assert "# TYPE book_workflow_span_reward_score summary" in text
+    assert 'book_workflow_span_reward_score_count{span="scraper.run"} 1' in text
@@ -0,0 +1,77 @@
+import subprocess
+import sys
+
+import pytest
+
+import config
+from job_queue import JobQueue
+
+ENTRIES = [{"url": f"https://example.org/{i}", "book": "b", "chapter": f"ch{i}"} for i in range(2)]
+
+
+@pytest.fixture
+def queue(temp_paths):
+    queue = JobQueue()
+    queue.enqueue(ENTRIES)
+    yield queue
+    queue.close()
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_claim_takes_each_ready_job_once(queue):
+    first, second = queue.claim("a"), queue.claim("b")
+    assert (first["chapter"], second["chapter"]) == ("ch0", "ch1")
+    assert queue.claim("c") is None
+    assert queue.has_work()
+
+
+def test_expired_lease_is_claimable_again(queue, monkeypatch):
+    monkeypatch.setattr(config, "JOB_LEASE_SECONDS", -1)
+    job = queue.claim("a")
+    queue.claim("a")
+    assert queue.claim("b")["id"] == job["id"]
+
+
+def test_resume_recovers_a_dead_run_without_waiting_for_its_lease(queue):
+    crashed = queue.start_run()
+    job = queue.claim(crashed)
+    queue.claim(crashed)
+    queue._conn.execute("UPDATE runs SET pid = ? WHERE id = ?", (dead_pid(), crashed))
+
+    resumed = queue.start_run()
+    assert queue.claim(resumed)["id"] == job["id"]
+    report = queue.report()
+    assert report["runs"] == 2
+
+
+def test_live_run_keeps_its_jobs(queue):
+    running = queue.start_run()
+    queue.claim(running)
+    queue.claim(running)
+
+    other = queue.start_run()
+    assert queue.claim(other) is None
+
+
+def test_failed_jobs_back_off_then_give_up_and_can_be_retried(queue, monkeypatch):
+    monkeypatch.setattr(config, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(config, "JOB_RETRY_BACKOFF", 60.0)
+    job = queue.claim("a")
+    assert queue.fail(job["id"], "spin: boom")
+    # Still backing off, so only the other chapter is ready.
+    assert queue.claim("a")["id"] != job["id"]
+    assert queue.claim("a") is None
+
+    queue._conn.execute("UPDATE jobs SET not_before = 0 WHERE id = ?", (job["id"],))
+    assert queue.claim("a")["id"] == job["id"]
+    assert not queue.fail(job["id"], "spin: boom again")
+    assert queue.report()["failed"] == 1
+
+    assert queue.retry_failed() == 1
+    retried = queue.claim("b")
+    assert retried["id"] == job["id"] and retried["attempts"] == 0
@@ -0,0 +1,63 @@
+import pytest
+
+import config
+import main_workflow
+from workflow_context import WorkflowContext
+
+CHAPTER_A = " ".join(f"alpha{i} walked past the river bank" for i in range(80))
+CHAPTER_B = " ".join(f"beta{i} climbed over the stone wall" for i in range(80))
+
+
+class TextScraper:
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def run(self, url: str) -> tuple:
+        return self.text, None, 90.0
+
+
+@pytest.fixture
+def db(make_db, monkeypatch):
+    monkeypatch.setattr(config, "FINGERPRINT_ENABLED", True)
+    return make_db()
+
+
+def store(db, version, text, status="original", source_version=None):
+    metadata = {"version": version, "status": status, "book": "b", "chapter": "c"}
+    if source_version is not None:
+        metadata["source_version"] = source_version
+    db.store_version(text, metadata)
+
+
+def scrape(db, text):
+    ctx = WorkflowContext(db_manager=db, scraper=TextScraper(text), book="b", chapter="c")
+    return main_workflow.run_scraper_stage(ctx)
+
+
+def test_duplicate_scrape_continues_from_its_rewrite(db):
+    store(db, 1, CHAPTER_A)
+    store(db, 2, CHAPTER_A.upper(), status="spun", source_version=1)
+
+    duplicate = scrape(db, CHAPTER_A)
+    assert duplicate["version"] == 1
+    assert db.catalog.latest("b", "c")["version"] == 2
+
+
+def test_duplicate_is_stored_when_the_tip_does_not_descend_from_it(db):
+    store(db, 1, CHAPTER_A)
+    store(db, 2, CHAPTER_B)
+    # A rewrite of the older original lands after the newer one was scraped.
+    store(db, 3, CHAPTER_A.upper(), status="spun", source_version=1)
+
+    assert scrape(db, CHAPTER_B) is None
+    latest = db.catalog.latest("b", "c")
+    assert (latest["version"], latest["status"]) == (4, "original")
+
+
+def test_scrapes_are_always_stored_with_fingerprinting_off(db, monkeypatch):
+    monkeypatch.setattr(config, "FINGERPRINT_ENABLED", False)
+    store(db, 1, CHAPTER_A)
+
+    assert scrape(db, CHAPTER_A) is None
+    assert db.catalog.latest("b", "c")["version"] == 2
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from rate_limiter import RateLimiter, TokenBucket, estimate_tokens
+from workflow_context import WorkflowContext
+
+
+def test_bucket_times_out_without_taking_tokens():
+    bucket = TokenBucket(rate_per_minute=60, capacity=1)
+    assert bucket.acquire(1, timeout=0)
+    assert not bucket.acquire(1, timeout=0.1)
+    time.sleep(1.0)
+    assert bucket.acquire(1, timeout=0)
+
+
+def test_in_flight_cap_is_shared():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=10 ** 7, max_in_flight=2)
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def call():
+        nonlocal running, peak
+        with limiter.slot("prompt"):
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+
+
+def test_failed_acquire_holds_no_slot():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=100, max_in_flight=1)
+    assert limiter.acquire("x" * 400)
+    limiter.release()
+    # The token budget is spent, so this waits out its timeout and gives the slot back.
+    assert not limiter.acquire("x" * 400, timeout=0.05)
+    assert limiter.in_flight.acquire(blocking=False)
+
+
+def test_context_agents_share_a_default_limiter():
+    ctx = WorkflowContext()
+    assert isinstance(ctx.limiter, RateLimiter)
+    limiter = RateLimiter()
+    assert WorkflowContext(limiter=limiter).limiter is limiter
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 4000) == 1000
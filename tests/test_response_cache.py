@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+import config
+from benchmarks.fake_model import FakeGenerativeModel
+from model_client import ModelClient
+from response_cache import ResponseCache, make_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=10 ** 6, max_age=3600)
+
+
+def test_key_covers_prompt_model_and_config():
+    key = make_key("prompt", "model", {"temperature": 0.7})
+    assert key == make_key("prompt", "model", {"temperature": 0.7})
+    assert key != make_key("prompt!", "model", {"temperature": 0.7})
+    assert key != make_key("prompt", "other-model", {"temperature": 0.7})
+    assert key != make_key("prompt", "model", {"temperature": 0.2})
+
+
+def test_round_trip_and_stats(cache):
+    assert cache.get("k") is None
+    cache.put("k", "value")
+    assert cache.get("k") == "value"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 5)
+
+
+def test_expired_entries_are_dropped(cache, monkeypatch):
+    cache.put("k", "value")
+    now = time.time()
+    monkeypatch.setattr("response_cache.time.time", lambda: now + 7200)
+    assert cache.get("k") is None
+    assert cache.evictions == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=10, max_age=3600)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr("response_cache.time.time", lambda: next(clock))
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+
+
+def test_client_serves_repeated_prompts_from_the_cache(cache):
+    model = FakeGenerativeModel(latency=0.0, output_chars=200)
+    client = ModelClient(model, {"temperature": 0.7}, cache=cache)
+    first = client.generate("Rewrite this.", quiet=True)
+    assert client.generate("Rewrite this.", quiet=True) == first
+    assert model.calls == 1
+
+    client.generate("Rewrite this.", use_cache=False, quiet=True)
+    assert model.calls == 2
+
+
+def test_streamed_response_is_cached(cache):
+    model = FakeGenerativeModel(latency=0.0, output_chars=600, chunk_chars=50)
+    client = ModelClient(model, cache=cache)
+    chunks = []
+    text, timing = client.stream("Review this.", chunks.append)
+    assert not timing["cached"] and len(chunks) > 1
+
+    chunks = []
+    cached, timing = client.stream("Review this.", chunks.append)
+    assert timing["cached"] and chunks == [text] and cached == text
+    assert model.calls == 1
+
+
+def test_sampled_configs_can_bypass_the_cache(cache, monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_CACHE_BYPASS_SAMPLED", True)
+    assert ModelClient(FakeGenerativeModel(), {"temperature": 0.7}, cache=cache).cache is None
+    assert ModelClient(FakeGenerativeModel(), {"temperature": 0.0}, cache=cache).cache is cache
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+import config
+from conftest import CountingEmbedder
+from passage_index import PassagePrefetcher, split_passages
+from reviewer_agent import ReviewStreamParser
+
+RESPONSE = (
+    "**Review & Suggestions:**\n"
+    "- Tighten the opening paragraph.\n"
+    "* Vary sentence length in the dialogue.\n"
+    "- Clarify the time of day.\n\n"
+    "**Revised Chapter:**\n"
+    "The gates of morning opened.\n\nThe city woke slowly."
+)
+
+
+def parse(chunks):
+    suggestions, revised = [], []
+    parser = ReviewStreamParser(on_suggestion=suggestions.append, on_revised_chunk=revised.append)
+    for chunk in chunks:
+        parser.feed(chunk)
+    feedback, revised_text = parser.close()
+    return parser, feedback, revised_text, suggestions, revised
+
+
+def split_at(text, *cuts):
+    bounds = [0, *cuts, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def test_whole_response_in_one_chunk():
+    parser, feedback, revised_text, suggestions, revised = parse([RESPONSE])
+    assert parser.found_marker
+    assert feedback == RESPONSE.split("**Revised Chapter:**")[0].strip()
+    assert revised_text == "The gates of morning opened.\n\nThe city woke slowly."
+    assert suggestions == [
+        "- Tighten the opening paragraph.",
+        "* Vary sentence length in the dialogue.",
+        "- Clarify the time of day.",
+    ]
+    assert "".join(revised) == revised_text
+
+
+@pytest.mark.parametrize("offset", range(1, len("**Revised Chapter:**")))
+def test_revised_marker_split_across_chunks(offset):
+    cut = RESPONSE.index("**Revised Chapter:**") + offset
+    parser, feedback, revised_text, _, revised = parse(split_at(RESPONSE, cut))
+    assert parser.found_marker
+    assert "Revised" not in feedback
+    assert revised_text == "The gates of morning opened.\n\nThe city woke slowly."
+    assert "".join(revised) == revised_text
+
+
+@pytest.mark.parametrize("offset", range(1, len("**Review & Suggestions:**")))
+def test_feedback_heading_split_across_chunks(offset):
+    _, feedback, _, suggestions, _ = parse(split_at(RESPONSE, offset))
+    assert feedback.startswith("**Review & Suggestions:**")
+    assert len(suggestions) == 3
+
+
+def test_suggestion_reported_once_its_line_completes():
+    suggestions = []
+    parser = ReviewStreamParser(on_suggestion=suggestions.append)
+    parser.feed("**Review & Suggestions:**\n- Tighten the")
+    assert suggestions == []
+    parser.feed(" opening paragraph.\n- Clarify")
+    assert suggestions == ["- Tighten the opening paragraph."]
+
+
+def test_random_chunking_matches_single_chunk():
+    _, *expected, revised = parse([RESPONSE])
+    rng = random.Random(7)
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(RESPONSE)), 6))
+        _, *parsed, revised = parse(split_at(RESPONSE, *cuts))
+        assert parsed == expected
+        assert "".join(revised) == expected[1]
+
+
+def test_missing_marker_leaves_everything_as_feedback():
+    text = "**Review & Suggestions:**\n- Tighten the opening paragraph.\nNo revision today."
+    parser, feedback, revised_text, suggestions, revised = parse(split_at(text, 10, 40))
+    assert not parser.found_marker
+    assert feedback == text
+    assert revised_text == ""
+    assert revised == []
+    assert suggestions == ["- Tighten the opening paragraph."]
+
+
+CHAPTER = "\n\n".join(f"Paragraph {i}: " + " ".join(f"word{i}x{j}" for j in range(40)) for i in range(12))
+
+
+@pytest.fixture
+def db(make_db, monkeypatch):
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", True)
+    monkeypatch.setattr(config, "PASSAGE_MAX_CHARS", 600)
+    return make_db()
+
+
+def test_prefetched_passages_match_split_passages(db):
+    rng = random.Random(3)
+    for _ in range(20):
+        prefetch = PassagePrefetcher(db.passages)
+        cuts = sorted(rng.sample(range(1, len(CHAPTER)), 15))
+        for chunk in split_at(CHAPTER, *cuts):
+            prefetch.feed(chunk)
+        assert prefetch.close() == split_passages(CHAPTER)
+
+
+def test_storing_a_prefetched_text_embeds_nothing_new(db):
+    prefetch = PassagePrefetcher(db.passages)
+    parser = ReviewStreamParser(on_revised_chunk=prefetch.feed)
+    response = "**Review & Suggestions:**\n- Shorter.\n\n**Revised Chapter:**\n" + CHAPTER
+    for chunk in split_at(response, *range(97, len(response), 97)):
+        parser.feed(chunk)
+    _, revised_text = parser.close()
+    prefetch.close()
+    assert CountingEmbedder.calls
+
+    CountingEmbedder.calls = []
+    db.store_version(revised_text, {"version": 1, "status": "revised", "book": "b", "chapter": "c"})
+    assert CountingEmbedder.calls == []
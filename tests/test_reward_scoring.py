@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+import pytest
+
+import config
+from benchmarks.scoring_bench import make_pages
+from reward_scoring import RewardScorer, reference_score
+from scraper_agent import ScraperAgent
+
+PAGES = make_pages(60, 3000) + ["", "   ", "next previous edit", "Chapter " * 900]
+
+
+def test_batch_scores_match_the_reference_exactly():
+    reference = np.array([reference_score(page) for page in PAGES], dtype=np.float64)
+    assert np.array_equal(RewardScorer().score_many(PAGES), reference)
+
+
+def test_reweighting_matches_the_reference():
+    scorer = RewardScorer()
+    matrix = scorer.feature_matrix(PAGES)
+    rng = random.Random(1)
+    for _ in range(10):
+        weights = {"length": rng.random(), "keywords": rng.random(), "noise": -rng.random()}
+        reference = np.array([reference_score(page, weights) for page in PAGES], dtype=np.float64)
+        assert np.array_equal(RewardScorer.score_matrix(matrix, weights), reference)
+
+
+@pytest.mark.parametrize("sections", [1, 3, 17])
+def test_streaming_score_matches_scoring_the_whole_page(sections):
+    scorer = RewardScorer()
+    for page in PAGES[:10]:
+        stream = scorer.stream()
+        step = max(1, len(page) // sections)
+        for start in range(0, len(page), step):
+            stream.feed(page[start:start + step])
+        assert stream.score() == reference_score(page)
+
+
+def test_scraper_agent_scores_with_the_batch_scorer(monkeypatch):
+    agent = ScraperAgent()
+    assert isinstance(agent.scorer, RewardScorer)
+    for page in PAGES[:10]:
+        assert agent._calculate_reward_score(page) == reference_score(page)
+
+    monkeypatch.setitem(config.REWARD_WEIGHTS, "length", 0.0)
+    assert agent._calculate_reward_score(PAGES[0]) == reference_score(PAGES[0])
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+import config
+import scraper_agent
+from benchmarks.fixture_server import FixtureServer
+from scraper_agent import ScraperAgent
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "HTTP_CACHE_DIR", str(tmp_path / "http"))
+    monkeypatch.setattr(config, "SCREENSHOT_DIR", str(tmp_path / "screenshots"))
+    monkeypatch.setattr(config, "HTTP_FAST_PATH_ENABLED", True)
+
+    async def no_browser(self):
+        raise AssertionError("the browser was started")
+
+    monkeypatch.setattr(scraper_agent._PagePool, "get", no_browser)
+    return ScraperAgent()
+
+
+def test_batch_results_come_back_in_url_order(agent):
+    reported = []
+    with FixtureServer() as server:
+        urls = server.chapter_urls(6)
+        results = agent.run_many(urls, on_result=lambda index, url, result: reported.append((index, url)))
+
+    assert sorted(reported) == list(enumerate(urls))
+    for chapter, (text, screenshot, score) in enumerate(results, start=1):
+        assert f"Book 1, Chapter {chapter}" in text
+        assert screenshot is None
+        assert score >= config.REWARD_THRESHOLD
+
+
+def test_per_host_limit_caps_each_host(agent, monkeypatch):
+    monkeypatch.setattr(config, "SCRAPER_PER_HOST_LIMIT", 2)
+    running, peak, lock = {}, {}, threading.Lock()
+
+    def fetch(url):
+        host = url.split("/")[2]
+        with lock:
+            running[host] = running.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), running[host])
+        time.sleep(0.05)
+        with lock:
+            running[host] -= 1
+        return f"Text of {url}", None, 100.0
+
+    monkeypatch.setattr(agent, "_run_fast_path", fetch)
+    urls = [f"http://{host}/chapter/{i}" for i in range(6) for host in ("a.example", "b.example")]
+    results = agent.run_many(urls, max_concurrency=8)
+
+    assert [text for text, _, _ in results] == [f"Text of {url}" for url in urls]
+    assert peak == {"a.example": 2, "b.example": 2}
+
+
+def test_empty_batch(agent):
+    assert agent.run_many([]) == []
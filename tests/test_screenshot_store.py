@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from screenshot_store import ScreenshotStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScreenshotStore(str(tmp_path / "shots"))
+
+
+def test_settle_returns_the_path_once_written(store):
+    path = store.path_for("https://example.org/ch1", "text")
+    store.save(path, b"image")
+    assert store.settle(path) == path
+    with open(path, "rb") as f:
+        assert f.read() == b"image"
+    assert store.bytes_written == 5
+
+
+def test_failed_write_is_not_recorded(store, tmp_path):
+    blocker = tmp_path / "blocked"
+    blocker.write_text("not a directory")
+    path = os.path.join(str(blocker), "shot.jpg")
+    store.save(path, b"image")
+    assert store.settle(path) is None
+
+
+def test_settle_waits_for_a_capture_that_has_not_been_saved_yet(store):
+    path = store.path_for("https://example.org/ch1", "text")
+    future = store.begin(path)
+    future.cancel()
+    assert store.settle(path) is None
+
+    future = store.begin(path)
+    store.save(path, b"image", future)
+    assert store.settle(path) == path
+
+
+def test_settle_without_a_capture_checks_the_disk(store):
+    assert store.settle(None) is None
+    assert store.settle(store.path_for("https://example.org/ch1", "text")) is None
+
+
+def test_finished_writes_are_drained_on_submit(store):
+    for i in range(50):
+        path = store.path_for("https://example.org/ch1", f"text {i}")
+        store.save(path, b"image").result()
+    assert len(store._pending) <= 1
+    store.flush()
+    assert store._pending == {}
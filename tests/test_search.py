@@ -0,0 +1,73 @@
+import pytest
+
+import config
+from ChromaDB import search_filter, where_book
+from conftest import CountingEmbedder
+
+
+@pytest.fixture(params=[False, True], ids=["versions", "passages"])
+def db(request, make_db, monkeypatch):
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", request.param)
+    db = make_db()
+    for book in ("b1", "b2"):
+        for chapter in ("c1", "c2"):
+            for version, status in ((1, "original"), (2, "revised")):
+                db.store_version(f"The lagoon at dawn in {book} {chapter}, {status} text.",
+                                 {"version": version, "status": status, "book": book, "chapter": chapter})
+    return db
+
+
+def hits(results):
+    return sorted((hit["metadata"]["book"], hit["metadata"]["chapter"], hit["metadata"]["version"])
+                  for hit in results)
+
+
+def test_filters_are_pushed_down(db):
+    results = db.semantic_search("lagoon at dawn", num_results=10, status="revised", book="b1")
+    assert hits(results) == [("b1", "c1", 2), ("b1", "c2", 2)]
+
+    results = db.semantic_search("lagoon at dawn", num_results=10, max_version=1)
+    assert {hit["metadata"]["status"] for hit in results} == {"original"}
+    assert len(results) == 4
+
+
+def test_latest_only_and_per_chapter(db):
+    db.store_version("The lagoon at dawn in b1 c1, final text.",
+                     {"version": 3, "status": "final", "book": "b1", "chapter": "c1"})
+    results = db.semantic_search("lagoon at dawn", num_results=10, book="b1", latest_only=True)
+    assert hits(results) == [("b1", "c1", 3), ("b1", "c2", 2)]
+
+    results = db.semantic_search("lagoon at dawn", num_results=4, per_chapter=True)
+    assert len({(hit["metadata"]["book"], hit["metadata"]["chapter"]) for hit in results}) == 4
+
+
+def test_results_are_cached_until_the_next_store(db):
+    first = db.semantic_search("lagoon at dawn", num_results=2)
+    CountingEmbedder.calls = []
+    assert db.semantic_search("lagoon at dawn", num_results=2) == first
+    assert CountingEmbedder.calls == []
+
+    db.store_version("A storm over the reef.", {"version": 1, "status": "original", "book": "b3", "chapter": "c1"})
+    CountingEmbedder.calls = []
+    results = db.semantic_search("A storm over the reef.", num_results=1)
+    assert results[0]["metadata"]["book"] == "b3"
+    misses = db.search_results.misses
+    assert db.semantic_search("lagoon at dawn", num_results=2) == first
+    assert db.search_results.misses == misses + 1
+    assert "lagoon at dawn" not in CountingEmbedder.calls
+
+
+def test_batched_queries_keep_their_order(db):
+    batches = db.semantic_search_many(["b2 c2 revised", "b1 c1 original"], num_results=1, with_content=False)
+    assert len(batches) == 2
+    assert all(hit["content"] is None for hits in batches for hit in hits)
+
+
+def test_search_filter():
+    assert search_filter() is None
+    assert search_filter(status="spun") == {"status": "spun"}
+    where = search_filter(status=["spun", "revised"], book="b", min_version=2, max_version=5)
+    assert where == {"$and": [{"status": {"$in": ["spun", "revised"]}}, {"book": "b"},
+                              {"version": {"$gte": 2}}, {"version": {"$lte": 5}}]}
+    assert where_book(where) == "b"
+    assert where_book(search_filter(status="spun")) is None
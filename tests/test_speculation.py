@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+import config
+from speculation import SpeculativeExecutor
+from workflow_context import WorkflowContext
+
+TEXT = "\n\n".join(f"Paragraph {i} of the chapter, one morning at the gates." for i in range(10))
+
+
+class WriterStub:
+    # Each call returns a longer (so better scoring) rewrite than the last.
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, text, use_cache=True, quiet=False):
+        assert not use_cache and quiet
+        with self._lock:
+            self.calls += 1
+            return "The chapter of the book at the gates of morning. " * (10 * self.calls)
+
+
+class ReviewerStub:
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.reviewed = []
+
+    def run(self, text, quiet=False):
+        self.reviewed.append(text)
+        if self.error is not None:
+            raise self.error
+        return "- Notes.", f"Revised: {text}"
+
+
+@pytest.fixture
+def ctx(make_db, monkeypatch):
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", True)
+
+    def make(writer=None, reviewer=None):
+        return WorkflowContext(db_manager=make_db(), writer=writer or WriterStub(),
+                               reviewer=reviewer or ReviewerStub())
+    return make
+
+
+def test_default_only_pre_indexes(ctx, capsys):
+    ctx = ctx()
+    executor = SpeculativeExecutor(ctx)
+    assert "only pre-index" in capsys.readouterr().out
+    speculation = executor.start(TEXT)
+    assert speculation.index.result() > 0
+    assert speculation.take() is None
+    assert ctx.writer.calls == 0 and ctx.reviewer.reviewed == []
+    executor.shutdown()
+
+
+def test_best_candidate_is_reviewed_once(ctx):
+    ctx = ctx()
+    executor = SpeculativeExecutor(ctx, candidates=3)
+    taken = executor.start(TEXT).take()
+
+    assert taken["candidates"] == 3
+    assert taken["text"] == "The chapter of the book at the gates of morning. " * 30
+    assert taken["review"] == ("- Notes.", f"Revised: {taken['text']}")
+    assert ctx.writer.calls == 3 and ctx.reviewer.reviewed == [taken["text"]]
+    assert executor.used == 1
+    executor.shutdown()
+
+
+def test_failed_review_leaves_the_review_to_the_caller(ctx):
+    ctx = ctx(reviewer=ReviewerStub(RuntimeError("boom")))
+    executor = SpeculativeExecutor(ctx, candidates=2)
+    taken = executor.start(TEXT).take()
+    assert taken["text"] and taken["review"] is None
+    executor.shutdown()
+
+
+def test_cancel_drops_queued_work(ctx):
+    ctx = ctx()
+    executor = SpeculativeExecutor(ctx, candidates=3, max_workers=1)
+    # Keeps the only worker busy so everything the turn starts is queued.
+    gate = threading.Event()
+    executor.pool.submit(gate.wait, 5)
+    speculation = executor.start(TEXT)
+    speculation.cancel()
+    gate.set()
+
+    assert speculation.cancelled
+    assert executor.cancelled == 4
+    assert speculation.index.result() > 0
+    assert ctx.writer.calls == 0 and ctx.reviewer.reviewed == []
+    executor.shutdown()
+
+
+def test_long_chapters_are_only_indexed(ctx, monkeypatch):
+    monkeypatch.setattr(config, "CHUNKING_THRESHOLD_CHARS", len(TEXT) - 1)
+    ctx = ctx()
+    executor = SpeculativeExecutor(ctx, candidates=3)
+    speculation = executor.start(TEXT)
+    assert speculation.candidates == [] and speculation.take() is None
+    executor.shutdown()
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+
+import pytest
+
+import config
+from version_catalog import VersionCatalog, make_doc_id
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return VersionCatalog(str(tmp_path / "catalog.sqlite3"))
+
+
+def test_doc_ids():
+    assert make_doc_id(config.DEFAULT_BOOK_ID, config.DEFAULT_CHAPTER_ID, 3) == "chapter-v3"
+    assert make_doc_id("b", "c", 3) == "b/c-v3"
+
+
+def test_latest_pointer_only_moves_forward(catalog):
+    assert catalog.latest("b", "c") is None
+    assert catalog.next_version("b", "c") == 1
+    catalog.record("b", "c", 1, "b/c-v1", "original")
+    catalog.record("b", "c", 3, "b/c-v3", "revised", source_version=1)
+    catalog.record("b", "c", 2, "b/c-v2", "spun", source_version=1)
+
+    assert catalog.latest("b", "c")["doc_id"] == "b/c-v3"
+    assert catalog.next_version("b", "c") == 4
+    assert [row["version"] for row in catalog.history("b", "c")] == [1, 2, 3]
+    assert [row["version"] for row in catalog.lineage("b", "c", 3)] == [3, 1]
+
+
+def test_duplicate_version_is_rejected_atomically(catalog):
+    catalog.record("b", "c", 1, "b/c-v1", "original")
+    with pytest.raises(sqlite3.IntegrityError):
+        catalog.record("b", "c", 1, "b/c-v1-again", "original", body=("snapshot", None, 0, b"x"))
+    assert catalog.get_body("b", "c", 1) is None
+    assert catalog.latest("b", "c")["doc_id"] == "b/c-v1"
+
+
+def test_rebuild_from_collection_metadata(catalog):
+    catalog.rebuild(
+        ["chapter-v1", "chapter-v2", "b/c-v1"],
+        [{"version": 1, "status": "original"}, {"version": "2", "status": "spun", "source_version": "1"},
+         {"version": 1, "book": "b", "chapter": "c"}]
+    )
+    assert catalog.latest()["doc_id"] == "chapter-v2"
+    assert catalog.latest()["source_version"] == 1
+    assert [row["doc_id"] for row in catalog.chapters()] == ["b/c-v1", "chapter-v2"]
+
+
+def test_latest_version_reads_one_document(make_db, monkeypatch):
+    db = make_db()
+    for version in (1, 2, 3):
+        db.store_version(f"Text of version {version}.", {"version": version, "status": "spun"})
+
+    requested = []
+    get = db.collection.get
+    monkeypatch.setattr(db.collection, "get", lambda **kwargs: requested.append(kwargs.get("ids")) or get(**kwargs))
+    metadata, text, doc_id = db.get_latest_version()
+    assert (metadata["version"], text, doc_id) == (3, "Text of version 3.", "chapter-v3")
+    assert requested == [["chapter-v3"]]
+
+
+def test_catalog_is_rebuilt_for_an_existing_collection(make_db):
+    db = make_db()
+    db.store_version("First.", {"version": 1, "status": "original"})
+    db.store_version("Second.", {"version": 2, "status": "spun"})
+    db.catalog.close()
+    os.remove(config.VERSION_CATALOG_PATH)
+
+    _, text, doc_id = make_db().get_latest_version()
+    assert (text, doc_id) == ("Second.", "chapter-v2")
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import config
+import voice_interface
+from voice_interface import LocalVoiceEngine
+
+
+@pytest.fixture
+def voice_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "VOICE_CACHE_DIR", str(tmp_path / "voice"))
+    yield tmp_path / "voice"
+    voice_interface.set_engine(None)
+
+
+def test_uncached_speech_leaves_no_audio_behind(voice_dir, monkeypatch):
+    monkeypatch.setattr(config, "VOICE_CACHE_ENABLED", False)
+    engine = LocalVoiceEngine(synthesis_latency=0.0, playback_chars_per_second=1e9)
+    voice_interface.set_engine(engine)
+
+    voice_interface.speak("Please provide feedback.")
+    voice_interface.speak("Please provide feedback.")
+    assert engine.synthesized == 2
+    assert os.listdir(voice_dir) == []
+
+
+def test_cached_speech_is_synthesized_once(voice_dir, monkeypatch):
+    monkeypatch.setattr(config, "VOICE_CACHE_ENABLED", True)
+    engine = LocalVoiceEngine(synthesis_latency=0.0)
+    voice_interface.set_engine(engine)
+
+    voice_interface.speak("Please provide feedback.")
+    voice_interface.speak("Please provide feedback.")
+    assert engine.synthesized == 1
+    assert len(os.listdir(voice_dir)) == 1
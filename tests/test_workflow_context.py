@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+import reviewer_agent
+import writer_agent
+from workflow_context import WorkflowContext
+
+HEAVY = ("google.generativeai", "playwright", "chromadb", "speech_recognition", "gtts", "pyttsx3")
+
+
+def test_importing_the_workflow_skips_heavy_dependencies():
+    code = (
+        "import sys, main_workflow\n"
+        f"print(','.join(name for name in {HEAVY!r} if name in sys.modules))"
+    )
+    loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert loaded.stdout.strip() == ""
+
+
+class AgentStub:
+    created = 0
+
+    def __init__(self, limiter=None):
+        AgentStub.created += 1
+        self.limiter = limiter
+
+
+def test_components_are_built_once_and_share_the_limiter(temp_paths, monkeypatch):
+    monkeypatch.setattr(writer_agent, "WriterAgent", AgentStub)
+    monkeypatch.setattr(reviewer_agent, "ReviewerAgent", AgentStub)
+    AgentStub.created = 0
+    ctx = WorkflowContext()
+
+    for _ in range(5):
+        writer, reviewer, db_manager = ctx.writer, ctx.reviewer, ctx.db_manager
+    assert AgentStub.created == 2
+    assert ctx.writer is writer and ctx.reviewer is reviewer and ctx.db_manager is db_manager
+    assert writer.limiter is ctx.limiter and reviewer.limiter is ctx.limiter
+
+
+def test_injected_components_are_used_as_is():
+    writer = AgentStub()
+    ctx = WorkflowContext(writer=writer)
+    assert ctx.writer is writer
+    assert writer.limiter is None
@@ -0,0 +1,290 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    doc_id TEXT NOT NULL UNIQUE,
+    status TEXT,
+    source_version INTEGER,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (book, chapter, version)
+);
+CREATE TABLE IF NOT EXISTS bodies (
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    base_version INTEGER,
+    depth INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (book, chapter, version)
+);
+CREATE TABLE IF NOT EXISTS latest (
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    PRIMARY KEY (book, chapter)
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    PRIMARY KEY (book, chapter, version)
+);
+CREATE TABLE IF NOT EXISTS approved (
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    approved_at REAL NOT NULL,
+    sort_key TEXT NOT NULL,
+    PRIMARY KEY (book, chapter)
+);
+CREATE TABLE IF NOT EXISTS reading_order (
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (book, chapter)
+);
+"""
+
+
+def make_doc_id(book: str, chapter: str, version: int) -> str:
+    # The single-chapter workflow keeps its historical "chapter-v{n}" IDs;
+    # anything else is namespaced so many chapters can share one collection.
+    if book == config.DEFAULT_BOOK_ID and chapter == config.DEFAULT_CHAPTER_ID:
+        return f"chapter-v{version}"
+    return f"{book}/{chapter}-v{version}"
+
+
+def natural_key(chapter: str) -> str:
+    # Sort key that orders the digit runs of a chapter id by value, so
+    # "chapter-2" comes before "chapter-10" whatever the zero-padding.
+    return re.sub(r"\d+", lambda m: m.group().lstrip("0").rjust(20, "0"), chapter)
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class VersionCatalog:
+
+    def __init__(self, path: str = None):
+        self.path = path or config.VERSION_CATALOG_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM versions LIMIT 1").fetchone() is None
+
+    def record(self, book: str, chapter: str, version: int, doc_id: str, status: str = None, source_version=None,
+               body: tuple = None, fingerprint: bytes = None):
+        # Inserts the version row and moves the latest pointer in one short
+        # transaction. Callers write to the vector store first (embedding
+        # outside any catalog lock) and undo that write if this raises.
+        # `body` is an optional (kind, base_version, depth, payload) tuple
+        # from the delta store, `fingerprint` an optional MinHash signature.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO versions (book, chapter, version, doc_id, status, source_version, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (book, chapter, version, doc_id, status, _as_int(source_version), time.time())
+                )
+                self._conn.execute(
+                    "INSERT INTO latest (book, chapter, version, doc_id) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(book, chapter) DO UPDATE SET version = excluded.version, doc_id = excluded.doc_id "
+                    "WHERE excluded.version > latest.version",
+                    (book, chapter, version, doc_id)
+                )
+                if body is not None:
+                    self._conn.execute(
+                        "INSERT INTO bodies (book, chapter, version, kind, base_version, depth, payload) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (book, chapter, version) + tuple(body)
+                    )
+                if fingerprint is not None:
+                    self._conn.execute(
+                        "INSERT INTO fingerprints (book, chapter, version, signature) VALUES (?, ?, ?, ?)",
+                        (book, chapter, version, fingerprint)
+                    )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def latest(self, book: str = None, chapter: str = None) -> dict:
+        book = book or config.DEFAULT_BOOK_ID
+        chapter = chapter or config.DEFAULT_CHAPTER_ID
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT v.* FROM latest l JOIN versions v "
+                "ON v.book = l.book AND v.chapter = l.chapter AND v.version = l.version "
+                "WHERE l.book = ? AND l.chapter = ?",
+                (book, chapter)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def next_version(self, book: str = None, chapter: str = None) -> int:
+        latest = self.latest(book, chapter)
+        return latest["version"] + 1 if latest else 1
+
+    def get(self, book: str, chapter: str, version: int) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM versions WHERE book = ? AND chapter = ? AND version = ?",
+                (book, chapter, version)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_body(self, book: str, chapter: str, version: int) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM bodies WHERE book = ? AND chapter = ? AND version = ?",
+                (book, chapter, version)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def history(self, book: str = None, chapter: str = None) -> list:
+        book = book or config.DEFAULT_BOOK_ID
+        chapter = chapter or config.DEFAULT_CHAPTER_ID
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM versions WHERE book = ? AND chapter = ? ORDER BY version",
+                (book, chapter)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def lineage(self, book: str, chapter: str, version: int) -> list:
+        # Walks source_version pointers back to the original scrape.
+        chain = []
+        with self._lock:
+            while version is not None:
+                row = self._conn.execute(
+                    "SELECT * FROM versions WHERE book = ? AND chapter = ? AND version = ?",
+                    (book, chapter, version)
+                ).fetchone()
+                if not row:
+                    break
+                chain.append(dict(row))
+                version = row["source_version"]
+        return chain
+
+    def chapters(self, book: str = None) -> list:
+        with self._lock:
+            if book:
+                rows = self._conn.execute(
+                    "SELECT * FROM latest WHERE book = ? ORDER BY chapter", (book,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM latest ORDER BY book, chapter").fetchall()
+        return [dict(row) for row in rows]
+
+    def fingerprints(self, book: str, chapter: str) -> list:
+        # Version rows of one chapter with their stored signature (None for
+        # versions stored before fingerprinting).
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT v.*, f.signature FROM versions v LEFT JOIN fingerprints f "
+                "ON f.book = v.book AND f.chapter = v.chapter AND f.version = v.version "
+                "WHERE v.book = ? AND v.chapter = ? ORDER BY v.version",
+                (book, chapter)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_fingerprint(self, book: str, chapter: str, version: int, signature: bytes):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (book, chapter, version, signature) VALUES (?, ?, ?, ?)",
+                (book, chapter, version, signature)
+            )
+
+    def set_positions(self, entries: list):
+        # Records each chapter's reading-order position; `entries` are dicts
+        # with book, chapter and position (e.g. a batch manifest).
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO reading_order (book, chapter, position) VALUES (?, ?, ?) "
+                "ON CONFLICT(book, chapter) DO UPDATE SET position = excluded.position",
+                [(entry["book"], entry["chapter"], entry["position"]) for entry in entries]
+            )
+
+    def approve(self, book: str, chapter: str, version: int):
+        # The approved version is the one a book export publishes.
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO approved (book, chapter, version, approved_at, sort_key) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(book, chapter) DO UPDATE SET version = excluded.version, "
+                "approved_at = excluded.approved_at",
+                (book, chapter, version, time.time(), natural_key(chapter))
+            )
+
+    def approval(self, book: str, chapter: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM approved WHERE book = ? AND chapter = ?", (book, chapter)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def approved(self, book: str, limit: int = -1, offset: int = 0) -> list:
+        # One page of a book's approved chapters in reading order: by recorded
+        # position, then (for chapters without one) by natural chapter id order.
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.book, a.chapter, a.version, a.approved_at, v.doc_id, v.created_at FROM approved a JOIN versions v "
+                "ON v.book = a.book AND v.chapter = a.chapter AND v.version = a.version "
+                "LEFT JOIN reading_order r ON r.book = a.book AND r.chapter = a.chapter "
+                "WHERE a.book = ? ORDER BY r.position IS NULL, r.position, a.sort_key, a.chapter LIMIT ? OFFSET ?",
+                (book, limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def rebuild(self, ids: list, metadatas: list):
+        # Backfills the catalog from an existing collection (metadata only).
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc_id, meta in zip(ids, metadatas):
+                    meta = meta or {}
+                    book = meta.get("book", config.DEFAULT_BOOK_ID)
+                    chapter = meta.get("chapter", config.DEFAULT_CHAPTER_ID)
+                    version = _as_int(meta.get("version")) or 0
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO versions (book, chapter, version, doc_id, status, source_version, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (book, chapter, version, doc_id, meta.get("status"),
+                         _as_int(meta.get("source_version")), time.time())
+                    )
+                self._conn.execute("DELETE FROM latest")
+                self._conn.execute(
+                    "INSERT INTO latest (book, chapter, version, doc_id) "
+                    "SELECT book, chapter, version, doc_id FROM versions v "
+                    "WHERE version = (SELECT MAX(version) FROM versions w "
+                    "WHERE w.book = v.book AND w.chapter = v.chapter)"
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,63 +1,313 @@
-import speech_recognition as sr
-from gtts import gTTS
-from playsound import playsound
+import hashlib
 import os
+import tempfile
+import threading
+import time
 
-AUDIO_FILE = "temp_audio.mp3"
+import config
+from instrumentation import annotate, traced
 
+# Phrases the interface itself may say; pre-synthesized with the caller's prompts.
+NOT_UNDERSTOOD_MESSAGE = "Sorry, I didn't catch that. Please try again."
+SERVICE_DOWN_MESSAGE = "Sorry, my speech service is currently down."
+BUILT_IN_PHRASES = (NOT_UNDERSTOOD_MESSAGE, SERVICE_DOWN_MESSAGE)
+
+
+class ListenTimeout(Exception):
+    pass
+
+
+class NotUnderstood(Exception):
+    pass
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class GoogleVoiceEngine:
+    # gTTS for speech and the Google recognizer for listening. One Recognizer
+    # is kept for the whole session, so its ambient-noise calibration (the
+    # energy threshold) carries over between turns.
+
+    name = "google"
+
+    def __init__(self):
+        # Voice dependencies load on first use so text-only sessions never pay for them.
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self._microphone = None
+
+    def synthesize(self, text: str, path: str):
+        from gtts import gTTS
+
+        gTTS(text=text, lang=config.VOICE_LANGUAGE, slow=False).save(path)
+
+    def play(self, path: str):
+        from playsound import playsound
+
+        playsound(path)
+
+    def _source(self):
+        if self._microphone is None:
+            self._microphone = self.sr.Microphone()
+        return self._microphone
+
+    def calibrate(self, duration: float):
+        with self._source() as source:
+            self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+
+    def listen(self, timeout: float, phrase_time_limit: float) -> str:
+        sr = self.sr
+        with self._source() as source:
+            try:
+                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+            except sr.WaitTimeoutError as e:
+                raise ListenTimeout() from e
+        print("Recognizing speech...")
+        try:
+            # Use Google's speech recognition engine to transcribe the audio.
+            return self.recognizer.recognize_google(audio)
+        except sr.UnknownValueError as e:
+            raise NotUnderstood() from e
+        except sr.RequestError as e:
+            raise ServiceUnavailable(str(e)) from e
+
+
+class LocalVoiceEngine:
+    # Offline stand-in with fixed latencies: "synthesis" writes a small file,
+    # playback and calibration sleep, and listening returns the next scripted
+    # response (or reads a typed line when no script is given). Used to
+    # benchmark a voice turn without a microphone or network.
+
+    name = "local"
+
+    def __init__(self, responses: list = None, synthesis_latency: float = 0.3, calibration_latency: float = None,
+                 listen_latency: float = 0.5, playback_chars_per_second: float = None):
+        self.responses = list(responses) if responses is not None else None
+        self.synthesis_latency = synthesis_latency
+        self.calibration_latency = calibration_latency
+        self.listen_latency = listen_latency
+        self.playback_chars_per_second = playback_chars_per_second
+        self.synthesized = 0
+        self.calibrations = 0
+
+    def synthesize(self, text: str, path: str):
+        time.sleep(self.synthesis_latency)
+        self.synthesized += 1
+        with open(path, "wb") as f:
+            f.write(hashlib.sha256(text.encode("utf-8")).digest())
+
+    def play(self, path: str):
+        if self.playback_chars_per_second:
+            time.sleep(os.path.getsize(path) / self.playback_chars_per_second)
+
+    def calibrate(self, duration: float):
+        time.sleep(duration if self.calibration_latency is None else self.calibration_latency)
+        self.calibrations += 1
+
+    def listen(self, timeout: float, phrase_time_limit: float) -> str:
+        if self.responses is None:
+            return input("(local voice) > ")
+        time.sleep(self.listen_latency)
+        if not self.responses:
+            raise ListenTimeout()
+        return self.responses.pop(0)
+
+
+class AudioCache:
+    # Synthesized phrases stored under a hash of engine, language and text,
+    # so each fixed prompt is synthesized once rather than on every call.
+
+    def __init__(self, engine, directory: str = None):
+        self.engine = engine
+        self.directory = directory or config.VOICE_CACHE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, text: str) -> str:
+        key = hashlib.sha256(f"{self.engine.name}:{config.VOICE_LANGUAGE}:{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".mp3")
+
+    def get(self, text: str) -> str:
+        path = self.path_for(text)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+        self.misses += 1
+        # Written under a unique name and renamed, so a concurrent
+        # pre-synthesis of the same phrase never leaves a partial file.
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        self.engine.synthesize(text, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+
+class VoiceSession:
+    # Long-lived engine, audio cache and calibration state for the process.
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self._cache = None
+        self._lock = threading.Lock()
+        self._mic_lock = threading.Lock()
+        self.calibrated_at = None
+        self._refreshing = False
+        self._warm_up = None
+
+    def get_engine(self):
+        with self._lock:
+            if self.engine is None:
+                self.engine = LocalVoiceEngine() if config.VOICE_ENGINE == "local" else GoogleVoiceEngine()
+            return self.engine
+
+    def cache(self) -> AudioCache:
+        engine = self.get_engine()
+        with self._lock:
+            if self._cache is None:
+                self._cache = AudioCache(engine)
+            return self._cache
+
+    def audio_for(self, text: str) -> tuple[str, bool]:
+        # Returns (path, temporary). With the cache off the audio goes to a
+        # fresh temporary file, which the caller deletes after playback.
+        if config.VOICE_CACHE_ENABLED:
+            return self.cache().get(text), False
+        os.makedirs(config.VOICE_CACHE_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".mp3", prefix="speak-", dir=config.VOICE_CACHE_DIR)
+        os.close(fd)
+        try:
+            self.get_engine().synthesize(text, path)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, True
+
+    def ensure_calibrated(self):
+        # Calibrates once, synchronously, before the first listen.
+        if self.calibrated_at is None:
+            print("Calibrating for ambient noise...")
+            self._calibrate()
+
+    def _calibrate(self):
+        with self._mic_lock:
+            self.get_engine().calibrate(config.VOICE_CALIBRATION_SECONDS)
+            self.calibrated_at = time.monotonic()
+
+    def refresh_if_stale(self):
+        # Re-measures ambient noise in the background once the calibration is
+        # older than VOICE_RECALIBRATE_AFTER, so no turn waits for it.
+        age = time.monotonic() - self.calibrated_at if self.calibrated_at is not None else None
+        if age is None or age < config.VOICE_RECALIBRATE_AFTER or self._refreshing:
+            return
+        self._refreshing = True
+
+        def refresh():
+            try:
+                self._calibrate()
+            except Exception as e:
+                print(f"Background recalibration failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def listen(self, timeout: float, phrase_time_limit: float) -> str:
+        with self._mic_lock:
+            return self.get_engine().listen(timeout, phrase_time_limit)
+
+    def presynthesize(self, phrases) -> threading.Thread:
+        # Fills the audio cache for known prompts on a background thread.
+        phrases = [phrase for phrase in dict.fromkeys(list(phrases) + list(BUILT_IN_PHRASES)) if phrase]
+
+        def work():
+            for phrase in phrases:
+                try:
+                    self.cache().get(phrase)
+                except Exception as e:
+                    print(f"Voice pre-synthesis stopped: {e}")
+                    return
+
+        thread = threading.Thread(target=work, daemon=True)
+        thread.start()
+        return thread
+
+
+_session = VoiceSession()
+
+
+def set_engine(engine) -> VoiceSession:
+    # Starts a fresh session on `engine` (e.g. a LocalVoiceEngine in benchmarks).
+    global _session
+    _session = VoiceSession(engine)
+    return _session
+
+
+def warm_up(phrases=()) -> threading.Thread:
+    # Pre-synthesizes once per session; later calls return the same thread.
+    if not config.VOICE_CACHE_ENABLED:
+        return None
+    if _session._warm_up is None:
+        _session._warm_up = _session.presynthesize(phrases)
+    return _session._warm_up
+
+
+@traced("voice.speak")
 def speak(text: str):
-  
+
     if not text or text.isspace():
         print("Speak function received empty text. Nothing to say.")
         return
-        
+
     try:
-        print("Generating speech...")
-        tts = gTTS(text=text, lang='en', slow=False)
-        
-        tts.save(AUDIO_FILE)
-        
+        annotate(text_chars=len(text))
+        audio_path, temporary = _session.audio_for(text)
+
         print(f"Speaking: '{text[:60]}...'")
-        playsound(AUDIO_FILE)
-        
+        try:
+            _session.get_engine().play(audio_path)
+        finally:
+            if temporary:
+                os.remove(audio_path)
+
     except Exception as e:
         print(f"An error occurred during text-to-speech: {e}")
-    finally:
-        if os.path.exists(AUDIO_FILE):
-            os.remove(AUDIO_FILE)
 
+@traced("voice.listen")
 def listen_for_input(prompt: str) -> str:
-   
-    r = sr.Recognizer()
-    
-    with sr.Microphone() as source:
-        print("Calibrating for ambient noise...")
-        r.adjust_for_ambient_noise(source, duration=1)
-        
-        print(prompt)
-        speak(prompt) 
-        
-        try:
-            # Listen for audio input from the user.
-            audio = r.listen(source, timeout=10, phrase_time_limit=15)
-            
-            print("Recognizing speech...")
-            # Use Google's speech recognition engine to transcribe the audio.
-            text = r.recognize_google(audio)
-            print(f"You said: {text}")
-            return text.lower()
-            
-        except sr.WaitTimeoutError:
-            print("Listening timed out. No speech detected.")
-            return ""
-        except sr.UnknownValueError:
-            print("Google Speech Recognition could not understand the audio.")
-            speak("Sorry, I didn't catch that. Please try again.")
-            return ""
-        except sr.RequestError as e:
-            print(f"Could not request results from Google Speech Recognition service; {e}")
-            speak("Sorry, my speech service is currently down.")
-            return ""
-        except Exception as e:
-            print(f"An unknown error occurred during listening: {e}")
-            return ""
\ No newline at end of file
+
+    try:
+        _session.ensure_calibrated()
+    except Exception as e:
+        print(f"Could not open the microphone: {e}")
+        return ""
+
+    print(prompt)
+    speak(prompt)
+
+    try:
+        # Listen for audio input from the user.
+        text = _session.listen(timeout=10, phrase_time_limit=15)
+        print(f"You said: {text}")
+        annotate(text_chars=len(text))
+        return text.lower()
+
+    except ListenTimeout:
+        print("Listening timed out. No speech detected.")
+        return ""
+    except NotUnderstood:
+        print("Google Speech Recognition could not understand the audio.")
+        speak(NOT_UNDERSTOOD_MESSAGE)
+        return ""
+    except ServiceUnavailable as e:
+        print(f"Could not request results from Google Speech Recognition service; {e}")
+        speak(SERVICE_DOWN_MESSAGE)
+        return ""
+    except Exception as e:
+        print(f"An unknown error occurred during listening: {e}")
+        return ""
+    finally:
+        _session.refresh_if_stale()
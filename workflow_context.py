@@ -0,0 +1,85 @@
+import threading
+
+from rate_limiter import RateLimiter
+
+
+class WorkflowContext:
+    # Long-lived state for one workflow session. The database manager and the
+    # agents are created on first use and then reused, so HITL rewrite loops
+    # do not rebuild agents (or re-run genai.configure) on every turn, and
+    # stages that never run never import their dependencies. Pre-built
+    # components (e.g. agents on a local fake model) can be passed in.
+    # `book`, `chapter` and `target_url` select the chapter the stages work
+    # on; left unset, they fall back to the single-chapter defaults in config.
+    # `speculator` runs background work while the operator reads at the HITL prompt.
+    # Every agent the context builds shares one RateLimiter (a fresh one
+    # unless `limiter` is given), so chunked and speculative calls stay
+    # inside the model quota too.
+
+    def __init__(self, db_manager=None, limiter=None, scraper=None, writer=None, reviewer=None, fused=None,
+                 book: str = None, chapter: str = None, target_url: str = None):
+        self._db_manager = db_manager
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.book = book
+        self.chapter = chapter
+        self.target_url = target_url
+        self._scraper = scraper
+        self._writer = writer
+        self._reviewer = reviewer
+        self._fused = fused
+        self._speculator = None
+        self._lock = threading.Lock()
+
+    @property
+    def db_manager(self):
+        with self._lock:
+            if self._db_manager is None:
+                from ChromaDB import ChromaDBManager
+
+                self._db_manager = ChromaDBManager()
+            return self._db_manager
+
+    @property
+    def scraper(self):
+        with self._lock:
+            if self._scraper is None:
+                from scraper_agent import ScraperAgent
+
+                self._scraper = ScraperAgent()
+            return self._scraper
+
+    @property
+    def writer(self):
+        with self._lock:
+            if self._writer is None:
+                from writer_agent import WriterAgent
+
+                self._writer = WriterAgent(limiter=self.limiter)
+            return self._writer
+
+    @property
+    def reviewer(self):
+        with self._lock:
+            if self._reviewer is None:
+                from reviewer_agent import ReviewerAgent
+
+                self._reviewer = ReviewerAgent(limiter=self.limiter)
+            return self._reviewer
+
+    @property
+    def fused(self):
+        with self._lock:
+            if self._fused is None:
+                from fused_agent import FusedAgent
+
+                self._fused = FusedAgent(limiter=self.limiter)
+            return self._fused
+
+    @property
+    def speculator(self):
+        with self._lock:
+            if self._speculator is None:
+                from speculation import SpeculativeExecutor
+
+                self._speculator = SpeculativeExecutor(self)
+            return self._speculator
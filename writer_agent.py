@@ -1,20 +1,38 @@
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+
 import config
+from chunking import split_into_windows, contextual_prompt, stitch
+from instrumentation import traced
+from model_client import ModelClient
+from response_cache import get_default_cache
 
 class WriterAgent:
 
-    def __init__(self):
+    def __init__(self, model=None, limiter=None, cache=None):
        
         print("Initializing Writer Agent...")
-        if not config.GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+        self.generation_config = {"temperature": 0.75}
+
+        if model is None:
+            # Imported here so runs that never call the model skip the ~1s import.
+            import google.generativeai as genai
+
+            if not config.GOOGLE_API_KEY:
+                raise ValueError("GOOGLE_API_KEY not found in environment variables.")
         
-        genai.configure(api_key=config.GOOGLE_API_KEY)
+            genai.configure(api_key=config.GOOGLE_API_KEY)
 
-        self.model = genai.GenerativeModel(
-            config.GEMINI_MODEL,
-            generation_config={"temperature": 0.75}
-        )
+            model = genai.GenerativeModel(
+                config.GEMINI_MODEL,
+                generation_config=self.generation_config
+            )
+            if cache is None and config.RESPONSE_CACHE_ENABLED:
+                cache = get_default_cache()
+
+        # Injected models (e.g. a local fake) skip API configuration and
+        # only use a cache when one is passed explicitly.
+        self.model = model
+        self.client = ModelClient(model, self.generation_config, limiter=limiter, cache=cache)
         print("Writer Agent ready.")
 
     def _create_prompt(self, original_text: str, human_feedback: str = None) -> str:
@@ -36,18 +54,60 @@ class WriterAgent:
         
         return f"{base_prompt}Original Chapter Text:\n---\n{original_text}"
 
-    def run(self, original_text: str, human_feedback: str = None) -> str:
-       
+    @traced("writer.run")
+    def run(self, original_text: str, human_feedback: str = None, use_cache: bool = True,
+            quiet: bool = False) -> str:
+        # use_cache=False asks the model for a fresh sample even when the
+        # same prompt was answered before (e.g. for best-of-N candidates).
+        # quiet=True prints nothing, for background runs.
         prompt = self._create_prompt(original_text, human_feedback)
+        log = (lambda *args: None) if quiet else print
         
-        print("Sending request to Gemini for text spinning...")
+        log("Sending request to Gemini for text spinning...")
         try:
-            response = self.model.generate_content(prompt)
-            spun_text = response.text
-            print("Successfully received spun text from the Writer Agent.")
+            spun_text = self.client.generate(prompt, use_cache=use_cache, quiet=quiet)
+            log("Successfully received spun text from the Writer Agent.")
             return spun_text
         except Exception as e:
-            print(f"An error occurred while communicating with the Gemini API: {e}")
+            log(f"An error occurred while communicating with the Gemini API: {e}")
             # It's useful to see the prompt that caused the error for debugging.
+            log(f"Failed prompt: {prompt[:300]}...")
+            return None
+
+    @traced("writer.run_stream")
+    def run_stream(self, original_text: str, human_feedback: str = None, on_token=None) -> str:
+        # Same as run, but passes each text fragment to `on_token` as soon as
+        # the model produces it.
+        prompt = self._create_prompt(original_text, human_feedback)
+
+        print("Streaming request to Gemini for text spinning...")
+        try:
+            spun_text, timing = self.client.stream(prompt, on_token or (lambda chunk: None))
+            print(f"Writer Agent stream finished. Time to first token: {timing['ttft']:.2f}s, "
+                  f"total: {timing['total']:.2f}s")
+            return spun_text
+        except Exception as e:
+            print(f"An error occurred while communicating with the Gemini API: {e}")
             print(f"Failed prompt: {prompt[:300]}...")
-            return None
\ No newline at end of file
+            return None
+
+    @traced("writer.run_chunked")
+    def run_chunked(self, original_text: str, human_feedback: str = None, max_workers: int = None) -> str:
+        # Rewrites a long chapter window by window in parallel and stitches
+        # the results, so no single call has to produce the whole chapter.
+        windows = split_into_windows(original_text)
+        print(f"Sending {len(windows)} chunk requests to Gemini for text spinning...")
+
+        def rewrite(window):
+            prompt = self._create_prompt(window.body, human_feedback)
+            return self.client.generate(contextual_prompt(prompt, window, len(windows)))
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers or config.CHUNK_MAX_WORKERS) as pool:
+                parts = list(pool.map(rewrite, windows))
+        except Exception as e:
+            print(f"An error occurred while communicating with the Gemini API: {e}")
+            return None
+
+        print("Successfully received all chunks from the Writer Agent.")
+        return stitch(parts, windows)